@@ -1,21 +1,58 @@
 import os
-import io
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import StreamingResponse
+import re
+import json
+import time
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from pydantic import BaseModel
-from typing import Dict, Any, List
-from groq import Groq
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from groq import AsyncGroq
 from dotenv import load_dotenv
 from gtts import gTTS
 
+from core.llm_cache import LLMResponseCache, make_cache_key, quantize_context
+from core.rate_limiter import get_llm_gate, estimate_tokens
+from core.metrics import span, record
+from core.brief_store import BriefStore, DEFAULT_BRIEF_STORE_DIR
+from core.tts_cache import TTSAudioCache, DEFAULT_TTS_CACHE_DIR, tts_cache_key
+from integrations.enam_client import LIVE_PRICE_TTL_S
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# Briefs and explanations are reused across farmers with the same (quantized) dashboard
+llm_cache = LLMResponseCache(maxsize=4096, ttl=LIVE_PRICE_TTL_S)
+
 # Initialize Groq Client
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY and GROQ_API_KEY != "gsk_placeholder_key_you_need_to_change_this" else None
+client = AsyncGroq(api_key=GROQ_API_KEY) if GROQ_API_KEY and GROQ_API_KEY != "gsk_placeholder_key_you_need_to_change_this" else None
+
+BRIEF_MODEL = "llama-3.1-8b-instant" # Use the fastest model for the ticker
+EXPLAIN_MODEL = "llama-3.3-70b-versatile"
+
 
+async def create_completion(model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **kwargs):
+    """
+    Non-blocking Groq call admitted through the per-model gate (concurrency cap + RPM/TPM buckets).
+    The token bucket is charged an estimate up front and corrected with the real usage afterwards.
+    """
+    gate = get_llm_gate(model)
+    estimated = estimate_tokens(*(m["content"] for m in messages), max_tokens=max_tokens or 512)
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    async with gate.slot(estimated) as queue_time:
+        record("llm_queue", queue_time)
+        with span("llm"):
+            completion = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+    usage = getattr(completion, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None):
+        gate.token_bucket.adjust(estimated - usage.total_tokens)
+    return completion
 
 class ChatRequest(BaseModel):
     farmer_query: str
@@ -82,7 +119,7 @@ If the language is English:
 - Address the farmer as 'Farmer Friend' or 'Sir'.
 - Keep sentences concise and focus on the profit impact.
 
-Here is the CURRENT REAL-TIME DATA for the farmer:
+Here is the CURRENT REAL-TIME DATA for the farmer (money figures are rounded, so present them as approximate):
 - Overall Recommendation Status: {status} (GREEN=Sell, YELLOW=Hold, RED=Wait/Danger)
 - Total Estimated Take-Home Profit (Today): ₹{total_today}
 - Net Realization value: ₹{per_quintal} per quintal
@@ -107,68 +144,196 @@ The response should be concise enough for voice playback (around 4-5 sentences)
 """
     return prompt
 
-def generate_vakeel_brief(context: Dict[str, Any], language: str = "Regional") -> str:
+async def generate_vakeel_brief(context: Dict[str, Any], language: str = "Regional") -> str:
     """
     Generates a single-sentence sub-second summary for the dashboard ticker.
     """
     if not client:
         return "Insight: Monitor market volatility and weather closely for optimal profit."
         
+    cache_key = make_cache_key("brief", context, language)
+    cached_brief = llm_cache.get(cache_key)
+    if cached_brief is not None:
+        return cached_brief
+        
+    # The cached brief is shared by every dashboard with this key, so it quotes the quantized profit and the bare mandi name
     status = context.get("status", "HOLD")
-    total_profit = context.get("total_net_profit", 0)
-    best_mandi = context.get("best_mandi", "Unknown")
+    quantized = quantize_context(context)
+    total_profit = quantized["total_net_profit"]
+    best_mandi = quantized.get("best_mandi") or "Unknown"
     
     prompt = f"""You are MittiMitra AI. 
-    Task: Summarize why the farmer should {status} based on {best_mandi} and a profit of ₹{total_profit}.
+    Task: Summarize why the farmer should {status} based on {best_mandi} and a profit of about ₹{total_profit:g}.
     Constraint: ONE SENTENCE ONLY. Use the language: {language}.
     If {language} is not English, use the native script and address politely.
     Focus on the main driver (e.g., price dip, high spoilage, or shock alert).
     """
     
     try:
-        chat_completion = client.chat.completions.create(
+        chat_completion = await create_completion(
+            model=BRIEF_MODEL,
             messages=[{"role": "user", "content": prompt}],
-            model="llama-3.1-8b-instant", # Use the fastest model for the ticker
             max_tokens=60,
         )
-        return chat_completion.choices[0].message.content.strip()
+        brief = chat_completion.choices[0].message.content.strip()
+        llm_cache.set(cache_key, brief)
+        return brief
     except Exception as e:
         print(f"Brief generation error: {e}")
         return f"Advice: Market alignment suggests {status} strategy for maximum yield protection."
 
 
+def peek_cached_brief(context: Dict[str, Any], language: str = "Regional") -> Optional[str]:
+    """A brief that is available without calling Groq (cache hit or the no-key fallback), else None."""
+    if not client:
+        return "Insight: Monitor market volatility and weather closely for optimal profit."
+    return llm_cache.get(make_cache_key("brief", context, language))
+
+# Shared by every uvicorn worker through its directory, so a poll may land on any worker
+brief_store = BriefStore(os.getenv("BRIEF_STORE_DIR", DEFAULT_BRIEF_STORE_DIR), ttl=LIVE_PRICE_TTL_S)
+
+@router.get("/brief/{recommendation_id}")
+async def get_vakeel_brief(recommendation_id: str, wait: float = Query(0.0, ge=0.0, le=10.0)):
+    """
+    Deferred dashboard ticker brief for a /recommendation response.
+    `wait` long-polls for up to that many seconds while the brief is still being generated.
+    """
+    result = await brief_store.get(recommendation_id, wait_s=wait)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired recommendation ID.")
+    return result
+
+EXPLAIN_PARAMS = {
+    "temperature": 0.3, # Low temperature for factual consistency
+    "max_tokens": 250, # Increased for complex multilingual sentences
+}
+
+def _explain_messages(req: ChatRequest) -> List[Dict[str, str]]:
+    return [
+        # Built from the quantized dashboard so the cached reply holds for every context sharing its key
+        {"role": "system", "content": build_system_prompt(quantize_context(req.dashboard_context), req.language)},
+        {"role": "user", "content": req.farmer_query or "Please explain my dashboard recommendation."}
+    ]
+
+def _mock_explanation(req: ChatRequest) -> str:
+    return f"[MOCK - {req.language}] Ji Kisan bhai. We see the price at {req.dashboard_context.get('best_mandi', 'market')} is good right now and weather is stable. You should harvest today to secure ₹{req.dashboard_context.get('net_realization_inr', 0)} profit."
+
 @router.post("/explain")
-def chat_explain(req: ChatRequest):
+async def chat_explain(req: ChatRequest):
     """
     Sub-second inference endpoint utilizing Groq + Llama 3 70B for Explainable AI.
     """
     if not client:
         # Mock response if API key isn't provided (for local testing without keys)
-        return {
-            "response": f"[MOCK - {req.language}] Ji Kisan bhai. We see the price at {req.dashboard_context.get('best_mandi', 'market')} is good right now and weather is stable. You should harvest today to secure ₹{req.dashboard_context.get('net_realization_inr', 0)} profit."
-        }
+        return {"response": _mock_explanation(req)}
+
+    cache_key = make_cache_key("explain", req.dashboard_context, req.language, req.farmer_query)
+    cached_reply = llm_cache.get(cache_key)
+    if cached_reply is not None:
+        return {"response": cached_reply}
 
     try:
-        system_prompt = build_system_prompt(req.dashboard_context, req.language)
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": req.farmer_query or "Please explain my dashboard recommendation."}
-            ],
-            temperature=0.3, # Low temperature for factual consistency
-            max_tokens=250, # Increased for complex multilingual sentences
+        completion = await create_completion(
+            model=EXPLAIN_MODEL,
+            messages=_explain_messages(req),
+            **EXPLAIN_PARAMS
         )
         
         reply = completion.choices[0].message.content
+        llm_cache.set(cache_key, reply)
         return {"response": reply}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Sentence terminators across our languages: Latin punctuation plus the Devanagari danda / double danda
+SENTENCE_BOUNDARY = re.compile(r"[.!?।॥]+[\"')\]]*\s+")
+
+def split_sentences(buffer: str) -> Tuple[List[str], str]:
+    """Splits off every complete sentence in `buffer`; returns (sentences, unfinished remainder)."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(buffer):
+        sentence = buffer[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, buffer[start:]
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_completion(model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **kwargs) -> AsyncIterator[str]:
+    """Token deltas from a streamed Groq completion; the gate slot is held until the stream ends."""
+    gate = get_llm_gate(model)
+    estimated = estimate_tokens(*(m["content"] for m in messages), max_tokens=max_tokens or 512)
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    async with gate.slot(estimated) as queue_time:
+        record("llm_queue", queue_time)
+        started = time.perf_counter()
+        first_token = True
+        with span("llm_stream"):
+            stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token:
+                        record("llm_first_token", time.perf_counter() - started)
+                        first_token = False
+                    yield chunk.choices[0].delta.content
+
+async def _replay(text: str) -> AsyncIterator[str]:
+    yield text
+
+@router.post("/explain/stream")
+async def chat_explain_stream(req: ChatRequest):
+    """
+    Streaming variant of /explain over Server-Sent Events.
+    Emits `token` events as Groq generates, a `sentence` event as soon as each sentence is complete
+    (so the voice assistant can start TTS on the first one), then `done` with the full reply.
+    """
+    cache_key = make_cache_key("explain", req.dashboard_context, req.language, req.farmer_query)
+
+    async def events():
+        reply = ""
+        buffer = ""
+        sentence_index = 0
+        try:
+            cached_reply = llm_cache.get(cache_key) if client else None
+            # Cached and mock replies are replayed through the same event protocol
+            if cached_reply is not None:
+                tokens = _replay(cached_reply)
+            elif not client:
+                tokens = _replay(_mock_explanation(req))
+            else:
+                tokens = stream_completion(model=EXPLAIN_MODEL, messages=_explain_messages(req), **EXPLAIN_PARAMS)
+
+            async for token in tokens:
+                reply += token
+                buffer += token
+                yield _sse("token", {"text": token})
+                sentences, buffer = split_sentences(buffer)
+                for sentence in sentences:
+                    yield _sse("sentence", {"index": sentence_index, "text": sentence})
+                    sentence_index += 1
+
+            if buffer.strip():
+                yield _sse("sentence", {"index": sentence_index, "text": buffer.strip()})
+
+            if client and cached_reply is None:
+                llm_cache.set(cache_key, reply)
+            yield _sse("done", {"response": reply})
+        except Exception as e:
+            logger.error(f"Streaming explain error: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no" # Stop reverse proxies from buffering the stream
+    })
+
 @router.post("/onboarding_extract")
-def onboarding_extract(req: OnboardingExtractRequest):
+async def onboarding_extract(req: OnboardingExtractRequest):
     """
     Sub-second endpoint utilizing Groq + Llama 3 to structure unstructured voice input into JSON.
     """
@@ -231,8 +396,8 @@ STRICT RULES:
         except:
             pass
         
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = await create_completion(
+            model=EXPLAIN_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": req.text_input}
@@ -242,7 +407,6 @@ STRICT RULES:
         )
         
         reply = completion.choices[0].message.content
-        import json
         parsed = json.loads(reply)
         return parsed
         
@@ -251,32 +415,119 @@ STRICT RULES:
         print(f"Extraction error: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+TTS_LANG_MAP = {
+    "English": "en",
+    "Hindi": "hi",
+    "Marathi": "mr",
+    "Telugu": "te",
+    "Tamil": "ta",
+    "Gujarati": "gu",
+    "Punjabi": "pa"
+}
+
+# Briefs and pivot advisories repeat heavily across farmers, so synthesized clips are kept on disk
+tts_cache = TTSAudioCache(
+    directory=os.getenv("TTS_CACHE_DIR", DEFAULT_TTS_CACHE_DIR),
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024
+)
+
+def _cached_tts(text: str, language: str) -> Tuple[str, str]:
+    """(etag key, mp3 path) for the clip, running gTTS only on a cache miss."""
+    target_lang = TTS_LANG_MAP.get(language, "en")
+
+    def synthesize(fp) -> None:
+        # Removed artificial slowdown for Marathi per farmer feedback
+        with span("tts_synthesis"):
+            gTTS(text=text, lang=target_lang, slow=False).write_to_fp(fp)
+
+    with span("tts"):
+        return tts_cache.get_or_create(text, target_lang, synthesize)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single 'bytes=start-end' range into inclusive offsets.
+    Returns None when the header should be ignored (multi-range or malformed) and raises
+    ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: the last N bytes
+            start, end = size - int(end_s), size - 1
+            if start >= size:
+                raise IndexError
+            start = max(0, start)
+        else:
+            start = int(start_s)
+            end = min(int(end_s), size - 1) if end_s else size - 1
+    except ValueError:
+        return None
+    except IndexError:
+        raise ValueError("empty suffix range")
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+def _iter_file_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _audio_response(request: Request, key: str, path: str) -> Response:
+    """
+    Serves a cached clip with a content-addressed ETag: 304 for If-None-Match hits, 206 for a
+    single byte range, otherwise the whole file via FileResponse (sendfile where the server supports it).
+    """
+    etag = f'"{key}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "Accept-Ranges": "bytes"
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        size = os.path.getsize(path)
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            return StreamingResponse(_iter_file_range(path, start, end), status_code=206, media_type="audio/mpeg", headers={
+                **headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1)
+            })
+
+    return FileResponse(path, media_type="audio/mpeg", headers=headers)
+
 @router.post("/tts")
-def text_to_speech(req: TTSRequest):
+def text_to_speech(req: TTSRequest, request: Request):
     """
     Sub-second endpoint to generate robust audio for all 7 Indic languages via gTTS.
     """
     try:
-        lang_map = {
-            "English": "en",
-            "Hindi": "hi",
-            "Marathi": "mr",
-            "Telugu": "te",
-            "Tamil": "ta",
-            "Gujarati": "gu",
-            "Punjabi": "pa"
-        }
-        
-        target_lang = lang_map.get(req.language, "en")
-        
-        # Removed artificial slowdown for Marathi per farmer feedback
-        tts = gTTS(text=req.text, lang=target_lang, slow=False)
-        
-        mp3_fp = io.BytesIO()
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-        
-        return StreamingResponse(mp3_fp, media_type="audio/mpeg")
+        key, path = _cached_tts(req.text, req.language)
+        return _audio_response(request, key, path)
     
     except Exception as e:
         import traceback
@@ -285,47 +536,43 @@ def text_to_speech(req: TTSRequest):
         raise HTTPException(status_code=500, detail=error_msg)
 
 @router.get("/tts")
-def text_to_speech_stream(text: str = Query(...), language: str = Query("English")):
+def text_to_speech_stream(request: Request, text: str = Query(...), language: str = Query("English")):
     """
     Sub-second GET endpoint for native HTML5 Audio streaming. 
     Bypasses the need for Blob downloading on the frontend.
+    Served from the content-addressed clip cache with real ETag / Range support.
     """
     try:
-        lang_map = {
-            "English": "en",
-            "Hindi": "hi",
-            "Marathi": "mr",
-            "Telugu": "te",
-            "Tamil": "ta",
-            "Gujarati": "gu",
-            "Punjabi": "pa"
-        }
-        
-        target_lang = lang_map.get(language, "en")
-        
-        # Use safe logging
-        try:
-            print(f"DEBUG: TTS Request - Lang: {language} ({target_lang})")
-        except:
-            pass
+        logger.debug(f"TTS request - lang: {language} ({TTS_LANG_MAP.get(language, 'en')})")
 
-        tts = gTTS(text=text, lang=target_lang, slow=False)
-        
-        mp3_fp = io.BytesIO()
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-        audio_content = mp3_fp.getvalue()
-        content_length = len(audio_content)
-        
-        # Stream the audio buffer directly to the browser
-        return StreamingResponse(io.BytesIO(audio_content), media_type="audio/mpeg", headers={
-            "Cache-Control": "public, max-age=31536000",
-            "Content-Length": str(content_length),
-            "Accept-Ranges": "bytes"
-        })
+        key, path = _cached_tts(text, language)
+        return _audio_response(request, key, path)
     
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
         print(f"CRITICAL TTS FAILURE: {e}\n{error_trace}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tts/stream")
+def text_to_speech_progressive(request: Request, text: str = Query(...), language: str = Query("English")):
+    """
+    Progressive TTS for slow links: gTTS already splits long text at sentence/punctuation boundaries
+    into ~100-character parts, and each part's MP3 is sent as soon as it is synthesized, so the
+    farmer hears the first sentence while the rest is still being generated. MP3 frames are
+    self-delimiting, so the concatenated segments play as one clip. The finished clip lands in
+    the TTS cache, and later requests are served from it directly.
+    """
+    target_lang = TTS_LANG_MAP.get(language, "en")
+    key = tts_cache_key(text, target_lang)
+    path = tts_cache.get(key)
+    if path:
+        tts_cache.hits += 1
+        return _audio_response(request, key, path)
+
+    tts_cache.misses += 1
+    segments = gTTS(text=text, lang=target_lang, slow=False).stream()
+    return StreamingResponse(tts_cache.tee(key, segments), media_type="audio/mpeg", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
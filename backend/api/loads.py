@@ -0,0 +1,312 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from engine.load_matching import (
+    match_loads, departure_window, CoLoadPlan,
+    VEHICLE_CAPACITY_QUINTALS, DEPARTURE_WINDOW_HOURS
+)
+from engine.spatial_index import DEFAULT_LAT, DEFAULT_LNG
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# The rematch thread also wakes this often to drop declarations whose window has passed
+EXPIRY_CHECK_S = 60.0
+# How long /loads/declare waits for the plan that includes the new declaration
+DECLARE_MATCH_WAIT_S = 2.0
+
+class LoadDeclaration(BaseModel):
+    crop: str = ""
+    location: dict
+    quantity_quintals: float
+    mandi_name: str
+    distance_km: float
+    departure_in_hours: float = 0.0
+
+def _mandi_key(name: str) -> str:
+    """'Lasalgaon Mandi' and 'lasalgaon' declare for the same destination."""
+    name = name.strip().lower()
+    for suffix in (" mandi", " apmc"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name.strip()
+
+def _hours_now() -> float:
+    return time.time() / 3600.0
+
+class LoadBoard:
+    """
+    Active harvest declarations and their co-loading plan.
+    A background thread (started by the app lifespan) re-runs the vectorized match over every
+    declaration after each change, coalescing bursts, and publishes the plan as a whole; requests
+    quote against the last published plan and never run the match themselves. Without the
+    thread (scripts, benchmarks) the plan is brought up to date inline when read.
+    """
+    def __init__(self):
+        self._declarations: Dict[str, Dict[str, Any]] = {}
+        self._mandi_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Bumped on every change to the declarations; the published plan records the version it was built from
+        self._version = 0
+        self._plan: Optional[CoLoadPlan] = None
+        self._positions: Dict[str, int] = {}
+        self._records: List[Dict[str, Any]] = []
+        self._published_version = -1
+        self._published = threading.Condition()
+        self._changed = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+        self.last_match_ms: Optional[float] = None
+
+    # ------------------------------------------------------------------------
+    # Background rematch
+    # ------------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name="load-rematch", daemon=True)
+        self._worker.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._changed.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5.0)
+            self._worker = None
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._changed.wait(timeout=EXPIRY_CHECK_S)
+            self._changed.clear()
+            if self._stopping:
+                break
+            try:
+                self.rematch()
+            except Exception as e:
+                logger.error(f"Co-load rematch failed: {e}")
+
+    def _changed_locked(self) -> None:
+        """Caller holds the lock."""
+        self._version += 1
+        self._changed.set()
+
+    def _expire(self) -> None:
+        """Caller holds the lock."""
+        # A declaration lapses once its departure window has passed
+        current_window = int(departure_window(_hours_now()))
+        expired = [d for d, r in self._declarations.items() if r["window"] < current_window]
+        for declaration_id in expired:
+            del self._declarations[declaration_id]
+        if expired:
+            self._changed_locked()
+
+    def rematch(self) -> None:
+        """Matches the current declarations (outside the lock) and publishes the plan unless it is already current."""
+        with self._lock:
+            self._expire()
+            version = self._version
+            if version == self._published_version:
+                return
+            ids = list(self._declarations)
+            records = [self._declarations[d] for d in ids]
+        started = time.perf_counter()
+        plan = match_loads(
+            lats=[r["lat"] for r in records],
+            lngs=[r["lng"] for r in records],
+            mandi_ids=[r["mandi_id"] for r in records],
+            departure_hours=[r["departure_hour"] for r in records],
+            quantities=[r["quantity"] for r in records],
+            distances_km=[r["distance_km"] for r in records]
+        )
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        with self._published:
+            if version > self._published_version:
+                self._plan, self._records = plan, records
+                self._positions = {d: i for i, d in enumerate(ids)}
+                self._published_version = version
+                self.last_match_ms = elapsed_ms
+            self._published.notify_all()
+
+    def _await_version(self, version: int, timeout_s: float) -> None:
+        """Waits (bounded) until a plan at least as new as `version` is published."""
+        if self._worker is None or not self._worker.is_alive():
+            self.rematch()
+            return
+        with self._published:
+            self._published.wait_for(lambda: self._published_version >= version, timeout=timeout_s)
+
+    # ------------------------------------------------------------------------
+    # Declarations
+    # ------------------------------------------------------------------------
+
+    def declare(self, declaration: LoadDeclaration) -> str:
+        declaration_id = uuid.uuid4().hex
+        departure_hour = _hours_now() + declaration.departure_in_hours
+        mandi = _mandi_key(declaration.mandi_name)
+        with self._lock:
+            self._declarations[declaration_id] = {
+                "crop": declaration.crop,
+                "lat": declaration.location.get("lat", DEFAULT_LAT),
+                "lng": declaration.location.get("lng", DEFAULT_LNG),
+                "mandi_name": declaration.mandi_name,
+                "mandi_id": self._mandi_ids.setdefault(mandi, len(self._mandi_ids)),
+                "departure_hour": departure_hour,
+                "window": int(departure_window(departure_hour)),
+                "quantity": declaration.quantity_quintals,
+                "distance_km": declaration.distance_km,
+            }
+            self._changed_locked()
+        return declaration_id
+
+    def withdraw(self, declaration_id: str) -> bool:
+        with self._lock:
+            if self._declarations.pop(declaration_id, None) is None:
+                return False
+            self._changed_locked()
+            return True
+
+    def match_for(self, declaration_id: str, wait_s: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        The declaration's match in the published plan. A declaration the plan does not cover yet
+        waits up to `wait_s` for the rematch that includes it.
+        """
+        with self._lock:
+            known = declaration_id in self._declarations
+            version = self._version
+        if not known:
+            return None
+        if declaration_id not in self._positions and wait_s > 0:
+            self._await_version(version, wait_s)
+
+        with self._published:
+            plan, i = self._plan, self._positions.get(declaration_id)
+            if plan is None or i is None:
+                return None
+            record = self._records[i]
+        vehicle = int(plan.vehicle_of[i])
+        solo, shared = float(plan.solo_cost[i]), float(plan.shared_cost[i])
+        # Co-loaders are reported as counts only; their locations never leave the server
+        return {
+            "declaration_id": declaration_id,
+            "mandi_name": record["mandi_name"],
+            "vehicle_id": vehicle,
+            "co_loaders": int(plan.vehicle_members[vehicle]) - 1,
+            "vehicle_load_quintals": round(float(plan.vehicle_load[vehicle]), 2),
+            "vehicle_capacity_quintals": VEHICLE_CAPACITY_QUINTALS,
+            "solo_transport_cost": round(solo, 2),
+            "shared_transport_cost": round(shared, 2),
+            "savings": round(solo - shared, 2),
+            "effective_rate_per_km": round(float(plan.effective_rate_per_km[i]), 2),
+        }
+
+    def _quote_inputs(self, mandis: List[Dict[str, Any]]) -> Tuple[Optional[CoLoadPlan], List[Optional[int]]]:
+        """The last published plan (None without declarations) and each mandi's id, read under their locks."""
+        if self._worker is None or not self._worker.is_alive():
+            self.rematch()
+        with self._lock:
+            mandi_ids = [self._mandi_ids.get(_mandi_key(m["name"])) for m in mandis]
+        with self._published:
+            plan = self._plan if self._records else None
+        return plan, mandi_ids
+
+    @staticmethod
+    def _quote_window(plan: CoLoadPlan, mandi_ids: List[Optional[int]], window: int, location: dict, quantity: float,
+                      mandis: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Quotes for one departure window, keyed by position in `mandis`."""
+        lat, lng = location.get("lat", DEFAULT_LAT), location.get("lng", DEFAULT_LNG)
+        quotes = {}
+        for i, (m, mandi_id) in enumerate(zip(mandis, mandi_ids)):
+            if mandi_id is None:
+                continue
+            quote = plan.quote(mandi_id, window, lat, lng, quantity, m["distance_km"])
+            if quote:
+                quote["shared_cost"] = round(quote["shared_cost"], 2)
+                quote["effective_rate_per_km"] = round(quote["effective_rate_per_km"], 2)
+                quotes[i] = quote
+        return quotes
+
+    def quote_rates(self, location: dict, quantity: float, mandis: List[Dict[str, Any]], departure_in_hours: float = 0.0) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-mandi shared-transport quotes for a shipment leaving in `departure_in_hours`, keyed by mandi name.
+        Only mandis where joining an existing vehicle in that departure window beats going alone are returned.
+        Reads the last published plan (on the request path it never waits for a rematch).
+        """
+        plan, mandi_ids = self._quote_inputs(mandis)
+        if plan is None:
+            return {}
+        window = int(departure_window(_hours_now() + departure_in_hours))
+        quotes = self._quote_window(plan, mandi_ids, window, location, quantity, mandis)
+        return {mandis[i]["name"]: quote for i, quote in quotes.items()}
+
+    def quote_rate_surface(self, location: dict, quantity: float, mandis: List[Dict[str, Any]], horizon_hours: int) -> Optional[np.ndarray]:
+        """
+        Per-km transport rate for every departure hour 0..horizon_hours x mandi (the sell-window
+        optimizer's layout): a pooled vehicle's share in hours whose departure window has one with
+        room, the mandi's own transport_rate_per_km otherwise. None when no window has a quote.
+        """
+        plan, mandi_ids = self._quote_inputs(mandis)
+        if plan is None:
+            return None
+        windows = departure_window(_hours_now() + np.arange(horizon_hours + 1, dtype=np.float64))
+        rates = np.tile(np.array([m.get("transport_rate_per_km", 15.0) for m in mandis], dtype=np.float64), (len(windows), 1))
+        quoted = False
+        for window in np.unique(windows):
+            hours = windows == window
+            for i, quote in self._quote_window(plan, mandi_ids, int(window), location, quantity, mandis).items():
+                rates[hours, i] = quote["effective_rate_per_km"]
+                quoted = True
+        return rates if quoted else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            declarations = len(self._declarations)
+        with self._published:
+            plan = self._plan
+            return {
+                "declarations": declarations,
+                "vehicles": plan.n_vehicles if plan is not None else 0,
+                "shared_vehicles": int(np.count_nonzero(plan.vehicle_members > 1)) if plan is not None else 0,
+                "last_match_ms": self.last_match_ms,
+                "plan_is_current": self._published_version == self._version,
+                "departure_window_hours": DEPARTURE_WINDOW_HOURS,
+            }
+
+load_board = LoadBoard()
+
+@router.post("/declare")
+def declare_load(data: LoadDeclaration):
+    """
+    Load Matching: declare a pending shipment to a mandi so neighbours heading the same way
+    in the same departure window can share a vehicle. Returns the current match.
+    """
+    if data.quantity_quintals <= 0 or data.distance_km < 0:
+        raise HTTPException(status_code=400, detail="quantity_quintals must be positive and distance_km non-negative.")
+    declaration_id = load_board.declare(data)
+    return load_board.match_for(declaration_id, wait_s=DECLARE_MATCH_WAIT_S)
+
+@router.get("/stats")
+def load_board_stats():
+    return load_board.stats()
+
+@router.get("/{declaration_id}")
+def get_load_match(declaration_id: str):
+    match = load_board.match_for(declaration_id, wait_s=DECLARE_MATCH_WAIT_S)
+    if match is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired declaration.")
+    return match
+
+@router.delete("/{declaration_id}")
+def withdraw_load(declaration_id: str):
+    if not load_board.withdraw(declaration_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired declaration.")
+    return {"status": "withdrawn", "declaration_id": declaration_id}
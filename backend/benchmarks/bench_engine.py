@@ -0,0 +1,252 @@
+"""
+Microbenchmarks for the decision engine and the integration parsers.
+
+Synthetic generators cover 10 to 10,000 mandis and 7 to 365 days of price history. Results are
+written as JSON; against a baseline (same machine) any case slower than the tolerance fails the run
+(exit 1), and a missing baseline fails it too (exit 2). Baselines are machine-specific, so each
+machine records its own on the reference commit.
+
+Run from backend/:
+    python -m benchmarks.bench_engine --save-baseline            # on the reference commit
+    python -m benchmarks.bench_engine                            # on the change; exits 1 on regression, 2 without a baseline
+    python -m benchmarks.bench_engine --quick --filter spatial   # subset while iterating
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import statistics
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from engine.decay_logic import calculate_quality_loss
+from engine.profit_calc import get_net_realization
+from engine.map_logic import calculate_spatial_profit
+from engine.batch_engine import evaluate_destinations
+from engine.sell_window import optimize_sell_window
+from engine.shock_analyzer import detect_market_shock
+from engine.rolling_stats import RollingStatsIndex
+from engine.spatial_index import SpatialIndex
+from engine.load_matching import match_loads
+from integrations.mandi_api import calculate_haversine, _parse_real_json_data, _parse_gov_api_data
+
+BENCH_DIR = os.path.dirname(__file__)
+DEFAULT_RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+MANDI_COUNTS = (10, 100, 1000, 10000)
+QUICK_MANDI_COUNTS = (10, 100, 1000)
+HISTORY_DAYS = (7, 30, 90, 365)
+
+# Fail when a case is this much slower than the baseline (0.25 = 25%)
+DEFAULT_TOLERANCE = 0.25
+# Each timing sample runs the case for at least this long
+MIN_SAMPLE_S = 0.05
+REPEATS = 5
+
+# ----------------------------------------------------------------------------
+# Synthetic data
+# ----------------------------------------------------------------------------
+
+def synthetic_mandis(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Candidate mandi dicts as the engine receives them from mandi_api."""
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"Mandi {i}",
+            "current_price": round(rng.uniform(1500.0, 6000.0), 2),
+            "distance_km": round(rng.uniform(5.0, 600.0), 1),
+            "transport_rate_per_km": 15.0,
+            "lat": rng.uniform(8.0, 32.0),
+            "lng": rng.uniform(70.0, 88.0),
+        }
+        for i in range(n)
+    ]
+
+def synthetic_commodity_data(n: int, seed: int = 0) -> Dict[str, Any]:
+    """A commodity entry of mandi_prices_real.json with n geo-located markets."""
+    rng = random.Random(seed)
+    return {
+        "modal_price": 3000.0,
+        "unit": "INR/Quintal",
+        "markets": [
+            {"name": f"Market {i}", "price": round(rng.uniform(1500.0, 6000.0), 1),
+             "lat": rng.uniform(8.0, 32.0), "lng": rng.uniform(70.0, 88.0)}
+            for i in range(n)
+        ],
+    }
+
+def synthetic_gov_records(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """data.gov.in daily price records."""
+    rng = random.Random(seed)
+    return [
+        {"market": f"Market {i}", "state": "Maharashtra", "commodity": "Onion",
+         "modal_price": str(round(rng.uniform(1500.0, 6000.0), 1))}
+        for i in range(n)
+    ]
+
+def synthetic_history(days: int, seed: int = 0) -> List[float]:
+    rng = random.Random(seed)
+    price, history = 3000.0, []
+    for _ in range(days):
+        price = max(100.0, price + rng.gauss(0.0, 40.0))
+        history.append(round(price, 2))
+    return history
+
+def synthetic_shipments(n: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return {
+        "lats": rng.uniform(18.0, 19.0, n), "lngs": rng.uniform(73.0, 74.0, n),
+        "mandi_ids": rng.integers(0, 40, n), "departure_hours": rng.uniform(0.0, 48.0, n),
+        "quantities": rng.uniform(5.0, 60.0, n), "distances_km": rng.uniform(20.0, 300.0, n),
+    }
+
+# ----------------------------------------------------------------------------
+# Harness
+# ----------------------------------------------------------------------------
+
+def measure(fn: Callable[[], Any]) -> Dict[str, float]:
+    """Per-call time in microseconds: loop count calibrated to MIN_SAMPLE_S, REPEATS samples."""
+    fn()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_SAMPLE_S:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int(MIN_SAMPLE_S / elapsed * 1.2))
+    samples = [elapsed / loops]
+    for _ in range(REPEATS - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - started) / loops)
+    return {
+        "min_us": round(min(samples) * 1e6, 3),
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "loops": loops,
+    }
+
+def build_cases(quick: bool) -> Dict[str, Callable[[], Any]]:
+    cases: Dict[str, Callable[[], Any]] = {}
+    mandi_counts = QUICK_MANDI_COUNTS if quick else MANDI_COUNTS
+
+    # Scalar kernels
+    cases["decay.calculate_quality_loss"] = lambda: calculate_quality_loss("Tomato", 34.0, 70.0, 12.0)
+    cases["profit.get_net_realization"] = lambda: get_net_realization(3000.0, "Onion", 120.0, 32.0, 65.0, 4.0, 10.0)
+    cases["mandi_api.calculate_haversine"] = lambda: calculate_haversine(18.52, 73.85, 20.0, 74.2)
+
+    for days in HISTORY_DAYS:
+        history = synthetic_history(days)
+        cases[f"shock.detect_market_shock[days={days}]"] = lambda h=history: detect_market_shock(2800.0, h)
+
+    for n in mandi_counts:
+        mandis = synthetic_mandis(n)
+        prices = [m["current_price"] for m in mandis]
+        distances = [m["distance_km"] for m in mandis]
+        weather = [{"temperature_c": 31.0, "humidity_percent": 70.0, "is_verified_env": True}] * n
+        hourly_t = [28.0 + 6.0 * np.sin(h / 24.0 * 2 * np.pi) for h in range(120)]
+        hourly_h = [65.0] * 120
+
+        cases[f"map.calculate_spatial_profit[mandis={n}]"] = lambda m=mandis, w=weather: calculate_spatial_profit("Tomato", 25.0, 32.0, 70.0, m, w)
+        cases[f"batch.evaluate_destinations[mandis={n}]"] = lambda p=prices, d=distances: evaluate_destinations("Tomato", 25.0, 32.0, 70.0, p, d)
+        cases[f"sell_window.optimize_sell_window[mandis={n}]"] = lambda p=prices, d=distances: optimize_sell_window("Tomato", 25.0, hourly_t, hourly_h, p, d)
+
+        commodity = synthetic_commodity_data(n)
+        market_index = SpatialIndex.from_records(commodity["markets"])
+        location = {"lat": 19.0, "lng": 76.0}
+        cases[f"mandi_api._parse_real_json_data[mandis={n}]"] = lambda c=commodity, i=market_index: _parse_real_json_data(c, "onion", location, i)
+        cases[f"spatial_index.within_radius[mandis={n}]"] = lambda i=market_index: i.within_radius(19.0, 76.0, 500.0)
+
+        records = synthetic_gov_records(n)
+        cases[f"mandi_api._parse_gov_api_data[records={n}]"] = lambda r=records: _parse_gov_api_data(r, "onion")
+
+        rolling = RollingStatsIndex(capacity=n)
+        rows = np.array([rolling.row_for("onion", f"Market {i}") for i in range(n)])
+        ticks = np.random.default_rng(0).uniform(1500.0, 6000.0, n)
+        cases[f"rolling_stats.update_rows[markets={n}]"] = lambda s=rolling, r=rows, t=ticks: s.update_rows(r, t, t / 30.0)
+
+        shipments = synthetic_shipments(n * 3)
+        cases[f"load_matching.match_loads[shipments={n * 3}]"] = lambda s=shipments: match_loads(**s)
+
+    return cases
+
+def run(quick: bool, name_filter: Optional[str]) -> Dict[str, Any]:
+    random.seed(0)
+    results: Dict[str, Any] = {}
+    for name, fn in build_cases(quick).items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(fn)
+        print(f"{name:<60} {results[name]['min_us']:>14.2f} us")
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Names of cases whose best time regressed by more than `tolerance` against the baseline."""
+    regressions = []
+    if baseline.get("meta", {}).get("machine") != current["meta"]["machine"]:
+        print("warning: baseline was recorded on a different machine; ratios are indicative only")
+    print(f"\n{'case':<60} {'baseline us':>14} {'current us':>14} {'ratio':>8}")
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        ratio = result["min_us"] / before["min_us"] if before["min_us"] else 1.0
+        flag = "  REGRESSION" if ratio > 1.0 + tolerance else ""
+        print(f"{name:<60} {before['min_us']:>14.2f} {result['min_us']:>14.2f} {ratio:>8.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Decision engine microbenchmarks")
+    parser.add_argument("--quick", action="store_true", help="Skip the 10,000-mandi tier")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    current = run(args.quick, args.filter)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    # Without a baseline there is nothing to gate on, which must not pass silently
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; record one on the reference commit with --save-baseline.")
+        return 2
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: " + ", ".join(regressions))
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
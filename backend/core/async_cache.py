@@ -0,0 +1,141 @@
+import time
+import asyncio
+import logging
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How get_or_fetch served a value
+FRESH = "fresh"          # cache hit within the TTL
+STALE = "stale"          # cache hit past the TTL; a background refresh was started
+FETCHED = "fetched"      # the upstream was called and its answer returned
+FALLBACK = "fallback"    # the upstream was called and failed; the last good value was returned
+
+def is_error_payload(value: Any) -> bool:
+    """Integrations signal upstream failure by returning a dict with an 'error' key."""
+    return isinstance(value, dict) and "error" in value
+
+class AsyncTTLCache:
+    """
+    LRU + TTL store for coroutine results.
+    - fresh   (age < ttl):                served directly
+    - stale   (ttl <= age < ttl+stale_ttl): served immediately while one background refresh runs
+    - expired (older):                     refetched, but still kept as the 'last good' value to
+                                           fall back on if the upstream is failing
+    """
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Any], is_error: Callable[[Any], bool]) -> asyncio.Task:
+        """Single-flight: every caller for the same key shares one upstream call."""
+        task = self._inflight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    value = await fetch()
+                    if not is_error(value):
+                        self.set(key, value)
+                    return value
+                finally:
+                    self._inflight.pop(key, None)
+            task = asyncio.create_task(run())
+            self._inflight[key] = task
+        return task
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any], is_error: Callable[[Any], bool] = is_error_payload) -> Any:
+        value, _ = await self.lookup(key, fetch, is_error)
+        return value
+
+    async def lookup(self, key: Hashable, fetch: Callable[[], Any], is_error: Callable[[Any], bool] = is_error_payload) -> Tuple[Any, str]:
+        """get_or_fetch, also returning how the value was served (FRESH, STALE, FETCHED or FALLBACK)."""
+        entry = self.peek(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return value, FRESH
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                task = self._refresh(key, fetch, is_error)
+                task.add_done_callback(_log_background_failure)
+                return value, STALE
+
+        self.misses += 1
+        try:
+            # shield: a cancelled caller must not cancel the fetch other callers are waiting on
+            value = await asyncio.shield(self._refresh(key, fetch, is_error))
+        except Exception:
+            if entry is None:
+                raise
+            value = None
+
+        if entry is not None and (value is None or is_error(value)):
+            # Upstream failed: keep serving the last good value rather than the error
+            self.fallbacks += 1
+            return entry[0], FALLBACK
+        return value, FETCHED
+
+def _log_background_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background cache refresh failed: {task.exception()}")
+
+def async_cached(cache: AsyncTTLCache, key: Optional[Callable[..., Hashable]] = None, is_error: Callable[[Any], bool] = is_error_payload):
+    """
+    Async replacement for cachetools.cached (which caches the coroutine object, not its result).
+    Error payloads are never cached. `wrapper.lookup(*args)` returns (value, how it was served).
+    """
+    def decorator(func):
+        def cache_key(args, kwargs):
+            return key(*args, **kwargs) if key else (func.__qualname__,) + args + tuple(sorted(kwargs.items()))
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_fetch(cache_key(args, kwargs), lambda: func(*args, **kwargs), is_error)
+
+        async def lookup(*args, **kwargs):
+            return await cache.lookup(cache_key(args, kwargs), lambda: func(*args, **kwargs), is_error)
+
+        wrapper.cache = cache
+        wrapper.lookup = lookup
+        return wrapper
+    return decorator
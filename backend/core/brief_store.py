@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRIEF_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "briefs")
+
+# How often a poll on another worker re-reads a pending brief's file
+REMOTE_POLL_INTERVAL_S = 0.2
+# A temp file this old belongs to a write that died; younger ones may be another worker's write in progress
+TMP_GRACE_S = 60.0
+
+class BriefStore:
+    """
+    Deferred Agri-Vakeel briefs keyed by recommendation ID.
+    /recommendation submits the brief as a background task and returns immediately; the client
+    fetches it from /chat/brief/{id} (optionally long-polling) once the ticker needs it.
+    Each brief is also written to <dir>/<id>.json (pending, then ready), so a poll that lands on a
+    different uvicorn worker than the submit still finds it. Entries expire oldest first from an
+    insertion-ordered deque; every worker expires the entries it submitted.
+    """
+    def __init__(self, directory: str = DEFAULT_BRIEF_STORE_DIR, ttl: float = 900, maxsize: int = 10000):
+        self.directory = directory
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._order: Deque[Tuple[float, str]] = deque()
+        self._scan()
+
+    def _scan(self) -> None:
+        """Removes briefs left behind by workers that have since exited."""
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                age = now - os.path.getmtime(path)
+                if age > (TMP_GRACE_S if name.endswith(".tmp") else self.ttl):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _path(self, recommendation_id: str) -> str:
+        return os.path.join(self.directory, f"{recommendation_id}.json")
+
+    def _write(self, recommendation_id: str, entry: Dict[str, Any]) -> None:
+        # Temp file + rename, so a reader on another worker never sees a partial entry
+        path = self._path(recommendation_id)
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Polls on this worker still follow the task; only other workers lose sight of the brief
+            logger.error(f"Could not persist brief {recommendation_id}: {e}")
+
+    def _read(self, recommendation_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(recommendation_id), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry if time.time() - entry.get("created", 0) <= self.ttl else None
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._order and (now - self._order[0][0] > self.ttl or len(self._order) >= self.maxsize):
+            _, recommendation_id = self._order.popleft()
+            task = self._tasks.pop(recommendation_id, None)
+            if task is not None:
+                task.cancel()
+            try:
+                os.remove(self._path(recommendation_id))
+            except FileNotFoundError:
+                pass
+
+    def submit(self, brief: Awaitable[str]) -> str:
+        self._expire()
+        recommendation_id = uuid.uuid4().hex
+        created = time.time()
+        self._write(recommendation_id, {"status": "pending", "created": created, "vakeel_brief": None})
+        task = asyncio.ensure_future(brief)
+        task.add_done_callback(lambda t: self._finish(recommendation_id, created, t))
+        self._tasks[recommendation_id] = task
+        self._order.append((created, recommendation_id))
+        return recommendation_id
+
+    def _finish(self, recommendation_id: str, created: float, task: asyncio.Task) -> None:
+        if task.cancelled() or recommendation_id not in self._tasks:
+            return
+        if task.exception() is not None:
+            logger.error(f"Brief {recommendation_id} failed: {task.exception()}")
+            entry = {"status": "failed", "created": created, "vakeel_brief": None}
+        else:
+            entry = {"status": "ready", "created": created, "vakeel_brief": task.result()}
+        self._write(recommendation_id, entry)
+
+    async def get(self, recommendation_id: str, wait_s: float = 0.0) -> Optional[Dict[str, Any]]:
+        task = self._tasks.get(recommendation_id)
+        if task is not None:
+            # Submitted by this worker: wait on the task itself
+            if not task.done() and wait_s > 0:
+                await asyncio.wait({task}, timeout=wait_s)
+            if not task.done():
+                return {"recommendation_id": recommendation_id, "status": "pending", "vakeel_brief": None}
+            if task.cancelled() or task.exception() is not None:
+                return {"recommendation_id": recommendation_id, "status": "failed", "vakeel_brief": None}
+            return {"recommendation_id": recommendation_id, "status": "ready", "vakeel_brief": task.result()}
+
+        # Submitted by another worker: follow its file
+        deadline = time.monotonic() + wait_s
+        while True:
+            entry = self._read(recommendation_id)
+            if entry is None:
+                return None
+            if entry["status"] != "pending" or time.monotonic() >= deadline:
+                return {"recommendation_id": recommendation_id, "status": entry["status"], "vakeel_brief": entry["vakeel_brief"]}
+            await asyncio.sleep(min(REMOTE_POLL_INTERVAL_S, max(0.0, deadline - time.monotonic())))
@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class UpstreamError(Exception):
+    """An upstream answered with an error or an unusable payload (counts against its breaker)."""
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+    - closed:    calls pass; `failure_threshold` consecutive failures open the circuit
+    - open:      calls are refused without touching the upstream for `cooldown_s`
+    - half-open: one probe call is let through; success closes the circuit, failure re-opens it
+                 with the cooldown doubled (up to `max_cooldown_s`), so an upstream that is down for
+                 hours is probed a handful of times instead of on every request
+    Also keeps an EWMA of successful call latency, used to decide whether a call fits a deadline.
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        cooldown_s: float = 30.0,
+        max_cooldown_s: float = 900.0,
+        expected_latency_s: float = 1.0,
+        latency_alpha: float = 0.2
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown_s = cooldown_s
+        self.max_cooldown_s = max_cooldown_s
+        self.latency_alpha = latency_alpha
+        self.latency_ewma_s = expected_latency_s
+        self.state = CLOSED
+        self.cooldown_s = cooldown_s
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream now. In half-open state only one probe is admitted at a time."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_s:
+            self.state = HALF_OPEN
+            logger.info(f"Circuit '{self.name}' half-open: probing upstream")
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self, latency_s: float) -> None:
+        self.successes += 1
+        self.latency_ewma_s += self.latency_alpha * (latency_s - self.latency_ewma_s)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"Circuit '{self.name}' closed: upstream recovered")
+        self.state = CLOSED
+        self.cooldown_s = self.base_cooldown_s
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self.cooldown_s = min(self.max_cooldown_s, self.cooldown_s * 2)
+            self._open()
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+        self._probe_in_flight = False
+
+    def record_cancelled(self) -> None:
+        """A call abandoned by the caller (e.g. a hedged tier that lost the race) says nothing about the upstream."""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"Circuit '{self.name}' open for {self.cooldown_s:.0f}s after {self.consecutive_failures} consecutive failures")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "cooldown_s": self.cooldown_s,
+            "latency_ewma_ms": round(self.latency_ewma_s * 1000, 1),
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+class Deadline:
+    """A request-level latency budget that successive upstream calls draw from."""
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def covers(self, expected_s: float) -> bool:
+        return self.remaining() >= expected_s
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str, expected_latency_s: float = 1.0) -> CircuitBreaker:
+    """One breaker per upstream source. Thresholds come from the environment."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3")),
+            cooldown_s=float(os.getenv("CIRCUIT_COOLDOWN_S", "30")),
+            max_cooldown_s=float(os.getenv("CIRCUIT_MAX_COOLDOWN_S", "900")),
+            expected_latency_s=expected_latency_s,
+        )
+        _breakers[name] = breaker
+    return breaker
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
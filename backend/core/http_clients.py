@@ -0,0 +1,74 @@
+import os
+import logging
+import httpx
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Per-upstream pool settings. One client per upstream gives each host its own connection limit
+# and timeout policy while keeping TCP+TLS connections alive across requests.
+UPSTREAMS: Dict[str, Dict] = {
+    "enam": {
+        "timeout": httpx.Timeout(10.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+    },
+    "data_gov_in": {
+        "timeout": httpx.Timeout(5.0, connect=3.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+    },
+    "open_meteo": {
+        "timeout": httpx.Timeout(10.0, connect=3.0),
+        "limits": httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0),
+    },
+}
+
+def _http2_available() -> bool:
+    if os.getenv("HTTP2_ENABLED", "0") != "1":
+        return False
+    try:
+        import h2  # noqa: F401 -- optional dependency (pip install httpx[http2])
+        return True
+    except ImportError:
+        logger.warning("HTTP2_ENABLED=1 but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+
+class HttpClientRegistry:
+    """
+    Application-scoped pooled httpx clients, one per upstream.
+    Opened in the FastAPI lifespan and closed on shutdown. Integrations call get(); outside the
+    app (scripts, REPL) a client is created lazily on first use.
+    """
+    def __init__(self, upstreams: Dict[str, Dict] = UPSTREAMS):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        config = self.upstreams[name]
+        return httpx.AsyncClient(
+            timeout=config["timeout"],
+            limits=config["limits"],
+            http2=_http2_available(),
+            follow_redirects=True,
+        )
+
+    def open(self) -> None:
+        for name in self.upstreams:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Closing HTTP client '{name}' failed: {e}")
+
+# Singleton Instance
+http_clients = HttpClientRegistry()
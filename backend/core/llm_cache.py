@@ -0,0 +1,140 @@
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+def _sig(value: Any, digits: int = 2) -> Any:
+    """Rounds a number to `digits` significant figures so near-identical contexts share a key."""
+    try:
+        return float(f"{float(value):.{digits}g}")
+    except (TypeError, ValueError):
+        return value
+
+# "Lasalgaon Mandi (12.3 km)" -> "Lasalgaon Mandi": the distance is the farmer's own
+_DISTANCE_SUFFIX = re.compile(r"\s*\([\d.]+\s*km\)\s*$")
+
+# What the prompts say about each shock: the analyzers' wording without per-mandi figures
+SHOCK_MESSAGES = {
+    "SHOCK_ALERT": "CRITICAL: Price crashed more than 2σ below the 7-day average.",
+    "GLUT_WARNING": "High volume detected at neighboring mandis. Price crash imminent.",
+    "WEATHER_SHOCK": "Heavy rain > 80% probability in next 2 hours!",
+}
+
+def normalize_query(query: Optional[str]) -> str:
+    """Lower-cases, drops punctuation (any script) and collapses whitespace."""
+    if not query:
+        return ""
+    text = "".join(ch for ch in query.lower() if not unicodedata.category(ch).startswith("P"))
+    return " ".join(text.split())
+
+def _quantize_shock(shock: Dict[str, Any]) -> Dict[str, Any]:
+    """The shock as the prompts quote it: its status, the status's message and, if re-routed, the pivot mandi's name."""
+    if not shock.get("is_shock"):
+        return shock
+    status = shock.get("status")
+    pivot = shock.get("pivot_mandi") or {}
+    if pivot.get("mandi_name"):
+        advice = f"EMERGENCY: Primary market crashed. Re-route to {pivot['mandi_name']}."
+    else:
+        advice = shock.get("pivot_advice")
+    return {
+        "status": status,
+        "is_shock": True,
+        "message": SHOCK_MESSAGES.get(status, shock.get("message")),
+        "pivot_advice": advice,
+    }
+
+def quantize_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of the dashboard with every figure the Agri-Vakeel prompts quote replaced by its quantized
+    value: money to 2 significant figures (mandi price to 3), temperature to 1C, rain to 10%.
+    The best mandi and any shock pivot are named without the farmer's distance or profit.
+    Prompts are built from this copy, so a cached reply is accurate for every dashboard that shares its key.
+    """
+    weather = context.get("weather") or {}
+    mandi = context.get("mandi_stats") or {}
+    best_mandi = context.get("best_mandi")
+    return {
+        **context,
+        "best_mandi": _DISTANCE_SUFFIX.sub("", best_mandi) if isinstance(best_mandi, str) else best_mandi,
+        "total_net_profit": _sig(context.get("total_net_profit", 0)),
+        "net_realization_inr_per_quintal": _sig(context.get("net_realization_inr_per_quintal", 0)),
+        "profit_forecast_48h": _sig(context.get("profit_forecast_48h", 0)),
+        "yield_quintals": _sig(context.get("yield_quintals", 1)),
+        "mandi_stats": {**mandi, "current_price": _sig(mandi.get("current_price", 0), 3)},
+        "weather": {
+            **weather,
+            "temperature_c": round(float(weather.get("temperature_c", 0) or 0)),
+            "rain_probability_percent": round(float(weather.get("rain_probability_percent", 0) or 0), -1),
+        },
+        "shock_alert": _quantize_shock(context.get("shock_alert") or {}),
+    }
+
+def canonical_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """The subset of the quantized dashboard (see quantize_context) that the prompts actually read."""
+    quantized = quantize_context(context)
+    weather = quantized["weather"]
+    shock = quantized["shock_alert"]
+    return {
+        "status": context.get("status"),
+        "best_mandi": quantized["best_mandi"],
+        "total_net_profit": quantized["total_net_profit"],
+        "per_quintal": quantized["net_realization_inr_per_quintal"],
+        "forecast_48h": quantized["profit_forecast_48h"],
+        "yield": quantized["yield_quintals"],
+        "mandi_price": quantized["mandi_stats"]["current_price"],
+        "temp": weather["temperature_c"],
+        "rain": weather["rain_probability_percent"],
+        "shock": [shock.get("status"), shock.get("message"), shock.get("pivot_advice")] if shock.get("is_shock") else None,
+        "manual_override": context.get("manual_override_count") if context.get("is_manual_override") else None,
+    }
+
+def make_cache_key(kind: str, context: Dict[str, Any], language: str, query: Optional[str] = None) -> str:
+    payload = {
+        "kind": kind,
+        "context": canonical_context(context),
+        "language": (language or "").strip().lower(),
+        "query": normalize_query(query),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """
+    LRU + TTL cache for generated briefs and explanations.
+    The TTL follows the live mandi price refresh, so a cached answer never outlives the data it narrates.
+    """
+    def __init__(self, maxsize: int = 4096, ttl: float = 900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,274 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) from sub-millisecond engine passes up to slow LLM/TTS calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+class Histogram:
+    """Cumulative-bucket histogram per label set (Prometheus semantics)."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last slot is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][slot] += 1
+            series[1][0] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(labels, list(counts), total[0]) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text exposition format.
+    Counters and histograms are updated on the request path; cache, gate and circuit breaker
+    statistics are pulled from their owners' stats() at scrape time through registered collectors.
+    """
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._cache_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._gate_source: Optional[Callable[[], Dict[str, Dict[str, Any]]]] = None
+        self._breaker_source: Optional[Callable[[], Dict[str, Dict[str, Any]]]] = None
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_cache(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """`stats` returns hits/misses (and optionally stale_hits, size/entries) like the repo's cache classes."""
+        self._cache_sources[name] = stats
+
+    def register_gates(self, stats: Callable[[], Dict[str, Dict[str, Any]]]) -> None:
+        self._gate_source = stats
+
+    def register_breakers(self, stats: Callable[[], Dict[str, Dict[str, Any]]]) -> None:
+        self._breaker_source = stats
+
+    def _cache_lines(self) -> Iterator[str]:
+        if not self._cache_sources:
+            return
+        rows = [(name, stats()) for name, stats in self._cache_sources.items()]
+        families = (
+            ("agrichain_cache_hits_total", "counter", "Cache lookups served from the cache (fresh or stale).",
+             lambda s: s.get("hits", 0) + s.get("stale_hits", 0)),
+            ("agrichain_cache_misses_total", "counter", "Cache lookups that went upstream.", lambda s: s.get("misses", 0)),
+            ("agrichain_cache_hit_ratio", "gauge", "Hits / lookups since process start.", lambda s: s.get("hit_rate", 0.0)),
+            ("agrichain_cache_entries", "gauge", "Entries currently held.", lambda s: s.get("size", s.get("entries", 0))),
+        )
+        for metric, kind, help_text, pick in families:
+            yield f"# HELP {metric} {help_text}"
+            yield f"# TYPE {metric} {kind}"
+            for name, stats in rows:
+                yield f'{metric}{{cache="{_escape(name)}"}} {_number(pick(stats))}'
+
+    def _gate_lines(self) -> Iterator[str]:
+        if self._gate_source is None:
+            return
+        gates = self._gate_source()
+        families = (
+            ("agrichain_llm_in_flight", "gauge", "Groq calls currently running.", "in_flight"),
+            ("agrichain_llm_waiting", "gauge", "Groq calls queued at the admission gate.", "waiting"),
+            ("agrichain_llm_admitted_total", "counter", "Groq calls admitted by the gate.", "admitted"),
+            ("agrichain_llm_rejected_total", "counter", "Groq calls rejected after the queue wait.", "rejected"),
+        )
+        for metric, kind, help_text, field in families:
+            yield f"# HELP {metric} {help_text}"
+            yield f"# TYPE {metric} {kind}"
+            for model, stats in gates.items():
+                yield f'{metric}{{model="{_escape(model)}"}} {_number(stats.get(field, 0))}'
+
+    def _breaker_lines(self) -> Iterator[str]:
+        if self._breaker_source is None:
+            return
+        breakers = self._breaker_source()
+        states = {"closed": 0, "half_open": 1, "open": 2}
+        families = (
+            ("agrichain_circuit_state", "gauge", "Upstream circuit state (0 closed, 1 half-open, 2 open).", lambda s: states.get(s["state"], 0)),
+            ("agrichain_circuit_rejected_total", "counter", "Calls refused by an open circuit.", lambda s: s["rejected"]),
+            ("agrichain_circuit_failures_total", "counter", "Upstream calls that failed or timed out.", lambda s: s["failures"]),
+            ("agrichain_upstream_latency_ewma_seconds", "gauge", "Typical successful upstream latency.", lambda s: s["latency_ewma_ms"] / 1000.0),
+        )
+        for metric, kind, help_text, pick in families:
+            yield f"# HELP {metric} {help_text}"
+            yield f"# TYPE {metric} {kind}"
+            for source, stats in breakers.items():
+                yield f'{metric}{{source="{_escape(source)}"}} {_number(pick(stats))}'
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        lines.extend(self._cache_lines())
+        lines.extend(self._gate_lines())
+        lines.extend(self._breaker_lines())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "agrichain_request_duration_seconds", "End-to-end HTTP request latency.", ("route", "method", "status")
+)
+STAGE_SECONDS = metrics.histogram(
+    "agrichain_stage_duration_seconds", "Latency of one pipeline stage (weather, mandi, shock, spatial_profit, llm, tts...).", ("stage",)
+)
+MANDI_SOURCE = metrics.counter(
+    "agrichain_mandi_source_total", "Mandi price lookups by the source tier that served them.", ("tier",)
+)
+
+# ----------------------------------------------------------------------------
+# Per-request stage spans
+# ----------------------------------------------------------------------------
+
+# (stage, seconds) for the request being served; a list shared by every task/thread the request spawns
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+def record(stage: str, seconds: float) -> None:
+    """Adds an already-measured stage to the stage histogram and, inside an HTTP request, its Server-Timing header."""
+    STAGE_SECONDS.observe(seconds, stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times a pipeline stage (see record()).
+    Works around awaits and in threads started with asyncio.to_thread (the context is copied, the list shared).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+async def timed(stage: str, awaitable):
+    """`await timed("weather", fetch(...))`: span() for one awaitable, e.g. inside asyncio.gather."""
+    with span(stage):
+        return await awaitable
+
+def server_timing(spans: List[Tuple[str, float]], total_s: float) -> str:
+    # Repeated stages (e.g. one spatial pass per batch member) are summed into one entry
+    merged: Dict[str, Tuple[float, int]] = {}
+    for stage, seconds in spans:
+        total, count = merged.get(stage, (0.0, 0))
+        merged[stage] = (total + seconds, count + 1)
+    entries = [f"{stage};dur={total * 1000:.2f}" + (f';desc="x{count}"' if count > 1 else "") for stage, (total, count) in merged.items()]
+    entries.append(f"total;dur={total_s * 1000:.2f}")
+    return ", ".join(entries)
+
+def _route_label(scope) -> str:
+    """
+    The matched route template (bounded label cardinality); unmatched paths share one label.
+    Newer FastAPI keeps included routers' routes unprefixed and records the full template separately.
+    """
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    if effective is not None and getattr(effective, "path", None):
+        return effective.path
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware (streaming responses pass through untouched): opens the span list for the
+    request, adds the stages finished before the response starts as a Server-Timing header, and
+    records the request latency by route template once the body has been sent.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(spans, time.perf_counter() - started).encode("latin-1")))
+                # Lets the dashboard (another origin) read the entries through the Resource Timing API
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, _route_label(scope), scope.get("method", ""), str(status[0]))
@@ -0,0 +1,121 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` tokens, refilled continuously at capacity/period_s.
+    acquire() waits (without blocking the loop) until enough tokens are available.
+    """
+    def __init__(self, capacity: float, period_s: float = 60.0):
+        self.capacity = float(capacity)
+        self.refill_per_s = self.capacity / period_s
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_s)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters FIFO so a large request is not starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.refill_per_s)
+
+    def adjust(self, delta: float) -> None:
+        """Returns (positive) or charges (negative) tokens once the real cost is known."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + delta)
+
+class LLMGate:
+    """
+    Admission control for one Groq model: a concurrency cap plus request/minute and token/minute
+    buckets matching the account quotas. Records how long callers queue before being admitted.
+    """
+    def __init__(self, max_concurrency: int, requests_per_minute: int, tokens_per_minute: int, max_wait_s: float = 15.0):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_wait_s = max_wait_s
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_time_total_s = 0.0
+        self.queue_time_max_s = 0.0
+
+    async def _admit(self, estimated_tokens: int) -> None:
+        await self.request_bucket.acquire(1)
+        await self.token_bucket.acquire(estimated_tokens)
+        await self._semaphore.acquire()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """
+        Waits for a request slot. Raises asyncio.TimeoutError after max_wait_s so callers can fall back
+        instead of piling up behind an exhausted quota.
+        """
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._admit(estimated_tokens), timeout=self.max_wait_s)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+        queue_time = time.monotonic() - queued_at
+        self.admitted += 1
+        self.queue_time_total_s += queue_time
+        self.queue_time_max_s = max(self.queue_time_max_s, queue_time)
+        self.in_flight += 1
+        try:
+            yield queue_time
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_time_avg_ms": round(1000 * self.queue_time_total_s / self.admitted, 2) if self.admitted else 0.0,
+            "queue_time_max_ms": round(1000 * self.queue_time_max_s, 2),
+        }
+
+def estimate_tokens(*texts: Optional[str], max_tokens: int = 0) -> int:
+    """Rough prompt size (~4 characters per token) plus the completion budget."""
+    return sum(len(t) for t in texts if t) // 4 + max_tokens
+
+_gates: Dict[str, LLMGate] = {}
+
+def get_llm_gate(model: str) -> LLMGate:
+    """One gate per model, since Groq quotas are per model. Limits come from the environment."""
+    gate = _gates.get(model)
+    if gate is None:
+        gate = LLMGate(
+            max_concurrency=int(os.getenv("GROQ_MAX_CONCURRENCY", "8")),
+            requests_per_minute=int(os.getenv("GROQ_RPM", "30")),
+            tokens_per_minute=int(os.getenv("GROQ_TPM", "6000")),
+            max_wait_s=float(os.getenv("GROQ_MAX_QUEUE_WAIT_S", "15")),
+        )
+        _gates[model] = gate
+    return gate
+
+def llm_gate_stats() -> Dict[str, Dict[str, Any]]:
+    return {model: gate.stats() for model, gate in _gates.items()}
@@ -0,0 +1,169 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, BinaryIO, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tts_cache")
+
+def tts_cache_key(text: str, lang: str) -> str:
+    """Content address of a clip: identical (text, language) pairs always map to the same file."""
+    return hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()
+
+class TTSAudioCache:
+    """
+    Content-addressed on-disk MP3 cache with a total byte cap and LRU eviction.
+    Files live at <dir>/<key[:2]>/<key>.mp3 and are written via temp file + rename, so a reader
+    never sees a partial clip. Recency survives restarts through the files' mtimes.
+    """
+    def __init__(self, directory: str = DEFAULT_TTS_CACHE_DIR, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks: dict = {}
+        # Keys being written by a streaming tee(); a second stream for the same clip passes through
+        self._teeing: set = set()
+        self.hits = 0
+        self.misses = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    os.remove(path) # Leftover from an interrupted synthesis
+                elif name.endswith(".mp3"):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._index.pop(key, 0)
+            return None
+        return path
+
+    def get_or_create(self, text: str, lang: str, synthesize: Callable[[BinaryIO], None]) -> Tuple[str, str]:
+        """
+        Returns (key, path) for the clip, synthesizing it into the cache on a miss.
+        Concurrent requests for the same clip wait for one synthesis instead of repeating it.
+        """
+        key = tts_cache_key(text, lang)
+        path = self.get(key)
+        if path:
+            self.hits += 1
+            return key, path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            path = self.get(key)
+            if path:
+                self.hits += 1
+                return key, path
+            self.misses += 1
+            path = self.path_for(key)
+            fd, tmp_path = self._temp_file(key)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    synthesize(f)
+                self.commit(key, tmp_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return key, path
+
+    def _temp_file(self, key: str) -> Tuple[int, str]:
+        """A fresh temp file next to the clip's final path (unique per writer, so same-key writers never share one)."""
+        directory = os.path.dirname(self.path_for(key))
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=directory)
+
+    def tee(self, key: str, segments: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Passes streamed MP3 segments straight through to the caller while appending them to a temp
+        file, which is committed to the cache only if the stream finishes. No full-clip buffer is kept.
+        Only one stream per key writes; concurrent streams of the same clip just pass through.
+        """
+        with self._lock:
+            writer = key not in self._teeing
+            if writer:
+                self._teeing.add(key)
+        if not writer:
+            yield from segments
+            return
+
+        tmp_path = None
+        committed = False
+        try:
+            fd, tmp_path = self._temp_file(key)
+            with os.fdopen(fd, "wb") as f:
+                for segment in segments:
+                    f.write(segment)
+                    yield segment
+            self.commit(key, tmp_path)
+            committed = True
+        finally:
+            if not committed and tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                self._teeing.discard(key)
+
+    def commit(self, key: str, tmp_path: str) -> str:
+        """Atomically moves a fully written temp file into the cache under `key`."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes += size - self._index.get(key, 0)
+            self._index[key] = size
+            self._index.move_to_end(key)
+            self._evict()
+        return path
+
+    def _evict(self) -> None:
+        # Caller holds self._lock (or is the constructor). Never evicts the newest entry.
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
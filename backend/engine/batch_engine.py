@@ -0,0 +1,115 @@
+import numpy as np
+from typing import Dict, Optional, Union, Sequence
+
+from engine.crop_registry import crop_registry
+from engine.profit_calc import LONG_HAUL_THRESHOLD_KM, LONG_HAUL_RATE_MULTIPLIER
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+# Transit assumptions shared with the scalar map logic
+AVERAGE_TRANSPORT_SPEED_KMPH = 30.0
+MAX_REACHABLE_DISTANCE_KM = 500.0
+DEAD_ZONE_LOSS_THRESHOLD = 15.0
+
+def batch_quality_loss(crop_type: str, temp: ArrayLike, humidity: ArrayLike, hours_passed: ArrayLike) -> np.ndarray:
+    """
+    Vectorized twin of decay_logic.calculate_quality_loss.
+    Accepts scalars or arrays (broadcast together) and returns the loss fraction (0.0 to 1.0) per element.
+    """
+    model = crop_registry.resolve(crop_type)
+    hours_passed = np.asarray(hours_passed, dtype=np.float64)
+
+    # Precompiled Q10 / high-temperature curve, scaled for humidity-sensitive crops
+    relative_rate = model.relative_rates(temp) * model.humidity_factors(humidity)
+
+    quality_loss_pct = model.base_rate * relative_rate * hours_passed
+
+    # Cap loss at 1.0 (100%)
+    return np.minimum(1.0, quality_loss_pct)
+
+def batch_net_realization(
+    market_prices: ArrayLike,
+    crop_type: str,
+    distances_km: ArrayLike,
+    temp_c: ArrayLike,
+    humidity: ArrayLike,
+    hours_to_market: ArrayLike,
+    yield_est: float = 1.0,
+    transport_cost_per_km: ArrayLike = 15.0
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized twin of profit_calc.get_net_realization for many destinations at once.
+    Returns unrounded arrays: callers round at serialization time exactly like the scalar path does.
+    """
+    market_prices = np.asarray(market_prices, dtype=np.float64)
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    transport_cost_per_km = np.asarray(transport_cost_per_km, dtype=np.float64)
+    yield_divisor = max(1.0, yield_est)
+
+    # 1. Transport Cost per quintal (with the long-haul penalty beyond 250km)
+    transport_per_quintal = (distances_km * transport_cost_per_km) / yield_divisor
+    long_haul = (distances_km - LONG_HAUL_THRESHOLD_KM) * (transport_cost_per_km * LONG_HAUL_RATE_MULTIPLIER) / yield_divisor
+    transport_per_quintal = np.where(distances_km > LONG_HAUL_THRESHOLD_KM, transport_per_quintal + long_haul, transport_per_quintal)
+
+    # 2. Quality Loss (Spoilage penalty in INR)
+    loss_pct = batch_quality_loss(crop_type, temp_c, humidity, hours_to_market)
+    quality_loss_inr = loss_pct * market_prices
+
+    # 3. Final Calculation
+    net_realization = market_prices - transport_per_quintal - quality_loss_inr
+
+    return {
+        "net_profit_per_quintal": net_realization,
+        "transport_per_quintal": transport_per_quintal,
+        "quality_loss_pct": loss_pct,
+    }
+
+def resolve_transit_hours(distances_km: ArrayLike, transit_hours: Optional[ArrayLike] = None) -> np.ndarray:
+    """Routed travel times from the road matrix where given; None/NaN entries fall back to distance at 30 km/h."""
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    fallback = distances_km / AVERAGE_TRANSPORT_SPEED_KMPH
+    if transit_hours is None:
+        return fallback
+    routed = np.array([np.nan if h is None else h for h in np.ravel(transit_hours)], dtype=np.float64).reshape(np.shape(transit_hours))
+    return np.where(np.isnan(routed), fallback, routed)
+
+def evaluate_destinations(
+    crop: str,
+    yield_est: float,
+    temp_c: ArrayLike,
+    humidity: ArrayLike,
+    market_prices: ArrayLike,
+    distances_km: ArrayLike,
+    transport_rates: ArrayLike = 15.0,
+    transit_hours: Optional[ArrayLike] = None
+) -> Dict[str, np.ndarray]:
+    """
+    One vectorized pass over every candidate mandi.
+    Mirrors map_logic.calculate_spatial_profit: transit hours (routed where known, else 30 km/h),
+    the 500km reachability cut (skipped when there is only one mandi), net profit, loss % and dead-zone flags.
+    """
+    market_prices = np.asarray(market_prices, dtype=np.float64)
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+
+    estimated_transit_hours = resolve_transit_hours(distances_km, transit_hours)
+
+    if distances_km.size > 1:
+        is_reachable = distances_km <= MAX_REACHABLE_DISTANCE_KM
+    else:
+        is_reachable = np.ones(distances_km.shape, dtype=bool)
+
+    result = batch_net_realization(
+        market_prices=market_prices,
+        crop_type=crop,
+        distances_km=distances_km,
+        temp_c=temp_c,
+        humidity=humidity,
+        hours_to_market=estimated_transit_hours,
+        yield_est=yield_est,
+        transport_cost_per_km=transport_rates
+    )
+
+    result["estimated_transit_hours"] = estimated_transit_hours
+    result["is_dead_zone"] = result["quality_loss_pct"] > DEAD_ZONE_LOSS_THRESHOLD
+    result["is_reachable"] = is_reachable
+    return result
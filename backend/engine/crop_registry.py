@@ -0,0 +1,160 @@
+import os
+import json
+import logging
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CROPS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "crops.json")
+
+# Temperature grid of the precompiled decay curves; readings outside it are clamped to the edges
+LUT_MIN_C = -10.0
+LUT_MAX_C = 60.0
+LUT_STEP_C = 0.01
+LUT_SCALE = 1.0 / LUT_STEP_C
+LUT_SIZE = int(round((LUT_MAX_C - LUT_MIN_C) * LUT_SCALE)) + 1
+LUT_TEMPS = np.round(LUT_MIN_C + np.arange(LUT_SIZE) * LUT_STEP_C, 6)
+
+# Distinct raw crop spellings remembered by CropRegistry.resolve
+RESOLVE_CACHE_SIZE = 4096
+
+def _compile_relative_rate(table: List[float]) -> Callable[[float], float]:
+    lo, scale, last = LUT_MIN_C, LUT_SCALE, LUT_SIZE - 1
+
+    def relative_rate(temp: float) -> float:
+        """Relative decay rate at `temp` (1.0 at the crop's base temperature)."""
+        pos = (temp - lo) * scale
+        if 0.0 < pos < last:
+            i = int(pos)
+            low = table[i]
+            return low + (table[i + 1] - low) * (pos - i)
+        return table[0] if pos <= 0.0 else table[last]
+    return relative_rate
+
+def _compile_hourly_loss(table: List[float], humidity_per_pct: float, humidity_reference: float) -> Callable[[float, float], float]:
+    if not humidity_per_pct:
+        # Same body as relative_rate, inlined: most crops take this path and it saves a nested call
+        lo, scale, last = LUT_MIN_C, LUT_SCALE, LUT_SIZE - 1
+
+        def hourly_loss(temp: float, humidity: float) -> float:
+            """Loss fraction per hour at these conditions (base rate x temperature curve)."""
+            pos = (temp - lo) * scale
+            if 0.0 < pos < last:
+                i = int(pos)
+                low = table[i]
+                return low + (table[i + 1] - low) * (pos - i)
+            return table[0] if pos <= 0.0 else table[last]
+        return hourly_loss
+
+    rate_at = _compile_relative_rate(table)
+
+    def hourly_loss(temp: float, humidity: float) -> float:
+        """Loss fraction per hour at these conditions (base rate x temperature curve x humidity factor)."""
+        if humidity > humidity_reference:
+            return rate_at(temp) * (1.0 + humidity_per_pct * (humidity - humidity_reference))
+        return rate_at(temp)
+    return hourly_loss
+
+class CropModel:
+    """
+    Decay parameters of one crop plus its temperature -> relative-rate curve, compiled once.
+
+    relative rate(T) = Q10^((T - T_base) / 10) * (1 + slope * max(0, T - threshold))
+    humidity factor(H) = 1 + sensitivity * max(0, H - reference) / 10
+    The curve is tabulated on a 0.01C grid and linearly interpolated, so the per-call cost is two
+    array reads whatever the crop.
+    """
+    def __init__(self, key: str, spec: Dict[str, Any]):
+        self.key = key
+        self.display_name = spec.get("display_name", key.capitalize())
+        self.category = spec.get("category", "perishable")
+        self.base_rate = float(spec["base_rate_per_hour"])
+        self.q10 = float(spec["q10"])
+        self.t_base_c = float(spec["t_base_c"])
+        self.high_temp_threshold_c = float(spec["high_temp_threshold_c"])
+        self.high_temp_slope_per_c = float(spec["high_temp_slope_per_c"])
+        self.humidity_reference_pct = float(spec["humidity_reference_pct"])
+        self.humidity_sensitivity = float(spec["humidity_sensitivity"])
+        self.aliases: List[str] = list(spec.get("aliases", []))
+
+        curve = np.power(self.q10, (LUT_TEMPS - self.t_base_c) / 10.0)
+        if self.high_temp_slope_per_c:
+            curve = curve * (1.0 + self.high_temp_slope_per_c * np.maximum(0.0, LUT_TEMPS - self.high_temp_threshold_c))
+        self.rate_lut = curve
+        self._humidity_per_pct = self.humidity_sensitivity / 10.0
+        # Scalar hot path: closures over plain-float tables (no attribute or global lookups per call)
+        self.relative_rate = _compile_relative_rate(curve.tolist())
+        self.hourly_loss = _compile_hourly_loss(
+            (curve * self.base_rate).tolist(), self._humidity_per_pct, self.humidity_reference_pct
+        )
+
+    def relative_rates(self, temps: np.ndarray) -> np.ndarray:
+        pos = np.clip((np.asarray(temps, dtype=np.float64) - LUT_MIN_C) * LUT_SCALE, 0.0, LUT_SIZE - 1)
+        i = np.minimum(pos.astype(np.int64), LUT_SIZE - 2)
+        low = self.rate_lut[i]
+        return low + (self.rate_lut[i + 1] - low) * (pos - i)
+
+    def humidity_factors(self, humidity: np.ndarray) -> Any:
+        if not self._humidity_per_pct:
+            return 1.0
+        return 1.0 + self._humidity_per_pct * np.maximum(0.0, np.asarray(humidity, dtype=np.float64) - self.humidity_reference_pct)
+
+class CropRegistry:
+    """
+    Crop decay models loaded from data/crops.json, keyed by canonical name and every alias
+    (regional names such as Kanda, Batata, Gehun). Resolution is one dict lookup, so adding crops
+    never adds per-call cost. Unknown crops get the fallback crop's model (the conservative,
+    fast-decaying Tomato) and are logged the first time they are seen.
+    """
+    def __init__(self, path: str = DEFAULT_CROPS_PATH):
+        self.path = path
+        self.models: Dict[str, CropModel] = {}
+        self._by_name: Dict[str, CropModel] = {}
+        # Raw caller spellings ('Tomato', ' kanda') -> model, so repeat lookups skip normalization
+        self._resolved: Dict[str, CropModel] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        defaults = raw.get("defaults", {})
+        models = {key.lower(): CropModel(key.lower(), {**defaults, **spec}) for key, spec in raw["crops"].items()}
+        by_name: Dict[str, CropModel] = {}
+        for key, model in models.items():
+            for name in [key, *model.aliases]:
+                name = name.strip().lower()
+                if by_name.get(name, model) is not model:
+                    logger.warning(f"Crop alias '{name}' is claimed by both {by_name[name].key} and {key}; keeping {by_name[name].key}")
+                    continue
+                by_name[name] = model
+        self.fallback = models[raw.get("fallback_crop", "tomato")]
+        self.models, self._by_name, self._resolved = models, by_name, {}
+        logger.info(f"Crop registry loaded: {len(models)} crops, {len(by_name) - len(models)} aliases")
+
+    def get(self, crop: str) -> Optional[CropModel]:
+        """The crop's model, or None if neither a crop nor an alias."""
+        return self._by_name.get(crop.strip().lower()) if crop else None
+
+    def resolve(self, crop: str) -> CropModel:
+        model = self._resolved.get(crop)
+        if model is not None:
+            return model
+        model = self.get(crop)
+        if model is None:
+            model = self.fallback
+            logger.warning(f"Unknown crop '{crop}': using the {self.fallback.display_name} decay model")
+        # Crop names come from user input, so the memo (and with it the unknown-crop warnings) is bounded
+        if len(self._resolved) < RESOLVE_CACHE_SIZE:
+            self._resolved[crop] = model
+        return model
+
+    def canonical_name(self, crop: str) -> str:
+        """'Kanda ' -> 'onion'; names that are not in the registry are only normalized."""
+        name = crop.strip().lower() if crop else ""
+        model = self._by_name.get(name)
+        return model.key if model is not None else name
+
+# Singleton
+crop_registry = CropRegistry(os.getenv("CROP_REGISTRY_PATH", DEFAULT_CROPS_PATH))
@@ -1,40 +1,21 @@
-import math
+from engine.crop_registry import crop_registry
+
+def get_base_decay_rate(crop_type: str) -> float:
+    """Returns the baseline loss-per-hour at 20C for a crop or alias (Tomato if unknown)."""
+    return crop_registry.resolve(crop_type).base_rate
 
 def calculate_quality_loss(crop_type: str, temp: float, humidity: float, hours_passed: float) -> float:
     """
     MittiMitra Optimization Formula: Decay Function.
-    Calculates percentage of quality loss using Q10 coefficient.
+    Calculates percentage of quality loss using the crop's Q10 coefficient.
     
-    Q10 Calculation: Rate doubles every 10C.
+    Q10 Calculation: Rate multiplies by Q10 every 10C.
     Formula: R2 = R1 * Q10^((T2-T1)/10)
-    Base condition: T1 = 20C.
+    Base condition: T1 = 20C. Perishables accelerate further above their high-temperature
+    threshold, and humidity-sensitive crops above their reference humidity (engine/crop_registry.py).
+    The temperature curve is precompiled per crop, so this is a table read rather than a pow().
     """
-    Q10 = 2.0
-    T_BASE = 20.0
-    
-    # Crop-specific baseline decay rates (loss per hour at 20C)
-    # Perishables lose quality fast; non-perishables are durable.
-    DECAY_RATES = {
-        "Tomato": 0.005,      # 0.5% per hour
-        "Onion": 0.001,       # 0.1% per hour
-        "Cotton": 0.00001,    # Virtually zero loss over days
-        "Wheat": 0.00002,     # Virtually zero loss over days
-        "Rice": 0.00002,
-        "Potato": 0.0005,
-    }
-    
-    # Default to Tomato (conservative) if unknown
-    base_rate = DECAY_RATES.get(crop_type.capitalize(), 0.005)
-    
-    # Standard Q10 exponential decay
-    relative_rate = math.pow(Q10, (temp - T_BASE) / 10.0)
-    
-    # High-temperature acceleration logic for perishables
-    if temp > 30 and base_rate > 0.0001:
-        high_temp_multiplier = 1.0 + ((temp - 30) * 0.10)
-        relative_rate *= high_temp_multiplier
-        
-    quality_loss_pct = base_rate * relative_rate * hours_passed
+    quality_loss_pct = crop_registry.resolve(crop_type).hourly_loss(temp, humidity) * hours_passed
     
     # Cap loss at 1.0 (100%)
     return min(1.0, quality_loss_pct)
@@ -0,0 +1,248 @@
+import math
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from engine.spatial_index import haversine_km, EARTH_RADIUS_KM, KM_PER_DEGREE_LAT
+
+ArrayLike = Any
+
+# Shared vehicle profile: a ~10 tonne truck at the baseline small-transport rate
+VEHICLE_CAPACITY_QUINTALS = 100.0
+VEHICLE_RATE_PER_KM = 15.0
+# Shipments co-load only when they leave within the same window...
+DEPARTURE_WINDOW_HOURS = 6.0
+# ...and their pickups are within this radius of the vehicle's collection point
+PICKUP_RADIUS_KM = 10.0
+
+def departure_window(departure_hours: ArrayLike, window_hours: float = DEPARTURE_WINDOW_HOURS) -> np.ndarray:
+    return np.floor(np.asarray(departure_hours, dtype=np.float64) / window_hours).astype(np.int64)
+
+class CoLoadPlan:
+    """
+    Result of match_loads: per-shipment vehicle assignment and cost split, plus per-vehicle
+    aggregates indexed by (mandi, window) so a prospective shipment can be quoted against
+    vehicles with spare capacity without re-running the matcher.
+    """
+
+    def __init__(self, capacity: float, rate_per_km: float, pickup_radius_km: float):
+        self.capacity = capacity
+        self.rate_per_km = rate_per_km
+        self.pickup_radius_km = pickup_radius_km
+        # Per shipment
+        self.vehicle_of = np.zeros(0, dtype=np.int64)
+        self.shared_cost = np.zeros(0)
+        self.solo_cost = np.zeros(0)
+        self.effective_rate_per_km = np.zeros(0)
+        # Per vehicle
+        self.vehicle_mandi = np.zeros(0, dtype=np.int64)
+        self.vehicle_window = np.zeros(0, dtype=np.int64)
+        self.vehicle_lat = np.zeros(0)
+        self.vehicle_lng = np.zeros(0)
+        self.vehicle_load = np.zeros(0)
+        self.vehicle_members = np.zeros(0, dtype=np.int64)
+        self.vehicle_max_km = np.zeros(0)
+        self.vehicle_collection_km = np.zeros(0)
+        self.vehicle_quintal_km = np.zeros(0)
+        self._by_route: Dict[Tuple[int, int], np.ndarray] = {}
+
+    @property
+    def n_vehicles(self) -> int:
+        return len(self.vehicle_load)
+
+    def _index_routes(self) -> None:
+        self._by_route = {}
+        if not self.n_vehicles:
+            return
+        order = np.lexsort((self.vehicle_window, self.vehicle_mandi))
+        keys = np.stack([self.vehicle_mandi[order], self.vehicle_window[order]], axis=1)
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        for start, stop in zip(starts, np.r_[starts[1:], len(order)]):
+            self._by_route[(int(keys[start, 0]), int(keys[start, 1]))] = order[start:stop]
+
+    def quote(self, mandi_id: int, window: int, lat: float, lng: float, quantity: float, distance_km: float) -> Optional[Dict[str, Any]]:
+        """
+        Cheapest share of an existing vehicle for a new shipment, or None if no vehicle to this
+        mandi in this window has room within pickup radius (or joining would cost more than going alone).
+        """
+        vehicles = self._by_route.get((mandi_id, window))
+        if vehicles is None or distance_km <= 0:
+            return None
+        spare = self.capacity - self.vehicle_load[vehicles]
+        detour = haversine_km(lat, lng, self.vehicle_lat[vehicles], self.vehicle_lng[vehicles])
+        fits = (spare >= quantity) & (detour <= self.pickup_radius_km)
+        if not fits.any():
+            return None
+        vehicles, detour = vehicles[fits], detour[fits]
+        trip_km = np.maximum(self.vehicle_max_km[vehicles], distance_km) + self.vehicle_collection_km[vehicles] + detour
+        own_quintal_km = quantity * distance_km
+        share = trip_km * self.rate_per_km * own_quintal_km / (self.vehicle_quintal_km[vehicles] + own_quintal_km)
+        best = int(np.argmin(share))
+        shared_cost = float(share[best])
+        if shared_cost >= distance_km * self.rate_per_km:
+            return None
+        return {
+            "vehicle_id": int(vehicles[best]),
+            "co_loaders": int(self.vehicle_members[vehicles[best]]),
+            "shared_cost": shared_cost,
+            "effective_rate_per_km": shared_cost / distance_km,
+        }
+
+_NEIGHBOURS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+def _km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Scalar haversine for the merge loop (avoids per-pair numpy overhead)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+def _pack_first_fit(members: np.ndarray, quantities: np.ndarray, capacity: float) -> List[List[int]]:
+    """First-fit decreasing bin packing; `members` is already sorted by quantity descending."""
+    bins: List[List[int]] = []
+    loads: List[float] = []
+    for i in members:
+        q = quantities[i]
+        for b, load in enumerate(loads):
+            if load + q <= capacity:
+                bins[b].append(int(i))
+                loads[b] = load + q
+                break
+        else:
+            bins.append([int(i)])
+            loads.append(q)
+    return bins
+
+def match_loads(
+    lats: ArrayLike,
+    lngs: ArrayLike,
+    mandi_ids: ArrayLike,
+    departure_hours: ArrayLike,
+    quantities: ArrayLike,
+    distances_km: ArrayLike,
+    capacity: float = VEHICLE_CAPACITY_QUINTALS,
+    rate_per_km: float = VEHICLE_RATE_PER_KM,
+    window_hours: float = DEPARTURE_WINDOW_HOURS,
+    pickup_radius_km: float = PICKUP_RADIUS_KM
+) -> CoLoadPlan:
+    """
+    Groups pending shipments into shared vehicles.
+
+    1. Bucket by (destination mandi, departure window, pickup grid cell of ~pickup_radius_km):
+       one lexsort, no pairwise comparison.
+    2. First-fit-decreasing pack each bucket under vehicle capacity.
+    3. Merge under-filled vehicles with those in the 8 neighbouring cells of the same route when
+       the combined load fits and their collection points are within pickup radius.
+
+    Trip cost = rate x (farthest member's distance + collection legs to the vehicle's
+    collection point), split in proportion to quintal-km and never above the solo trip cost.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    mandi_ids = np.asarray(mandi_ids, dtype=np.int64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    windows = departure_window(departure_hours, window_hours)
+    n = len(lats)
+
+    plan = CoLoadPlan(capacity, rate_per_km, pickup_radius_km)
+    if n == 0:
+        return plan
+
+    cell_deg = pickup_radius_km / KM_PER_DEGREE_LAT
+    rows = np.floor(lats / cell_deg).astype(np.int64)
+    cols = np.floor(lngs / cell_deg).astype(np.int64)
+
+    # 1 + 2. One sort makes every bucket contiguous. A bucket within capacity is one vehicle as is;
+    # only over-full buckets go through first-fit-decreasing packing.
+    keys = np.stack([mandi_ids, windows, rows, cols], axis=1)
+    order = np.lexsort((-quantities, cols, rows, windows, mandi_ids))
+    sorted_keys = keys[order]
+    is_start = np.r_[True, np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)]
+    starts = np.flatnonzero(is_start)
+    stops = np.r_[starts[1:], n]
+    vehicle_of = np.empty(n, dtype=np.int64)
+    vehicle_of[order] = np.cumsum(is_start) - 1
+    bucket_load = np.bincount(vehicle_of, weights=quantities, minlength=len(starts))
+
+    n_vehicles = len(starts)
+    for b in np.flatnonzero(bucket_load > capacity):
+        for k, members in enumerate(_pack_first_fit(order[starts[b]:stops[b]], quantities, capacity)):
+            if k:
+                vehicle_of[members] = n_vehicles
+                n_vehicles += 1
+
+    vehicle_key = np.empty((n_vehicles, 4), dtype=np.int64)
+    vehicle_key[vehicle_of] = keys
+    loads = np.bincount(vehicle_of, weights=quantities, minlength=n_vehicles)
+    weights = np.where(loads > 0, loads, 1.0)
+    centroid_lat = (np.bincount(vehicle_of, weights=quantities * lats, minlength=n_vehicles) / weights).tolist()
+    centroid_lng = (np.bincount(vehicle_of, weights=quantities * lngs, minlength=n_vehicles) / weights).tolist()
+    loads = loads.tolist()
+
+    # 3. Merge under-filled vehicles with those in the 8 neighbouring cells of the same route
+    open_by_cell: Dict[Tuple[int, ...], List[int]] = {}
+    cells = [tuple(k) for k in vehicle_key.tolist()]
+    for v in range(n_vehicles):
+        if loads[v] < capacity:
+            open_by_cell.setdefault(cells[v], []).append(v)
+    merged_into = list(range(n_vehicles))
+    for v in range(n_vehicles):
+        if merged_into[v] != v or loads[v] >= capacity:
+            continue
+        mandi, window, row, col = cells[v]
+        for dr, dc in _NEIGHBOURS:
+            for u in open_by_cell.get((mandi, window, row + dr, col + dc), ()):
+                if merged_into[u] != u or loads[v] + loads[u] > capacity:
+                    continue
+                if _km(centroid_lat[v], centroid_lng[v], centroid_lat[u], centroid_lng[u]) > pickup_radius_km:
+                    continue
+                total = loads[v] + loads[u]
+                if total > 0:
+                    centroid_lat[v] = (centroid_lat[v] * loads[v] + centroid_lat[u] * loads[u]) / total
+                    centroid_lng[v] = (centroid_lng[v] * loads[v] + centroid_lng[u] * loads[u]) / total
+                loads[v], loads[u] = total, 0.0
+                merged_into[u] = v
+
+    # Resolve merge chains and renumber vehicles densely
+    roots = np.asarray(merged_into, dtype=np.int64)
+    while True:
+        parents = roots[roots]
+        if np.array_equal(parents, roots):
+            break
+        roots = parents
+    kept, vehicle_of = np.unique(roots[vehicle_of], return_inverse=True)
+    vehicle_of = vehicle_of.reshape(-1)
+    n_vehicles = len(kept)
+
+    # Per-vehicle aggregates and the cost split
+    plan.vehicle_of = vehicle_of
+    plan.vehicle_mandi = vehicle_key[kept, 0]
+    plan.vehicle_window = vehicle_key[kept, 1]
+    plan.vehicle_load = np.bincount(vehicle_of, weights=quantities, minlength=n_vehicles)
+    plan.vehicle_members = np.bincount(vehicle_of, minlength=n_vehicles)
+    weights = np.where(plan.vehicle_load > 0, plan.vehicle_load, 1.0)
+    plan.vehicle_lat = np.bincount(vehicle_of, weights=quantities * lats, minlength=n_vehicles) / weights
+    plan.vehicle_lng = np.bincount(vehicle_of, weights=quantities * lngs, minlength=n_vehicles) / weights
+
+    # Great-circle leg from each pickup to its vehicle's collection point (vectorized over shipments)
+    phi1, phi2 = np.radians(lats), np.radians(plan.vehicle_lat[vehicle_of])
+    dphi = phi2 - phi1
+    dlmb = np.radians(plan.vehicle_lng[vehicle_of] - lngs)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    collection_leg = 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    quintal_km = quantities * distances_km
+    plan.vehicle_max_km = np.zeros(n_vehicles)
+    np.maximum.at(plan.vehicle_max_km, vehicle_of, distances_km)
+    plan.vehicle_collection_km = np.bincount(vehicle_of, weights=collection_leg, minlength=n_vehicles)
+    plan.vehicle_quintal_km = np.bincount(vehicle_of, weights=quintal_km, minlength=n_vehicles)
+
+    trip_cost = (plan.vehicle_max_km + plan.vehicle_collection_km) * rate_per_km
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = trip_cost[vehicle_of] * quintal_km / plan.vehicle_quintal_km[vehicle_of]
+    plan.solo_cost = distances_km * rate_per_km
+    plan.shared_cost = np.where(np.isfinite(share), np.minimum(share, plan.solo_cost), plan.solo_cost)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        plan.effective_rate_per_km = np.where(distances_km > 0, plan.shared_cost / distances_km, rate_per_km)
+    plan._index_routes()
+    return plan
@@ -1,64 +1,74 @@
-from typing import List, Dict, Any
-from engine.profit_calc import get_net_realization
+from typing import List, Dict, Any, Optional
+from engine.batch_engine import evaluate_destinations
 
 def calculate_spatial_profit(
     crop: str, 
     yield_est: float, 
     temp_c: float, 
     humidity: float, 
-    available_mandis: List[Dict[str, Any]]
+    available_mandis: List[Dict[str, Any]],
+    destination_weather: Optional[List[Optional[Dict[str, Any]]]] = None
 ) -> List[Dict[str, Any]]:
     """
     Evaluates multiple destination mandis and calculates Net Realization for each.
     Returns the list sorted by most profitable first.
+    destination_weather (aligned with available_mandis) lets spoilage use the mean of origin and
+    destination conditions over the trip instead of the origin reading alone.
     """
+    if not available_mandis:
+        return []
+
+    transit_temps = [temp_c] * len(available_mandis)
+    transit_humidity = [humidity] * len(available_mandis)
+    if destination_weather:
+        for i, dest in enumerate(destination_weather):
+            if dest and dest.get("is_verified_env"):
+                transit_temps[i] = (temp_c + dest["temperature_c"]) / 2.0
+                transit_humidity[i] = (humidity + dest["humidity_percent"]) / 2.0
+
+    # Evaluate every destination in one vectorized pass (see engine/batch_engine.py)
+    evaluated = evaluate_destinations(
+        crop=crop,
+        yield_est=yield_est,
+        temp_c=transit_temps,
+        humidity=transit_humidity,
+        market_prices=[mandi["current_price"] for mandi in available_mandis],
+        distances_km=[mandi["distance_km"] for mandi in available_mandis],
+        transport_rates=[mandi.get("transport_rate_per_km", 15.0) for mandi in available_mandis],
+        # Routed travel time from the road matrix where the mandi has one
+        transit_hours=[mandi.get("transit_hours") for mandi in available_mandis]
+    )
+
     results = []
     
-    for mandi in available_mandis:
-        price = mandi["current_price"]
-        dist = mandi["distance_km"]
-        
+    for i, mandi in enumerate(available_mandis):
         # Completely exclude mandis that are unrealistically far away for a smallholder farmer (>500km)
         # unless it is the ONLY mandi available
-        if dist > 500 and len(available_mandis) > 1:
+        if not evaluated["is_reachable"][i]:
             continue
-            
-        # Estimate transit time (assume 30 km/hr average speed for agricultural transport)
-        estimated_transit_hours = dist / 30.0
         
-        # We need to calculate profit per quintal first
-        net_profit_per_quintal = get_net_realization(
-            market_price=price,
-            crop_type=crop,
-            distance_km=dist,
-            temp_c=temp_c,
-            humidity=humidity,
-            hours_to_market=estimated_transit_hours,
-            yield_est=yield_est,
-            transport_cost_per_km=mandi.get("transport_rate_per_km", 15.0)
-        )
+        # Same rounding as get_net_realization, so results match the scalar engine
+        net_profit_per_quintal = round(float(evaluated["net_profit_per_quintal"][i]), 2)
         
         # Total profit based on yield
         total_net_profit = net_profit_per_quintal * yield_est
         
-        # Calculate raw quality loss percentage for visualization
-        from engine.decay_logic import calculate_quality_loss
-        loss_pct = calculate_quality_loss(crop, temp_c, humidity, estimated_transit_hours)
-        
-        # Flag "Dead Zones" where spoilage risk is critically high (>15%) due to distance/heat
-        is_dead_zone = loss_pct > 15.0
-        
         results.append({
             "mandi_name": mandi["name"],
-            "distance_km": dist,
-            "estimated_transit_hours": round(estimated_transit_hours, 1),
-            "market_price": price,
-            "net_profit_per_quintal": round(net_profit_per_quintal, 2),
+            "distance_km": mandi["distance_km"],
+            "estimated_transit_hours": round(float(evaluated["estimated_transit_hours"][i]), 1),
+            "market_price": mandi["current_price"],
+            "transport_rate_per_km": round(float(mandi.get("transport_rate_per_km", 15.0)), 2),
+            "transit_temperature_c": round(transit_temps[i], 1),
+            "net_profit_per_quintal": net_profit_per_quintal,
             "total_net_profit": round(total_net_profit, 2),
-            "quality_loss_pct": round(loss_pct, 2),
-            "is_dead_zone": is_dead_zone,
+            "quality_loss_pct": round(float(evaluated["quality_loss_pct"][i]), 2),
+            # Flag "Dead Zones" where spoilage risk is critically high (>15%) due to distance/heat
+            "is_dead_zone": bool(evaluated["is_dead_zone"][i]),
             "is_recommended": False # Will be set later
         })
+        if mandi.get("co_load"):
+            results[-1]["co_load"] = mandi["co_load"]
         
     # Sort by total net profit, descending
     results.sort(key=lambda x: x["total_net_profit"], reverse=True)
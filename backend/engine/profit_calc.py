@@ -1,5 +1,9 @@
 from .decay_logic import calculate_quality_loss
 
+# Distances beyond this are penalised to discourage unrealistic cross-country transport
+LONG_HAUL_THRESHOLD_KM = 250.0
+LONG_HAUL_RATE_MULTIPLIER = 1.5
+
 def get_net_realization(
     market_price: float, 
     crop_type: str,
@@ -20,8 +24,8 @@ def get_net_realization(
     transport_per_quintal = (distance_km * transport_cost_per_km) / max(1.0, yield_est)
     
     # Add a heavy penalty for distances > 250km to discourage unrealistic cross-country transport for smallholders
-    if distance_km > 250:
-        transport_per_quintal += (distance_km - 250) * (transport_cost_per_km * 1.5) / max(1.0, yield_est)
+    if distance_km > LONG_HAUL_THRESHOLD_KM:
+        transport_per_quintal += (distance_km - LONG_HAUL_THRESHOLD_KM) * (transport_cost_per_km * LONG_HAUL_RATE_MULTIPLIER) / max(1.0, yield_est)
 
     # 2. Quality Loss (Spoilage penalty in INR)
     # Note: calculate_quality_loss returns a percentage (0.0 to 1.0)
@@ -0,0 +1,125 @@
+import os
+import json
+import math
+import time
+import logging
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine.spatial_index import haversine_km
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROAD_MATRIX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "road_matrix")
+
+# Origin cells share the weather grid's resolution (~11 km)
+ROAD_GRID_DEG = 0.1
+# Compact storage: uint16 distance in 0.1 km (max ~6553 km) and duration in minutes (max ~1092 h)
+DISTANCE_UNIT_KM = 0.1
+DURATION_UNIT_H = 1.0 / 60.0
+MISSING = np.iinfo(np.uint16).max
+
+def road_cell(lat: float, lng: float) -> Tuple[int, int]:
+    return (int(math.floor(lat / ROAD_GRID_DEG)), int(math.floor(lng / ROAD_GRID_DEG)))
+
+def road_mandi_key(name: str) -> str:
+    name = name.strip().lower()
+    for suffix in (" mandi", " apmc"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name.strip()
+
+class RoadMatrix:
+    """
+    Offline-built origin-cell x mandi road distance and travel-time matrix.
+
+    Two uint16 memmaps of shape (n_cells, n_mandis) plus index.json (cell -> row, mandi -> column,
+    and the versioned data files it belongs to), produced by scripts/build_road_matrix.py from a
+    local road-graph extract. A lookup is two dict hits and a row slice; pairs the build did not
+    cover come back as NaN so callers fall back to haversine. Re-mapped when the build publishes a
+    new index; the maps and memmaps are swapped in as one tuple, so a lookup on another thread sees
+    either the old matrix or the new one, never a mix.
+    """
+
+    def __init__(self, directory: str = DEFAULT_ROAD_MATRIX_DIR, check_interval_s: float = 30.0):
+        self.directory = directory
+        self.check_interval_s = check_interval_s
+        # (cells, mandis, distance, duration), published by a single assignment
+        self._matrix: Optional[Tuple[Dict[Tuple[int, int], int], Dict[str, int], np.memmap, np.memmap]] = None
+        self._index_mtime: Optional[float] = None
+        self._last_check = 0.0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _ensure_fresh(self) -> bool:
+        now = time.monotonic()
+        if self._matrix is not None and now - self._last_check < self.check_interval_s:
+            return True
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except FileNotFoundError:
+            return self._matrix is not None
+        if mtime == self._index_mtime:
+            return True
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            # The index names its own data files and their shape, so a build publishing a new
+            # matrix never pairs this index with another build's data
+            files = index.get("files", {"distance": "distance.u16", "duration": "duration.u16"})
+            shape = tuple(index.get("shape", (len(index["cells"]), len(index["mandis"]))))
+            distance = np.memmap(os.path.join(self.directory, files["distance"]), dtype=np.uint16, mode="r", shape=shape)
+            duration = np.memmap(os.path.join(self.directory, files["duration"]), dtype=np.uint16, mode="r", shape=shape)
+        except Exception as e:
+            logger.warning(f"Road matrix unavailable, using haversine: {e}")
+            return self._matrix is not None
+        cells = {tuple(int(x) for x in key.split(",")): row for key, row in index["cells"].items()}
+        mandis = {name: col for name, col in index["mandis"].items()}
+        self._matrix = (cells, mandis, distance, duration)
+        self._index_mtime = mtime
+        logger.info(f"Road matrix loaded: {shape[0]} cells x {shape[1]} mandis")
+        return True
+
+    def __len__(self) -> int:
+        return len(self._matrix[0]) if self._ensure_fresh() else 0
+
+    def lookup(self, lat: float, lng: float, mandi_names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(road distance km, travel hours) per mandi from the origin's cell; NaN where not covered."""
+        distance = np.full(len(mandi_names), np.nan)
+        duration = np.full(len(mandi_names), np.nan)
+        if not self._ensure_fresh():
+            return distance, duration
+        # One read of the published matrix: a concurrent reload cannot mix generations
+        cells, mandis, distance_map, duration_map = self._matrix
+        row = cells.get(road_cell(lat, lng))
+        if row is None:
+            return distance, duration
+        cols = np.array([mandis.get(road_mandi_key(name), -1) for name in mandi_names], dtype=np.int64)
+        known = cols >= 0
+        if known.any():
+            raw_distance = distance_map[row, cols[known]]
+            raw_duration = duration_map[row, cols[known]]
+            distance[known] = np.where(raw_distance == MISSING, np.nan, raw_distance * DISTANCE_UNIT_KM)
+            duration[known] = np.where(raw_duration == MISSING, np.nan, raw_duration * DURATION_UNIT_H)
+        return distance, duration
+
+    def route(self, lat: float, lng: float, mandis: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distances and transit hours for mandi dicts (name, lat, lng): road values where the matrix
+        covers the pair, haversine distance with NaN transit hours (engine default speed) otherwise.
+        """
+        distance, duration = self.lookup(lat, lng, [m["name"] for m in mandis])
+        missing = np.isnan(distance)
+        if missing.any():
+            lats = np.array([m.get("lat", np.nan) for m in mandis], dtype=float)[missing]
+            lngs = np.array([m.get("lng", np.nan) for m in mandis], dtype=float)[missing]
+            distance[missing] = haversine_km(lat, lng, lats, lngs)
+            duration[missing] = np.nan
+        return distance, duration
+
+# Singleton
+road_matrix = RoadMatrix(os.getenv("ROAD_MATRIX_DIR", DEFAULT_ROAD_MATRIX_DIR))
@@ -0,0 +1,237 @@
+import os
+import json
+import logging
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine.shock_analyzer import classify_price_shock, detect_volume_shock
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (7, 14, 30)
+DEFAULT_STATS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "rolling_stats.npz")
+
+# Running sums are rebuilt exactly from the ring every this many ticks to stop float drift
+RESYNC_TICKS = 256
+# Relative variance below this is float noise (a perfectly stable market)
+FLAT_VARIANCE_EPS = 1e-12
+
+def stats_key(commodity: str, market: str) -> str:
+    return f"{commodity.strip().lower()}|{market.strip().lower()}"
+
+class RollingStatsIndex:
+    """
+    Per-(commodity, mandi) rolling price/volume statistics over several window lengths.
+
+    Struct-of-arrays layout: every series owns one row of a ring buffer holding its last
+    max(windows) ticks, plus running sum / sum-of-squares per window. A tick subtracts the
+    value leaving each window and adds the new one, so mean, stdev, z-score and volume ratio
+    are O(1) lookups instead of re-reducing a history list per request.
+    """
+
+    def __init__(self, windows: Sequence[int] = WINDOWS, capacity: int = 1024):
+        self.windows = tuple(sorted(windows))
+        self.max_window = self.windows[-1]
+        self.keys: Dict[str, int] = {}
+        # Caller's bookkeeping saved alongside the arrays (e.g. the last ingested archive day)
+        self.meta: Dict[str, Any] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        n_windows = len(self.windows)
+        self.prices = np.full((capacity, self.max_window), np.nan)
+        self.volumes = np.full((capacity, self.max_window), np.nan)
+        self.head = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.price_sum = np.zeros((capacity, n_windows))
+        self.price_sumsq = np.zeros((capacity, n_windows))
+        self.volume_sum = np.zeros((capacity, n_windows))
+        self.volume_n = np.zeros((capacity, n_windows), dtype=np.int64)
+
+    def _grow(self, capacity: int) -> None:
+        old = {name: getattr(self, name) for name in self._ARRAYS}
+        self._allocate(capacity)
+        for name, values in old.items():
+            getattr(self, name)[: len(values)] = values
+
+    _ARRAYS = ("prices", "volumes", "head", "count", "price_sum", "price_sumsq", "volume_sum", "volume_n")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def row_for(self, commodity: str, market: str, create: bool = True) -> Optional[int]:
+        key = stats_key(commodity, market)
+        row = self.keys.get(key)
+        if row is None and create:
+            row = len(self.keys)
+            if row >= len(self.head):
+                self._grow(len(self.head) * 2)
+            self.keys[key] = row
+        return row
+
+    def _window_index(self, window: int) -> int:
+        try:
+            return self.windows.index(window)
+        except ValueError:
+            raise ValueError(f"Window {window} is not tracked (have {self.windows})")
+
+    # ------------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------------
+
+    def update(self, commodity: str, market: str, price: float, volume: Optional[float] = None) -> None:
+        """One price tick for one series."""
+        row = self.row_for(commodity, market)
+        self.update_rows(np.array([row]), np.array([price], dtype=float),
+                         np.array([np.nan if volume is None else volume], dtype=float))
+
+    def update_rows(self, rows: np.ndarray, prices: np.ndarray, volumes: Optional[np.ndarray] = None) -> None:
+        """
+        Vectorized tick for many series at once (e.g. one day's report for every market).
+        `rows` must be unique within a call; NaN prices are skipped.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        prices = np.asarray(prices, dtype=float)
+        volumes = np.full(len(rows), np.nan) if volumes is None else np.asarray(volumes, dtype=float)
+        valid = ~np.isnan(prices)
+        rows, prices, volumes = rows[valid], prices[valid], volumes[valid]
+        if len(rows) == 0:
+            return
+
+        pos = self.head[rows]
+        count = self.count[rows]
+        has_volume = ~np.isnan(volumes)
+        for wi, w in enumerate(self.windows):
+            full = count >= w
+            leaving = (pos - w) % self.max_window
+            old_price = np.where(full, self.prices[rows, leaving], 0.0)
+            old_volume = np.where(full, self.volumes[rows, leaving], np.nan)
+            old_has_volume = ~np.isnan(old_volume)
+
+            self.price_sum[rows, wi] += prices - old_price
+            self.price_sumsq[rows, wi] += prices * prices - old_price * old_price
+            self.volume_sum[rows, wi] += np.where(has_volume, volumes, 0.0) - np.where(old_has_volume, old_volume, 0.0)
+            self.volume_n[rows, wi] += has_volume.astype(np.int64) - old_has_volume.astype(np.int64)
+
+        self.prices[rows, pos] = prices
+        self.volumes[rows, pos] = volumes
+        self.head[rows] = (pos + 1) % self.max_window
+        self.count[rows] = count + 1
+
+        drifted = rows[self.count[rows] % RESYNC_TICKS == 0]
+        if len(drifted):
+            self._resync(drifted)
+
+    def _resync(self, rows: np.ndarray) -> None:
+        """Recomputes running sums for `rows` exactly from their ring buffers."""
+        for wi, w in enumerate(self.windows):
+            offsets = (self.head[rows, None] - 1 - np.arange(w)[None, :]) % self.max_window
+            in_window = np.arange(w)[None, :] < np.minimum(self.count[rows], w)[:, None]
+            p = np.where(in_window, self.prices[rows[:, None], offsets], 0.0)
+            v = np.where(in_window, self.volumes[rows[:, None], offsets], np.nan)
+            self.price_sum[rows, wi] = p.sum(axis=1)
+            self.price_sumsq[rows, wi] = (p * p).sum(axis=1)
+            self.volume_sum[rows, wi] = np.nansum(v, axis=1)
+            self.volume_n[rows, wi] = (~np.isnan(v)).sum(axis=1)
+
+    # ------------------------------------------------------------------------
+    # O(1) lookups
+    # ------------------------------------------------------------------------
+
+    def window_stats(self, rows: np.ndarray, window: int = 7) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(n, mean, sample stdev) arrays for `rows` over `window` (stdev NaN when n < 2)."""
+        wi = self._window_index(window)
+        n = np.minimum(self.count[rows], window).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.price_sum[rows, wi] / n
+            var = (self.price_sumsq[rows, wi] - n * mean * mean) / (n - 1)
+            # sum-of-squares cancellation leaves noise on flat series; treat it as zero variance
+            var = np.where(var <= FLAT_VARIANCE_EPS * mean * mean, 0.0, var)
+            stdev = np.sqrt(np.maximum(var, 0.0))
+        stdev = np.where(n >= 2, stdev, np.nan)
+        return n, mean, stdev
+
+    def zscores(self, rows: np.ndarray, prices: np.ndarray, window: int = 7) -> np.ndarray:
+        """Vectorized z-score of `prices` against each row's window (NaN when undefined)."""
+        _, mean, stdev = self.window_stats(rows, window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (np.asarray(prices, dtype=float) - mean) / stdev
+        return np.where(stdev > 0, z, np.nan)
+
+    def volume_ratios(self, rows: np.ndarray, volumes: np.ndarray, window: int = 7) -> np.ndarray:
+        """Current volume over the window's average volume (NaN when no volume history)."""
+        wi = self._window_index(window)
+        n = self.volume_n[rows, wi]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = self.volume_sum[rows, wi] / n
+            ratio = np.asarray(volumes, dtype=float) / average
+        return np.where((n > 0) & (average > 0), ratio, np.nan)
+
+    def stats(self, commodity: str, market: str, window: int = 7) -> Optional[Dict[str, float]]:
+        row = self.row_for(commodity, market, create=False)
+        if row is None:
+            return None
+        n, mean, stdev = self.window_stats(np.array([row]), window)
+        wi = self._window_index(window)
+        volume_n = int(self.volume_n[row, wi])
+        return {
+            "n": int(n[0]),
+            "mean": float(mean[0]),
+            "stdev": float(stdev[0]),
+            "average_volume": float(self.volume_sum[row, wi] / volume_n) if volume_n else None,
+        }
+
+    def evaluate(self, commodity: str, market: str, current_price: float,
+                 current_volume: Optional[float] = None, window: int = 7) -> Dict[str, Any]:
+        """
+        Same verdicts as detect_market_shock / detect_volume_shock, computed from the index.
+        Call before update() so the current tick is judged against the preceding window.
+        """
+        stats = self.stats(commodity, market, window) or {"n": 0, "mean": 0.0, "stdev": 0.0, "average_volume": None}
+        price_shock = classify_price_shock(current_price, stats["n"], stats["mean"], stats["stdev"])
+        if current_volume is not None and stats["average_volume"]:
+            volume_shock = detect_volume_shock(current_volume, stats["average_volume"])
+        else:
+            volume_shock = {"status": "NORMAL", "message": "Volume is normal.", "is_shock": False}
+        return {"price_shock": price_shock, "volume_shock": volume_shock}
+
+    # ------------------------------------------------------------------------
+    # Warm restart
+    # ------------------------------------------------------------------------
+
+    def save(self, path: str = DEFAULT_STATS_PATH) -> None:
+        n = len(self.keys)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            windows=np.array(self.windows),
+            keys=np.array(json.dumps(self.keys)),
+            meta=np.array(json.dumps(self.meta)),
+            **{name: getattr(self, name)[:n] for name in self._ARRAYS}
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_STATS_PATH) -> "RollingStatsIndex":
+        with np.load(path) as data:
+            index = cls(windows=tuple(int(w) for w in data["windows"]), capacity=max(1024, len(data["head"])))
+            index.keys = json.loads(str(data["keys"]))
+            index.meta = json.loads(str(data["meta"])) if "meta" in data.files else {}
+            for name in cls._ARRAYS:
+                getattr(index, name)[: len(data[name])] = data[name]
+        logger.info(f"Rolling stats restored for {len(index)} series")
+        return index
+
+    @classmethod
+    def from_history(cls, series: Iterable[Tuple[str, str, List[float], Optional[List[float]]]],
+                     windows: Sequence[int] = WINDOWS) -> "RollingStatsIndex":
+        """Builds an index from (commodity, market, prices oldest-first, aligned volumes or None) histories."""
+        index = cls(windows=windows)
+        for commodity, market, prices, volumes in series:
+            row = np.array([index.row_for(commodity, market)])
+            prices = list(prices)[-index.max_window:]
+            volumes = list(volumes)[-len(prices):] if volumes else [np.nan] * len(prices)
+            for price, volume in zip(prices, volumes):
+                index.update_rows(row, np.array([price], dtype=float), np.array([volume], dtype=float))
+        return index
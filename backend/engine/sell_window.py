@@ -0,0 +1,110 @@
+import numpy as np
+from typing import Dict, Any, Sequence, Optional
+
+from engine.batch_engine import (
+    ArrayLike,
+    batch_quality_loss,
+    batch_net_realization,
+    resolve_transit_hours,
+    MAX_REACHABLE_DISTANCE_KM,
+)
+
+SELL_WINDOW_HOURS = 72
+
+# Same price drift the 48h forecast has always assumed (+5% over 48 hours), spread per hour
+PRICE_TREND_48H = 1.05
+PRICE_TREND_PER_HOUR = (PRICE_TREND_48H - 1.0) / 48.0
+
+# Departure hours within this fraction of the best profit form the recommended sell window
+WINDOW_TOLERANCE = 0.01
+
+def _pad_series(series: Sequence[float], length: int, default: float) -> np.ndarray:
+    """Extends an hourly series to `length` by holding its last value (or `default` if empty)."""
+    values = np.asarray(series if len(series) else [default], dtype=np.float64)
+    if len(values) >= length:
+        return values[:length]
+    return np.concatenate([values, np.full(length - len(values), values[-1])])
+
+def optimize_sell_window(
+    crop: str,
+    yield_est: float,
+    hourly_temps: Sequence[float],
+    hourly_humidity: Sequence[float],
+    market_prices: ArrayLike,
+    distances_km: ArrayLike,
+    transport_rates: ArrayLike = 15.0,
+    horizon_hours: int = SELL_WINDOW_HOURS,
+    price_trend_per_hour: float = PRICE_TREND_PER_HOUR,
+    fallback_temp_c: float = 30.0,
+    fallback_humidity: float = 60.0,
+    transit_hours: Optional[ArrayLike] = None
+) -> Dict[str, Any]:
+    """
+    MittiMitra Temporal Arbitrage: evaluates every (departure hour 0..horizon, mandi) pair in one pass.
+
+    Spoilage is integrated over the hourly forecast: the crop waits at the farm until departure and
+    then spends the routed transit time (distance/30 hours where no route is known) in transit, accruing calculate_quality_loss for each hour at that
+    hour's temperature. Per-hour losses are prefix-summed once, so each pair costs one lookup.
+    Returns the best (departure hour, mandi), the contiguous sell window around it, and the full
+    net-profit-per-quintal surface (rows: departure hours, columns: mandis).
+    `transport_rates` is per mandi, or per (departure hour, mandi) when the rate depends on when
+    the shipment leaves (a pooled vehicle only runs in its own departure window).
+    """
+    market_prices = np.asarray(market_prices, dtype=np.float64)
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    departure_hours = np.arange(horizon_hours + 1, dtype=np.float64)
+    transit_hours = resolve_transit_hours(distances_km, transit_hours)
+
+    # 1. Hourly loss rate over the whole horizon, then its running integral
+    series_length = int(np.ceil(horizon_hours + (transit_hours.max() if transit_hours.size else 0.0))) + 1
+    temps = _pad_series(hourly_temps, series_length, fallback_temp_c)
+    humidity = _pad_series(hourly_humidity, series_length, fallback_humidity)
+    loss_per_hour = batch_quality_loss(crop, temps, humidity, 1.0)
+    cumulative_loss = np.concatenate([[0.0], np.cumsum(loss_per_hour)])
+
+    # 2. Loss accrued from now until arrival, for every departure hour x mandi
+    arrival_hours = departure_hours[:, None] + transit_hours[None, :]
+    loss_pct = np.minimum(1.0, np.interp(arrival_hours, np.arange(series_length + 1), cumulative_loss))
+
+    # 3. Prices drift with the departure hour; transport cost only does when rates are given per hour
+    transport_per_quintal = batch_net_realization(
+        market_prices=market_prices,
+        crop_type=crop,
+        distances_km=distances_km,
+        temp_c=fallback_temp_c,
+        humidity=fallback_humidity,
+        hours_to_market=0.0,
+        yield_est=yield_est,
+        transport_cost_per_km=transport_rates
+    )["transport_per_quintal"]
+    prices = market_prices[None, :] * (1.0 + price_trend_per_hour * departure_hours[:, None])
+    net_profit = prices - np.atleast_2d(transport_per_quintal) - loss_pct * prices
+
+    # 4. Same reachability rule as the spatial engine (>500km excluded unless it is the only mandi)
+    reachable = distances_km <= MAX_REACHABLE_DISTANCE_KM if distances_km.size > 1 else np.ones(distances_km.shape, dtype=bool)
+    ranked = np.where(reachable[None, :], net_profit, -np.inf)
+
+    best_hour, best_mandi = np.unravel_index(int(np.argmax(ranked)), ranked.shape)
+    best_net = float(net_profit[best_hour, best_mandi])
+
+    # 5. Contiguous departure window around the optimum for the chosen mandi
+    threshold = best_net - abs(best_net) * WINDOW_TOLERANCE
+    column = net_profit[:, best_mandi]
+    start = end = int(best_hour)
+    while start > 0 and column[start - 1] >= threshold:
+        start -= 1
+    while end < horizon_hours and column[end + 1] >= threshold:
+        end += 1
+
+    return {
+        "best_departure_hour": int(best_hour),
+        "best_mandi_index": int(best_mandi),
+        "best_net_profit_per_quintal": round(best_net, 2),
+        "best_total_net_profit": round(round(best_net, 2) * yield_est, 2),
+        "best_quality_loss_pct": round(float(loss_pct[best_hour, best_mandi]), 4),
+        "window_start_hour": start,
+        "window_end_hour": end,
+        "departure_hours": departure_hours.astype(int).tolist(),
+        "profit_surface": np.round(net_profit, 2),
+        "is_reachable": reachable,
+    }
@@ -1,4 +1,4 @@
-import statistics
+import math
 from typing import List, Dict, Any
 
 def detect_market_shock(current_price: float, price_history_7_days: List[float]) -> Dict[str, Any]:
@@ -6,16 +6,30 @@ def detect_market_shock(current_price: float, price_history_7_days: List[float])
     Detects if the current price represents a high-variance 'Shock' using Z-score volatility.
     Formula: Trigger alert if CurrentPrice < (Mean_7day - 2σ)
     """
-    if len(price_history_7_days) < 2:
+    n = len(price_history_7_days)
+    if n < 2:
+        return classify_price_shock(current_price, n, 0.0, 0.0)
+
+    # Correctly rounded sums (math.fsum) instead of the much slower statistics module.
+    # Deviations are taken from the first sample so a flat history gives exactly zero variance.
+    shift = price_history_7_days[0]
+    deviations = [p - shift for p in price_history_7_days]
+    mean_deviation = math.fsum(deviations) / n
+    variance = math.fsum((d - mean_deviation) ** 2 for d in deviations) / (n - 1)
+    return classify_price_shock(current_price, n, shift + mean_deviation, math.sqrt(variance))
+
+def classify_price_shock(current_price: float, n: int, mean_price: float, stdev_price: float) -> Dict[str, Any]:
+    """
+    Shock verdict from precomputed window statistics (n, mean, sample stdev).
+    Shared by detect_market_shock and the rolling-statistics index so both give identical messages.
+    """
+    if n < 2:
         return {
             "status": "NORMAL",
             "message": "Insufficient data for shock analysis.",
             "is_shock": False
         }
 
-    mean_price = statistics.mean(price_history_7_days)
-    stdev_price = statistics.stdev(price_history_7_days)
-    
     # Avoid division by zero if all prices are exactly the same
     if stdev_price == 0:
         return {
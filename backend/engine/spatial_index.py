@@ -0,0 +1,112 @@
+import math
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.2
+
+# Pune, the historical fallback coordinate for markets without GPS data
+DEFAULT_LAT = 18.5204
+DEFAULT_LNG = 73.8567
+
+def haversine_km(lat1: float, lon1: float, lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance in km from one point to many (same formula as calculate_haversine)."""
+    lat1_r = math.radians(lat1)
+    lats2_r = np.radians(lats2)
+    dlat = lats2_r - lat1_r
+    dlon = np.radians(lons2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1_r) * np.cos(lats2_r) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+class SpatialIndex:
+    """
+    Fixed-size lat/lng grid (a geohash-style bucket index) over mandi/APMC coordinates.
+    Radius and k-nearest queries only touch the cells that can contain an answer and then run an
+    exact vectorized haversine on those candidates, so cost scales with the local density rather
+    than with the national market count.
+    """
+    def __init__(self, points: Iterable[Tuple[float, float, Any]], cell_deg: float = 0.5):
+        self.cell_deg = cell_deg
+        self.payloads: List[Any] = []
+        lats, lngs = [], []
+        for lat, lng, payload in points:
+            lats.append(float(lat))
+            lngs.append(float(lng))
+            self.payloads.append(payload)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for i in range(len(self.payloads)):
+            buckets.setdefault(self._cell(self.lats[i], self.lngs[i]), []).append(i)
+        self._buckets = {cell: np.asarray(ids, dtype=np.int64) for cell, ids in buckets.items()}
+
+        rows = [cell[0] for cell in self._buckets] or [0]
+        cols = [cell[1] for cell in self._buckets] or [0]
+        self._extent = (min(rows), max(rows), min(cols), max(cols))
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], cell_deg: float = 0.5) -> "SpatialIndex":
+        """Builds an index over dicts carrying 'lat'/'lng' (missing coordinates fall back to Pune)."""
+        return cls(((r.get("lat", DEFAULT_LAT), r.get("lng", DEFAULT_LNG), r) for r in records), cell_deg)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg)))
+
+    def _candidates(self, cells: Iterable[Tuple[int, int]]) -> np.ndarray:
+        hits = [self._buckets[c] for c in cells if c in self._buckets]
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Any, float]]:
+        """All points within radius_km, nearest first, as (payload, distance_km) pairs."""
+        if not self.payloads:
+            return []
+
+        # Bounding box in degrees; longitude degrees shrink with cos(latitude)
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        max_abs_lat = min(89.0, abs(lat) + dlat)
+        dlng = min(180.0, radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(max_abs_lat))))
+
+        row_lo, col_lo = self._cell(lat - dlat, lng - dlng)
+        row_hi, col_hi = self._cell(lat + dlat, lng + dlng)
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._buckets):
+            ids = np.concatenate(list(self._buckets.values()))
+        else:
+            ids = self._candidates((r, c) for r in range(row_lo, row_hi + 1) for c in range(col_lo, col_hi + 1))
+        return self._rank(lat, lng, ids, radius_km)
+
+    def k_nearest(self, lat: float, lng: float, k: int = 1) -> List[Tuple[Any, float]]:
+        """The k closest points, nearest first, as (payload, distance_km) pairs."""
+        if not self.payloads or k <= 0:
+            return []
+        if k >= len(self.payloads):
+            return self._rank(lat, lng, np.arange(len(self.payloads)), None)
+
+        # Grow square rings of cells until k candidates are seen, then settle it with an exact radius query
+        row, col = self._cell(lat, lng)
+        ids = self._candidates([(row, col)])
+        row_min, row_max, col_min, col_max = self._extent
+        max_ring = max(abs(row - row_min), abs(row - row_max), abs(col - col_min), abs(col - col_max))
+        ring = 0
+        while len(ids) < k and ring < max_ring:
+            ring += 1
+            ring_cells = [(row + dr, col + dc) for dr in range(-ring, ring + 1) for dc in range(-ring, ring + 1)
+                          if max(abs(dr), abs(dc)) == ring]
+            ids = np.concatenate([ids, self._candidates(ring_cells)])
+
+        kth_distance = float(np.partition(haversine_km(lat, lng, self.lats[ids], self.lngs[ids]), k - 1)[k - 1])
+        return self.within_radius(lat, lng, kth_distance + 1e-6)[:k]
+
+    def _rank(self, lat: float, lng: float, ids: np.ndarray, radius_km: Optional[float]) -> List[Tuple[Any, float]]:
+        if len(ids) == 0:
+            return []
+        distances = haversine_km(lat, lng, self.lats[ids], self.lngs[ids])
+        if radius_km is not None:
+            keep = distances <= radius_km
+            ids, distances = ids[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return [(self.payloads[ids[i]], float(distances[i])) for i in order]
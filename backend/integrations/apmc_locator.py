@@ -0,0 +1,103 @@
+import logging
+from typing import Dict, Any, List, Optional
+
+from engine.spatial_index import SpatialIndex, DEFAULT_LAT, DEFAULT_LNG
+from integrations.enam_client import enam_client
+from integrations.mandi_snapshot import mandi_snapshot
+
+logger = logging.getLogger(__name__)
+
+# UMANG payloads are not consistent about field names across endpoints
+_LAT_KEYS = ("lat", "latitude", "Latitude", "LATITUDE")
+_LNG_KEYS = ("lng", "lon", "long", "longitude", "Longitude", "LONGITUDE")
+_NAME_KEYS = ("apmc_name", "apmcName", "APMC_NAME", "mandi_name", "name", "market")
+
+def _first(record: Dict[str, Any], keys) -> Any:
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    return None
+
+def _extract_records(payload: Any) -> List[Dict[str, Any]]:
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in ("records", "data", "result", "apmcList"):
+            if isinstance(payload.get(key), list):
+                return payload[key]
+    return []
+
+class ApmcLocator:
+    """
+    Local replacement for the UMANG 'GPS Nearest APMC' round-trip.
+    Keeps a spatial index over every known market: the verified JSON snapshot plus, when the
+    e-NAM APMC master list is reachable, all national APMCs. Queries never leave the process.
+    """
+    def __init__(self):
+        self.index: Optional[SpatialIndex] = None
+        self._apmc_points: List[Dict[str, Any]] = []
+        self._indexed_snapshot = None
+
+    def _snapshot_points(self) -> List[Dict[str, Any]]:
+        snapshot = mandi_snapshot.current
+        if not snapshot:
+            return []
+        seen = {}
+        for data in snapshot.commodities.values():
+            for m in data.get("markets", []):
+                if "lat" in m and "lng" in m:
+                    seen.setdefault(m["name"], {"name": m["name"], "lat": m["lat"], "lng": m["lng"], "source": "verified_json"})
+        return list(seen.values())
+
+    def rebuild(self) -> None:
+        """Rebuilds the index from the snapshot markets and the last APMC list fetched."""
+        self._indexed_snapshot = mandi_snapshot.current
+        names = set()
+        points = []
+        for p in self._snapshot_points() + self._apmc_points:
+            if p["name"] not in names:
+                names.add(p["name"])
+                points.append(p)
+        self.index = SpatialIndex.from_records(points)
+        logger.info(f"APMC locator indexed {len(points)} markets")
+
+    async def refresh(self) -> None:
+        """Pulls the e-NAM APMC master list (24h cached upstream) and rebuilds the index."""
+        try:
+            payload = await enam_client.get_apmc_new()
+            if payload and "error" not in payload:
+                points = []
+                for rec in _extract_records(payload):
+                    lat, lng, name = _first(rec, _LAT_KEYS), _first(rec, _LNG_KEYS), _first(rec, _NAME_KEYS)
+                    try:
+                        points.append({"name": str(name), "lat": float(lat), "lng": float(lng), "source": "enam"})
+                    except (TypeError, ValueError):
+                        continue
+                if points:
+                    self._apmc_points = points
+        except Exception as e:
+            logger.error(f"APMC master list refresh failed: {e}")
+        self.rebuild()
+
+    async def get_nearest_apmc(self, location: dict, k: int = 1, radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        k nearest markets to the farmer (optionally limited to radius_km), nearest first.
+        Falls back to the remote UMANG endpoint only if nothing has been indexed yet.
+        """
+        if self.index is None or self._indexed_snapshot is not mandi_snapshot.current:
+            self.rebuild()
+        lat = location.get("lat", DEFAULT_LAT)
+        lng = location.get("lng", DEFAULT_LNG)
+
+        if len(self.index) == 0:
+            payload = await enam_client.get_gps_nearest_apmc()
+            return _extract_records(payload)[:k]
+
+        if radius_km is not None:
+            hits = self.index.within_radius(lat, lng, radius_km)[:k]
+        else:
+            hits = self.index.k_nearest(lat, lng, k)
+        return [{**p, "distance_km": round(d, 1)} for p, d in hits]
+
+# Singleton Instance
+apmc_locator = ApmcLocator()
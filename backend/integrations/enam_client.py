@@ -2,8 +2,10 @@ import os
 import httpx
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional
-from cachetools import TTLCache, cached
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.http_clients import http_clients
+from core.async_cache import AsyncTTLCache, async_cached
 
 # Configure local logging
 logger = logging.getLogger(__name__)
@@ -11,31 +13,38 @@ logger = logging.getLogger(__name__)
 # Cache configurations
 # - Long TTL for structural data (States, Districts, APMCs, Commodities) -> 24 hours
 # - Short TTL for live prices/bids -> 15 minutes
-LONG_CACHE = TTLCache(maxsize=1000, ttl=86400)
-SHORT_CACHE = TTLCache(maxsize=5000, ttl=900)
+# Entries past their TTL are served stale while a single background refresh runs, and the last
+# good value keeps being served while the upstream returns errors.
+STRUCTURAL_TTL_S = 86400
+LIVE_PRICE_TTL_S = 900
+LONG_CACHE = AsyncTTLCache(maxsize=1000, ttl=STRUCTURAL_TTL_S)
+SHORT_CACHE = AsyncTTLCache(maxsize=5000, ttl=LIVE_PRICE_TTL_S)
 
 class EnamClient:
     """
     HTTP Client to interface with the 21 UMANG e-NAM (National Agriculture Market) APIs.
-    Implements strict in-memory TTLCache to protect against rate-limiting and handle frequent government API downtime.
+    Implements single-flight, stale-while-revalidate in-memory caching to protect against rate-limiting and handle frequent government API downtime.
     """
     BASE_URL = "https://umang.gov.in/apisetu/dept/enamapi/ws1"
     
     # Optional: Load token from environment or fallback to user's provided token pattern
     DEFAULT_TOKEN = os.getenv("ENAM_API_TOKEN", "qkNR1lrrxxxxxxf2tHMU9wh")
 
-    def __init__(self):
-        # We use a shared specific async client if needed, or stick to httpx instance usage.
-        self.timeout = httpx.Timeout(10.0, connect=5.0)
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # Pooled keep-alive client; defaults to the app-scoped 'enam' client from core.http_clients
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or http_clients.get("enam")
 
     async def _fetch(self, endpoint: str, token: str) -> Dict[str, Any]:
         url = f"{self.BASE_URL}/{endpoint}/{token}"
         try:
-            async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                return data
+            response = await self.http_client.get(url)
+            response.raise_for_status()
+            data = response.json()
+            return data
         except httpx.HTTPStatusError as e:
             logger.error(f"e-NAM API Error [{e.response.status_code}] on {endpoint}")
             return {"error": str(e), "status_code": e.response.status_code}
@@ -47,31 +56,31 @@ class EnamClient:
     # 1. STRUCTURAL APIs (Long Cache - 24 Hours)
     # ------------------------------------------------------------------------
     
-    # @cached(cache=LONG_CACHE)
+    @async_cached(cache=LONG_CACHE)
     async def get_states_new(self) -> Dict[str, Any]:
         # 5. States New Web API
         return await self._fetch("getStatesNew", self.DEFAULT_TOKEN)
 
-    # @cached(cache=LONG_CACHE)
+    @async_cached(cache=LONG_CACHE)
     async def get_district_new(self) -> Dict[str, Any]:
         # 6. District New Web API
         # The user provided a slightly different token for district, handling parameter gracefully
         token = os.getenv("ENAM_DISTRICT_TOKEN", "qkNR1lrxxxDf2tHMU9wh")
         return await self._fetch("getDistrictNew", token)
 
-    # @cached(cache=LONG_CACHE)
+    @async_cached(cache=LONG_CACHE)
     async def get_apmc_new(self) -> Dict[str, Any]:
         # 7. APMC New Web API 
         token = os.getenv("ENAM_APMC_TOKEN", "qkNR1lrrtAxxxixxf2tHMU9wh")
         return await self._fetch("getApmcNew", token)
 
-    # @cached(cache=LONG_CACHE)
+    @async_cached(cache=LONG_CACHE)
     async def get_products_new(self) -> Dict[str, Any]:
         # 8. Products New Web API
         token = os.getenv("ENAM_PRODUCTS_TOKEN", "qkNR1lrrtAxxxxvnDf2tHMU9wh")
         return await self._fetch("getProductsNew", token)
 
-    # @cached(cache=LONG_CACHE)
+    @async_cached(cache=LONG_CACHE)
     async def get_commodity_grid_new(self) -> Dict[str, Any]:
         # 11. Commodity Grid New Web API
         token = os.getenv("ENAM_COMMODITY_GRID_TOKEN", "qkNR1lrrtxxxxDf2tHMU9wh")
@@ -81,36 +90,40 @@ class EnamClient:
     # 2. LIVE PRICING & MARKET APIs (Short Cache - 15 Mins)
     # ------------------------------------------------------------------------
 
-    # @cached(cache=SHORT_CACHE)
+    @async_cached(cache=SHORT_CACHE)
     async def get_mandi_info(self) -> Dict[str, Any]:
         # 4. Mandi Information Web API
         token = os.getenv("ENAM_MANDI_INFO_TOKEN", "qkNR1lrrxxxxnDf2tHMU9wh")
         return await self._fetch("getMandiInfoForMI", token)
 
-    # @cached(cache=SHORT_CACHE)
+    @async_cached(cache=SHORT_CACHE)
     async def get_gps_nearest_apmc(self) -> Dict[str, Any]:
         # 12. GPS Nearest APMC Web API
         token = os.getenv("ENAM_GPS_APMC_TOKEN", "qkNR1lrrxxxnDf2tHMU9wh")
         return await self._fetch("getGpsNearestApmc", token)
 
-    # @cached(cache=SHORT_CACHE)
+    @async_cached(cache=SHORT_CACHE)
     async def get_agm_gps_min_max_model_price(self) -> Dict[str, Any]:
         # 17. AgmGps Min Max Model Price Web API
         # This is strictly the most important endpoint for our Crop Shock Engine
         token = os.getenv("ENAM_MIN_MAX_PRICE_TOKEN", "qkNR1lrrxxxxvnDf2tHMU9wh")
         return await self._fetch("getAgmGpsMinMaxModelPrice", token)
 
+    async def get_agm_gps_min_max_model_price_with_status(self) -> Tuple[Dict[str, Any], str]:
+        """Live prices plus how SHORT_CACHE served them (fresh/stale/fetched/fallback, see core.async_cache)."""
+        return await EnamClient.get_agm_gps_min_max_model_price.lookup(self)
+
     # ------------------------------------------------------------------------
     # 3. LIVE BID STREAMING (Short Cache - 15 Mins)
     # ------------------------------------------------------------------------
 
-    # @cached(cache=SHORT_CACHE)
+    @async_cached(cache=SHORT_CACHE)
     async def get_all_bids(self) -> Dict[str, Any]:
         # 21. All Bids Web API
         token = os.getenv("ENAM_ALL_BIDS_TOKEN", "qkNR1lrrxxxxvnDf2tHMU9wh")
         return await self._fetch("getAllBids", token)
 
-    # @cached(cache=SHORT_CACHE)
+    @async_cached(cache=SHORT_CACHE)
     async def get_bid_apmc(self) -> Dict[str, Any]:
         # 19. Bid APMC Web API
         token = os.getenv("ENAM_BID_APMC_TOKEN", "qkNR1lrrxxxxnDf2tHMU9wh")
@@ -1,15 +1,55 @@
 import os
-import json
+import time
 import random
-from typing import Dict, Any, List
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, NamedTuple, Union
 import logging
 import httpx
 from urllib.parse import quote
+from core.http_clients import http_clients
+from core.metrics import MANDI_SOURCE
+from core.async_cache import FRESH, STALE, FALLBACK
+from core.circuit_breaker import Deadline, UpstreamError, get_breaker, CLOSED
 from integrations.enam_client import enam_client
+from integrations.mandi_snapshot import mandi_snapshot, normalize_crop_name
+from integrations.price_archive import price_archive
+from engine.spatial_index import SpatialIndex, DEFAULT_LAT, DEFAULT_LNG
+from engine.batch_engine import MAX_REACHABLE_DISTANCE_KM
+from engine.road_matrix import road_matrix
 
 import math
 logger = logging.getLogger(__name__)
 
+# Head start given to a higher-priority live tier before the next one is hedged in
+HEDGE_DELAY_S = float(os.getenv("MANDI_HEDGE_DELAY_S", "1.0"))
+
+# Latency budget shared by the live tiers of one lookup; past it the mock fallback answers
+MANDI_DEADLINE_S = float(os.getenv("MANDI_DEADLINE_S", "4.0"))
+# Starting point for each live tier's latency estimate until real calls have been observed
+TIER_EXPECTED_LATENCY_S = {"enam": 1.5, "data_gov_in": 1.0}
+
+# Days of archived history handed to the shock analyzer
+HISTORY_DAYS = 7
+
+def _archived_history(crop: str, market: str, current_price: float) -> Dict[str, Any]:
+    """
+    Real price/arrival history from the price archive. Without archived reports the history is just
+    today's price and the volumes are None (unknown), so the shock analyzers report insufficient data
+    instead of judging invented numbers.
+    """
+    history = price_archive.recent_values(crop, market, HISTORY_DAYS)
+    arrivals = price_archive.recent_values(crop, market, HISTORY_DAYS, field="arrivals")
+    fields = {
+        "7_day_history": [round(p, 2) for p in history] or [round(current_price, 2)],
+        "current_volume_quintals": None,
+        "average_volume_quintals": None,
+    }
+    if arrivals:
+        # Agmarknet reports arrivals in tonnes
+        fields["current_volume_quintals"] = round(arrivals[-1] * 10, 1)
+        fields["average_volume_quintals"] = round(sum(arrivals) / len(arrivals) * 10, 1)
+    return fields
+
 def calculate_haversine(lat1, lon1, lat2, lon2):
     """Calculate distance in km between two GPS points."""
     R = 6371.0 # Radius of the Earth in km
@@ -19,15 +59,8 @@ def calculate_haversine(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
-async def fetch_mandi_prices(crop: str, location: dict, language: str = "en") -> Dict[str, Any]:
-    """
-    Priority-based Mandi Data Engine:
-    1. Local Verified JSON (Optimized for MH/MP crops)
-    2. UMANG e-NAM (Live govt data)
-    3. data.gov.in (Official historical aggregates)
-    4. Mock Heuristic (Zero-failure fallback)
-    """
-    
+def resolve_crop(crop: str, language: str = "en") -> str:
+    """The commodity a request is served for: ambiguous crops take the language's default crop."""
     # Normalize crop name
     crop_input = crop.strip().lower() if crop else "tomato"
     
@@ -38,75 +71,234 @@ async def fetch_mandi_prices(crop: str, location: dict, language: str = "en") ->
             "pa": "wheat", "mr": "soybean", "hi": "mustard", "en": "tomato"
         }
         crop_input = lang_defaults.get(language, "tomato")
+    # Regional names (Kanda, Batata, Gehun...) resolve to the canonical crop through the crop registry
+    return normalize_crop_name(crop_input)
+
+async def fetch_mandi_prices(crop: str, location: dict, language: str = "en") -> Dict[str, Any]:
+    """
+    Priority-based Mandi Data Engine:
+    1. Local Verified JSON (Optimized for MH/MP crops)
+    2. UMANG e-NAM (Live govt data)
+    3. data.gov.in (Official historical aggregates)
+    4. Mock Heuristic (Zero-failure fallback)
+    The response's "crop" is the commodity actually served (language default and aliases applied).
+    """
+    
+    crop_input = resolve_crop(crop, language)
 
     # 1. PRIORITIZE VERIFIED LOCAL DATA (Best coordinates for MH/MP)
+    # Served from the in-memory snapshot; the JSON file is only re-parsed when it changes.
     try:
-        json_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "mandi_prices_real.json")
-        if os.path.exists(json_path):
-            with open(json_path, "r") as f:
-                real_db = json.load(f)
-                
-            commodities = real_db.get("commodities", {})
-            if crop_input in commodities:
-                logger.info(f"Verified Match Found: {crop_input}")
-                return _parse_real_json_data(commodities[crop_input], crop_input, location)
+        snapshot = await mandi_snapshot.get()
+        commodity_data = snapshot.get_commodity(crop_input) if snapshot else None
+        if commodity_data:
+            logger.info(f"Verified Match Found: {crop_input}")
+            MANDI_SOURCE.inc("verified_json")
+            result = _parse_real_json_data(commodity_data, crop_input, location, snapshot.get_market_index(crop_input))
+            return {**result, "crop": crop_input, "source": "verified_json", "degraded": False, "degraded_reasons": []}
     except Exception as e:
         logger.error(f"Verified JSON lookup failed: {e}")
 
-    # 2. ATTEMPT LIVE UMANG e-NAM DATA
+    # 2 & 3. LIVE GOVT TIERS, HEDGED, BEHIND CIRCUIT BREAKERS
+    # e-NAM starts first; data.gov.in is launched after a short head start (or as soon as e-NAM fails).
+    # The first good answer wins (ties go to the higher-priority tier) and the loser is cancelled.
+    # A tier whose circuit is open, or whose typical latency no longer fits the budget, is skipped.
+    degraded_reasons: List[str] = []
+    live_result = await _race_tiers([
+        ("enam", lambda: _fetch_enam_tier(crop_input)),
+        ("data_gov_in", lambda: _fetch_open_gov_tier(crop_input)),
+    ], hedge_delay_s=HEDGE_DELAY_S, deadline=Deadline(MANDI_DEADLINE_S), degraded_reasons=degraded_reasons)
+    if live_result is not None:
+        tier, result = live_result
+        return {**result, "crop": crop_input, "source": tier, "degraded": bool(degraded_reasons), "degraded_reasons": degraded_reasons}
+            
+    # 4. FINAL FALLBACK: Heuristic Engine
+    logger.warning(f"No real data for {crop_input}. Falling back to mocks.")
+    MANDI_SOURCE.inc("mock")
+    degraded_reasons.append("mock: no live source answered; prices are estimates")
+    return {**_generate_mock_fallback(crop_input, language), "crop": crop_input, "source": "mock", "degraded": True, "degraded_reasons": degraded_reasons}
+
+class TierResult(NamedTuple):
+    """A tier's answer plus, for tiers behind a cache, how the cache served it (None: straight from the upstream)."""
+    result: Optional[Dict[str, Any]]
+    cache_status: Optional[str] = None
+
+async def _fetch_enam_tier(crop_input: str) -> TierResult:
+    """
+    Tier 2: UMANG e-NAM live min/max/modal prices, behind the stale-while-revalidate SHORT_CACHE.
+    Upstream failures raise (they count against the e-NAM breaker); a None result means e-NAM is up but has no records.
+    """
+    enam_data, cache_status = await enam_client.get_agm_gps_min_max_model_price_with_status()
+    if not enam_data or "error" in enam_data:
+        raise UpstreamError(f"e-NAM: {(enam_data or {}).get('error', 'empty response')}")
+    if len(enam_data.get("records", [])) > 0:
+        # If real production token worked and has records
+        return TierResult(_parse_gov_api_data(enam_data["records"], crop_input), cache_status)
+    return TierResult(None, cache_status)
+
+async def _fetch_open_gov_tier(crop_input: str, client: Optional[httpx.AsyncClient] = None) -> Optional[Dict[str, Any]]:
+    """Tier 3: data.gov.in official aggregates. Same contract as the e-NAM tier."""
+    crop_query = crop_input.capitalize()
+    open_api_url = f"https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070?api-key=579b464db66ec23bdd0000018f6d2aeef8304ec27142be2cf3ef3688&format=json&limit=50&filters[commodity]={quote(crop_query.upper())}"
+    client = client or http_clients.get("data_gov_in")
+    res = await client.get(open_api_url)
+    if res.status_code != 200:
+        raise UpstreamError(f"data.gov.in: HTTP {res.status_code}")
+    data = res.json()
+    if "records" in data and len(data["records"]) > 0:
+        return _parse_gov_api_data(data["records"], crop_query)
+    return None
+
+TierFactory = Callable[[], Awaitable[Union[TierResult, Optional[Dict[str, Any]]]]]
+
+async def _guarded_tier(name: str, factory: TierFactory, deadline: Deadline) -> TierResult:
+    """
+    Runs one tier inside the remaining budget and reports the outcome to its circuit breaker.
+    Answers served from a cache without an upstream call say nothing about the upstream and are not
+    recorded; a cache falling back to its last good value because the upstream failed is a failure.
+    """
+    breaker = get_breaker(name, TIER_EXPECTED_LATENCY_S.get(name, 1.0))
+    started = time.perf_counter()
     try:
-        enam_data = await enam_client.get_agm_gps_min_max_model_price()
-        if enam_data and "error" not in enam_data and len(enam_data.get("records", [])) > 0:
-             # If real production token worked and has records
-             return _parse_gov_api_data(enam_data["records"], crop_input)
+        answer = await asyncio.wait_for(factory(), timeout=deadline.remaining())
+    except asyncio.CancelledError:
+        breaker.record_cancelled()
+        raise
     except Exception as e:
-        logger.error(f"UMANG API failed: {e}")
+        breaker.record_failure()
+        logger.error(f"Mandi tier '{name}' failed: {type(e).__name__}: {e}")
+        raise
+    if not isinstance(answer, TierResult):
+        answer = TierResult(answer)
+    if answer.cache_status in (FRESH, STALE):
+        breaker.record_cancelled()
+    elif answer.cache_status == FALLBACK:
+        breaker.record_failure()
+        logger.error(f"Mandi tier '{name}' upstream failed; serving its last cached answer")
+    else:
+        breaker.record_success(time.perf_counter() - started)
+    return answer
 
-    # 3. ATTEMPT OPEN GOVT DATA API (data.gov.in)
+async def _race_tiers(
+    tiers: List[Tuple[str, TierFactory]],
+    hedge_delay_s: float,
+    deadline: Optional[Deadline] = None,
+    degraded_reasons: Optional[List[str]] = None
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Hedged execution of prioritized source tiers within a shared deadline.
+    Tier i+1 is started hedge_delay_s after tier i, or immediately once every running tier has failed.
+    Tiers whose breaker is open or whose typical latency exceeds the remaining budget are skipped.
+    Returns (tier name, result) for the first non-None result (highest priority among those finishing
+    together) and cancels the rest, except half-open probes. Higher-priority tiers that were skipped,
+    failed or had not answered are appended to degraded_reasons, as is a winner served stale from its cache.
+    """
+    deadline = deadline or Deadline(MANDI_DEADLINE_S)
+    reasons = degraded_reasons if degraded_reasons is not None else []
+    pending: Dict[asyncio.Task, int] = {}
+    probes: set = set()
+    next_tier = 0
+
+    def launch_next() -> None:
+        nonlocal next_tier
+        while next_tier < len(tiers):
+            name, factory = tiers[next_tier]
+            next_tier += 1
+            breaker = get_breaker(name, TIER_EXPECTED_LATENCY_S.get(name, 1.0))
+            # Budget first: a half-open breaker's probe slot is only claimed for a call that will run
+            if not deadline.covers(breaker.latency_ewma_s):
+                reasons.append(f"{name}: skipped, {deadline.remaining():.1f}s left of the budget, typical latency {breaker.latency_ewma_s:.1f}s")
+                continue
+            probing = breaker.state != CLOSED
+            if not breaker.allow():
+                reasons.append(f"{name}: skipped, circuit {breaker.state}")
+                continue
+            task = asyncio.create_task(_guarded_tier(name, factory, deadline), name=f"mandi-tier-{name}")
+            pending[task] = next_tier - 1
+            if probing:
+                probes.add(task)
+            return
+
+    launch_next()
     try:
-        crop_query = crop_input.capitalize()
-        open_api_url = f"https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070?api-key=579b464db66ec23bdd0000018f6d2aeef8304ec27142be2cf3ef3688&format=json&limit=50&filters[commodity]={quote(crop_query.upper())}"
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            res = await client.get(open_api_url)
-            if res.status_code == 200:
-                data = res.json()
-                if "records" in data and len(data["records"]) > 0:
-                    return _parse_gov_api_data(data["records"], crop_query)
-    except Exception:
-        pass
-            
-    # 4. FINAL FALLBACK: Heuristic Engine
-    logger.warning(f"No real data for {crop_input}. Falling back to mocks.")
-    return _generate_mock_fallback(crop_input, language)
+        while pending:
+            timeout = hedge_delay_s if next_tier < len(tiers) else None
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
 
-def _parse_real_json_data(commodity_data: Dict[str, Any], crop: str, user_loc: dict) -> Dict[str, Any]:
+            winners = []
+            for task in done:
+                priority = pending.pop(task)
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    reasons.append(f"{tiers[priority][0]}: failed ({type(task.exception()).__name__})")
+                elif task.result().result is not None:
+                    winners.append((priority, task.result()))
+            if winners:
+                priority, answer = min(winners, key=lambda w: w[0])
+                name = tiers[priority][0]
+                logger.info(f"Mandi data served by tier '{name}'")
+                MANDI_SOURCE.inc(name)
+                for task, other in pending.items():
+                    if other < priority:
+                        reasons.append(f"{tiers[other][0]}: no answer before {name}")
+                if answer.cache_status == STALE:
+                    reasons.append(f"{name}: cached prices past their TTL, refresh in progress")
+                elif answer.cache_status == FALLBACK:
+                    reasons.append(f"{name}: upstream failed, serving its last cached prices")
+                return name, answer.result
+
+            # Hedge timer fired, or every running tier failed: bring in the next tier
+            if next_tier < len(tiers) and (not done or not pending):
+                launch_next()
+        return None
+    finally:
+        for task in pending:
+            if task in probes:
+                # A half-open probe runs to completion (bounded by the deadline) so its breaker learns the outcome
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            else:
+                task.cancel()
+
+def _parse_real_json_data(commodity_data: Dict[str, Any], crop: str, user_loc: dict, market_index: Optional[SpatialIndex] = None) -> Dict[str, Any]:
     # user_loc is {"lat": ..., "lng": ...}
     base_price = float(commodity_data["modal_price"])
+    user_lat = user_loc.get("lat", DEFAULT_LAT)
+    user_lng = user_loc.get("lng", DEFAULT_LNG)
+    
+    # Only materialize markets a smallholder can actually reach (<=500km), nearest first.
+    # If nothing is in range, keep the single nearest market so there is always a primary.
+    if market_index is None:
+        market_index = SpatialIndex.from_records(commodity_data["markets"])
+    reachable = market_index.within_radius(user_lat, user_lng, MAX_REACHABLE_DISTANCE_KM)
+    if not reachable:
+        reachable = market_index.k_nearest(user_lat, user_lng, 1)
+    
+    # Road distance / travel time from the precomputed matrix; straight-line distance where it has no entry
+    road_km, transit_hours = road_matrix.lookup(user_lat, user_lng, [m["name"] for m, _ in reachable])
+    routed = [
+        (m, float(road) if not math.isnan(road) else dist, None if math.isnan(hours) else round(float(hours), 2))
+        for (m, dist), road, hours in zip(reachable, road_km, transit_hours)
+    ]
+    routed.sort(key=lambda r: r[1])
     
-    # Map all markets and calculate REAL distance
     mandi_options = []
-    for m in commodity_data["markets"]:
+    for m, dist, hours in routed:
         price = float(m.get("price", base_price))
-        m_lat = m.get("lat", 18.5204) # Fallback to Pune if missing
-        m_lng = m.get("lng", 73.8567)
-        
-        dist = calculate_haversine(user_loc.get("lat", 18.5204), user_loc.get("lng", 73.8567), m_lat, m_lng)
         
         mandi_options.append({
             "name": f"{m['name']} Mandi",
             "crop": crop,
             "current_price": round(price, 2),
-            "7_day_history": [round(price + random.uniform(-50, 50), 2) for _ in range(7)],
-            "current_volume_quintals": random.randint(100, 500),
-            "average_volume_quintals": 250,
             "distance_km": round(dist, 1),
+            "transit_hours": hours,
             "transport_rate_per_km": 15.0,
-            "is_verified_real": True 
+            "lat": m.get("lat", DEFAULT_LAT),
+            "lng": m.get("lng", DEFAULT_LNG),
+            "is_verified_real": True,
+            **_archived_history(crop, m["name"], price)
         })
     
-    # Sort by distance (nearest first)
-    mandi_options.sort(key=lambda x: x["distance_km"])
-    
     return {
         "primary": mandi_options[0], 
         "regional_options": mandi_options
@@ -123,11 +315,9 @@ def _parse_gov_api_data(records: List[Dict[str, Any]], crop: str) -> Dict[str, A
         "name": f"{primary_record.get('market', 'Local APMC')} ({primary_record.get('state', 'India')})",
         "crop": crop,
         "current_price": round(current_price, 2),
-        "7_day_history": [current_price] * 7,
-        "current_volume_quintals": random.randint(100, 500),
-        "average_volume_quintals": 250,
         "distance_km": random.uniform(5.0, 15.0),
-        "transport_rate_per_km": 15.0 
+        "transport_rate_per_km": 15.0,
+        **_archived_history(crop, primary_record.get("market", ""), current_price)
     }
     regional_options = [primary_mandi]
     for i in range(1, len(records)):
@@ -151,11 +341,10 @@ def _generate_mock_fallback(crop: str, language: str) -> Dict[str, Any]:
         "name": "Local District Mandi",
         "crop": crop,
         "current_price": base_price,
-        "7_day_history": [round(base_price + random.uniform(-100, 100), 2) for _ in range(7)],
-        "current_volume_quintals": random.randint(50, 200),
-        "average_volume_quintals": 150,
         "distance_km": random.uniform(5.0, 15.0),
-        "transport_rate_per_km": 15.0
+        "transport_rate_per_km": 15.0,
+        # An estimated price has no history of its own: the analyzers see insufficient data
+        **_archived_history(crop, "Local District Mandi", base_price)
     }
     regional_options = [primary_mandi]
     for i in range(3):
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+from engine.spatial_index import SpatialIndex
+from engine.crop_registry import crop_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "mandi_prices_real.json")
+
+def normalize_crop_name(crop: str) -> str:
+    """Canonical key used to index commodities ('  Tomato ' -> 'tomato', 'Kanda' -> 'onion')."""
+    return crop_registry.canonical_name(crop)
+
+class MandiSnapshot:
+    """
+    Immutable, parsed view of mandi_prices_real.json.
+    Commodities are pre-indexed by normalized crop name so lookups are a single dict access,
+    and each commodity's markets get a spatial index for radius / nearest queries.
+    """
+    def __init__(self, raw: Dict[str, Any], mtime: float):
+        self.raw = raw
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        self.updated_at = raw.get("updated_at")
+        self.commodities: Dict[str, Dict[str, Any]] = {
+            normalize_crop_name(name): data for name, data in raw.get("commodities", {}).items()
+        }
+        self.market_indexes: Dict[str, SpatialIndex] = {
+            name: SpatialIndex.from_records(data.get("markets", [])) for name, data in self.commodities.items()
+        }
+
+    def get_commodity(self, crop: str) -> Optional[Dict[str, Any]]:
+        return self.commodities.get(normalize_crop_name(crop))
+
+    def get_market_index(self, crop: str) -> Optional[SpatialIndex]:
+        return self.market_indexes.get(normalize_crop_name(crop))
+
+class MandiSnapshotStore:
+    """
+    Process-wide holder of the verified mandi dataset.
+    Loaded once at startup and swapped atomically (a single reference assignment) whenever the
+    file's mtime changes or a writer calls reload(). Requests never parse JSON themselves.
+    """
+    def __init__(self, path: str = DEFAULT_SNAPSHOT_PATH, check_interval_s: float = 2.0):
+        self.path = path
+        self.check_interval_s = check_interval_s
+        self._snapshot: Optional[MandiSnapshot] = None
+        self._last_check = 0.0
+        self._reload_lock = asyncio.Lock()
+
+    @property
+    def current(self) -> Optional[MandiSnapshot]:
+        """The last loaded snapshot, without checking the file for changes."""
+        return self._snapshot
+
+    def _read(self) -> Optional[MandiSnapshot]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            return MandiSnapshot(raw, mtime)
+        except FileNotFoundError:
+            logger.warning(f"Mandi snapshot not found at {self.path}")
+        except Exception as e:
+            logger.error(f"Mandi snapshot load failed: {e}")
+        return None
+
+    def reload(self) -> Optional[MandiSnapshot]:
+        """Blocking (re)load. Keeps serving the previous snapshot if the new file can't be parsed."""
+        snapshot = self._read()
+        if snapshot is not None:
+            self._snapshot = snapshot
+            logger.info(f"Mandi snapshot loaded: {len(snapshot.commodities)} commodities (mtime {snapshot.mtime})")
+        self._last_check = time.monotonic()
+        return self._snapshot
+
+    def _is_stale(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        return self._snapshot is None or mtime != self._snapshot.mtime
+
+    async def get(self) -> Optional[MandiSnapshot]:
+        """
+        Returns the current snapshot, re-checking the file's mtime at most once per check interval.
+        A changed file is parsed off the event loop; concurrent callers share the same reload.
+        """
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < self.check_interval_s:
+            return self._snapshot
+
+        self._last_check = now
+        if self._is_stale():
+            async with self._reload_lock:
+                if self._is_stale():
+                    await asyncio.to_thread(self.reload)
+        return self._snapshot
+
+# Singleton Instance
+mandi_snapshot = MandiSnapshotStore()
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import logging
+from datetime import date
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from integrations.mandi_snapshot import normalize_crop_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "price_archive")
+
+FIELDS = ("min_price", "max_price", "modal_price", "arrivals")
+DAY_CAPACITY = 4096 # ~11 years of daily columns per series; doubled when a later day arrives
+INITIAL_SERIES_CAPACITY = 1024
+DEFAULT_EPOCH = date(2020, 1, 1)
+
+def series_key(commodity: str, market: str) -> str:
+    """'Onion', 'Lasalgaon Mandi' -> 'onion|lasalgaon'"""
+    market = market.strip().lower()
+    for suffix in (" mandi", " apmc"):
+        if market.endswith(suffix):
+            market = market[: -len(suffix)]
+    return f"{normalize_crop_name(commodity)}|{market.strip()}"
+
+class PriceArchive:
+    """
+    Columnar, memory-mapped daily price history per (commodity, market).
+
+    Each field is one float32 file of shape (series_capacity, day_capacity), row = series,
+    column = days since epoch, NaN = no report that day. A series' history is one contiguous
+    row, so the last N days are a single slice of the page cache: every worker process maps
+    the same files read-only instead of loading years of history into its own heap.
+    index.json maps series keys to rows and records n_days; it is swapped atomically and readers
+    re-open the maps when its mtime changes. Writes are append-only and assume a single ingest process.
+    """
+
+    def __init__(self, directory: str = DEFAULT_ARCHIVE_DIR, check_interval_s: float = 5.0):
+        self.directory = directory
+        self.check_interval_s = check_interval_s
+        self._index: Dict[str, Any] = {}
+        self._columns: Dict[str, np.memmap] = {}
+        self._index_mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._writable = False
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _column_path(self, field: str) -> str:
+        return os.path.join(self.directory, f"{field}.f32")
+
+    # ------------------------------------------------------------------------
+    # Open / reload
+    # ------------------------------------------------------------------------
+
+    def _open(self, writable: bool) -> bool:
+        try:
+            mtime = os.path.getmtime(self.index_path)
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Price archive index unreadable, keeping previous view: {e}")
+            return bool(self._index)
+
+        shape = (index["series_capacity"], index["day_capacity"])
+        mode = "r+" if writable else "r"
+        self._columns = {
+            field: np.memmap(self._column_path(field), dtype=np.float32, mode=mode, shape=shape) for field in FIELDS
+        }
+        self._index = index
+        self._index_mtime = mtime
+        self._writable = writable
+        return True
+
+    def _ensure_fresh(self) -> bool:
+        """Re-maps the archive if the ingest process published a new index. Returns False when no archive exists."""
+        now = time.monotonic()
+        if self._index and now - self._last_check < self.check_interval_s:
+            return True
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except FileNotFoundError:
+            return False
+        if mtime != self._index_mtime:
+            return self._open(writable=self._writable)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._index.get("series", {})) if self._ensure_fresh() else 0
+
+    # ------------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------------
+
+    @property
+    def n_days(self) -> int:
+        """Days from the epoch through the newest ingested day (0 without an archive)."""
+        return self._index["n_days"] if self._ensure_fresh() else 0
+
+    @property
+    def epoch(self) -> Optional[str]:
+        return self._index["epoch"] if self._ensure_fresh() else None
+
+    @property
+    def key_version(self) -> int:
+        """Bumped by rekey(); series rows are only comparable between readers that agree on it."""
+        return self._index.get("key_version", 0) if self._ensure_fresh() else 0
+
+    def day_offset(self, day: date) -> int:
+        return (day - date.fromisoformat(self._index["epoch"])).days
+
+    def last_n(self, commodity: str, market: str, n: int, field: str = "modal_price", end: Optional[date] = None) -> Optional[np.ndarray]:
+        """
+        Last n daily values (oldest first) ending at `end` (default: newest ingested day).
+        Returns a read-only view into the map, NaN where the market did not report, or None if the series is unknown.
+        """
+        if not self._ensure_fresh():
+            return None
+        row = self._index["series"].get(series_key(commodity, market))
+        if row is None:
+            return None
+        stop = self._index["n_days"] if end is None else min(self.day_offset(end) + 1, self._index["n_days"])
+        start = max(0, stop - n)
+        return self._columns[field][row, start:stop]
+
+    def recent_values(self, commodity: str, market: str, n: int, field: str = "modal_price") -> List[float]:
+        """Non-missing values among the last n days, oldest first."""
+        window = self.last_n(commodity, market, n, field)
+        if window is None:
+            return []
+        values = np.asarray(window, dtype=np.float64)
+        return values[~np.isnan(values)].tolist()
+
+    def recent_matrix(self, n: int, field: str = "modal_price") -> Optional[Tuple[Dict[str, int], np.ndarray]]:
+        """(series -> row, view of shape (n_series, <=n)) over the last n days for every series at once."""
+        if not self._ensure_fresh():
+            return None
+        stop = self._index["n_days"]
+        return self._index["series"], self._columns[field][: len(self._index["series"]), max(0, stop - n):stop]
+
+    # ------------------------------------------------------------------------
+    # Append-only ingest
+    # ------------------------------------------------------------------------
+
+    def _create(self, epoch: date) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        shape = (INITIAL_SERIES_CAPACITY, DAY_CAPACITY)
+        for field in FIELDS:
+            # Sparse on disk: rows are only NaN-filled once a series is assigned to them
+            np.memmap(self._column_path(field), dtype=np.float32, mode="w+", shape=shape).flush()
+        self._index = {
+            "epoch": epoch.isoformat(),
+            "n_days": 0,
+            "series_capacity": shape[0],
+            "day_capacity": shape[1],
+            "series": {},
+        }
+        self._publish_index()
+        self._open(writable=True)
+
+    def _grow(self, series_capacity: int, day_capacity: int) -> None:
+        """
+        Enlarges the column files to the given capacities by copying into new files and swapping
+        them in (readers keep their old maps until re-open). New day columns of existing series are NaN.
+        """
+        old_series, old_days = self._index["series_capacity"], self._index["day_capacity"]
+        n_series = len(self._index["series"])
+        for field in FIELDS:
+            tmp_path = f"{self._column_path(field)}.tmp"
+            grown = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(series_capacity, day_capacity))
+            grown[:old_series, :old_days] = self._columns[field]
+            if day_capacity > old_days:
+                grown[:n_series, old_days:] = np.nan
+            grown.flush()
+            del grown
+            os.replace(tmp_path, self._column_path(field))
+        self._index["series_capacity"] = series_capacity
+        self._index["day_capacity"] = day_capacity
+        self._publish_index()
+        self._open(writable=True)
+
+    def _publish_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _row_for(self, key: str) -> int:
+        row = self._index["series"].get(key)
+        if row is None:
+            if len(self._index["series"]) >= self._index["series_capacity"]:
+                self._grow(self._index["series_capacity"] * 2, self._index["day_capacity"])
+            row = len(self._index["series"])
+            self._index["series"][key] = row
+            for field in FIELDS:
+                self._columns[field][row, :] = np.nan
+        return row
+
+    def rekey(self) -> int:
+        """
+        Moves series stored under older commodity spellings (e.g. 'soyabean|indore', written before
+        crop names went through the crop registry) to their series_key, merging series that now
+        share a key. Rows are compacted into new column files; on a day both spellings reported,
+        the series already under the canonical key wins. Returns the number of series re-keyed.
+        """
+        if not self._open(writable=True):
+            return 0
+        groups: Dict[str, List[Tuple[bool, int]]] = {}
+        for key, row in sorted(self._index["series"].items(), key=lambda item: item[1]):
+            canonical = series_key(*key.split("|", 1))
+            groups.setdefault(canonical, []).append((canonical != key, row))
+        renamed = sum(1 for rows in groups.values() for moved, _ in rows if moved)
+        if not renamed:
+            return 0
+
+        shape = (self._index["series_capacity"], self._index["day_capacity"])
+        for field in FIELDS:
+            tmp_path = f"{self._column_path(field)}.tmp"
+            compacted = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=shape)
+            for new_row, rows in enumerate(groups.values()):
+                # Canonical spelling first, then older spellings fill the days it is missing
+                rows = sorted(rows)
+                compacted[new_row] = self._columns[field][rows[0][1]]
+                for _, row in rows[1:]:
+                    missing = np.isnan(compacted[new_row])
+                    compacted[new_row, missing] = self._columns[field][row, missing]
+            compacted.flush()
+            del compacted
+            os.replace(tmp_path, self._column_path(field))
+        self._index["series"] = {key: row for row, key in enumerate(groups)}
+        self._index["key_version"] = self._index.get("key_version", 0) + 1
+        self._publish_index()
+        self._open(writable=True)
+        logger.info(f"Price archive re-keyed {renamed} series into {len(groups)}")
+        return renamed
+
+    def append_day(self, day: date, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Writes one day's reports. Each record needs commodity, market and any of FIELDS.
+        Re-ingesting a day overwrites its column; days before the epoch are rejected and days past
+        the day capacity double it. Returns the number of records written.
+        """
+        if not self._writable and not self._open(writable=True):
+            self._create(epoch=min(day, DEFAULT_EPOCH))
+
+        offset = self.day_offset(day)
+        if offset < 0:
+            raise ValueError(f"{day} is before the archive's epoch {self._index['epoch']}")
+        if offset >= self._index["day_capacity"]:
+            day_capacity = self._index["day_capacity"]
+            while offset >= day_capacity:
+                day_capacity *= 2
+            self._grow(self._index["series_capacity"], day_capacity)
+
+        written = 0
+        for record in records:
+            commodity, market = record.get("commodity"), record.get("market")
+            if not commodity or not market:
+                continue
+            row = self._row_for(series_key(commodity, market))
+            for field in FIELDS:
+                value = record.get(field)
+                if value is None:
+                    continue
+                try:
+                    self._columns[field][row, offset] = float(str(value).replace(",", ""))
+                except ValueError:
+                    continue
+            written += 1
+
+        for column in self._columns.values():
+            column.flush()
+        self._index["n_days"] = max(self._index["n_days"], offset + 1)
+        self._publish_index()
+        self._index_mtime = os.path.getmtime(self.index_path)
+        return written
+
+# Singleton
+price_archive = PriceArchive(os.getenv("PRICE_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR))
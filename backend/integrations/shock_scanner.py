@@ -0,0 +1,229 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from engine.rolling_stats import RollingStatsIndex, DEFAULT_STATS_PATH
+from engine.shock_analyzer import classify_price_shock, detect_volume_shock
+from engine.spatial_index import SpatialIndex
+from integrations.mandi_snapshot import mandi_snapshot, normalize_crop_name
+from integrations.price_archive import price_archive, series_key
+
+logger = logging.getLogger(__name__)
+
+SHOCK_SCAN_INTERVAL_S = float(os.getenv("SHOCK_SCAN_INTERVAL_S", "900"))
+SHOCK_WINDOW_DAYS = 7
+# Radius within which a glut at another mandi counts as "neighbouring"
+GLUT_RADIUS_KM = 100.0
+ROLLING_STATS_PATH = os.getenv("ROLLING_STATS_PATH", DEFAULT_STATS_PATH)
+
+_NO_VOLUME_SHOCK = {"status": "NORMAL", "message": "Volume is normal.", "is_shock": False}
+
+def _optional(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+class ShockScanner:
+    """
+    Region-wide price and volume shock scan.
+    Periodically evaluates every commodity x mandi of the verified snapshot in one vectorized pass
+    and publishes an alert table. Requests read a mandi's verdict with a dict lookup and
+    neighbouring gluts with a spatial query, instead of re-running the analyzers per farmer.
+    Rolling statistics live in one long-lived index: each newly archived day is a single O(1)
+    tick per series, the index is restored at startup and saved on shutdown, and the archive is
+    only replayed when the index is missing or belongs to a different archive.
+    """
+
+    def __init__(self, window: int = SHOCK_WINDOW_DAYS):
+        self.window = window
+        self.stats = RollingStatsIndex()
+        self.alerts: Dict[str, Dict[str, Any]] = {}
+        self.region_index: Optional[SpatialIndex] = None
+        self.scanned_at: Optional[float] = None
+        self._source_signature: Optional[Tuple] = None
+        # Serializes ingest (scan thread) with save (app shutdown)
+        self._lock = threading.Lock()
+
+    def restore(self, path: str = ROLLING_STATS_PATH) -> bool:
+        """Loads the index saved by the previous process (startup). Returns False when there is none to use."""
+        try:
+            stats = RollingStatsIndex.load(path)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable rolling stats at {path}: {e}")
+            return False
+        if self.window not in stats.windows:
+            logger.warning(f"Saved rolling stats lack the {self.window}-day window; rebuilding from the archive")
+            return False
+        with self._lock:
+            self.stats = stats
+        return True
+
+    def save(self, path: str = ROLLING_STATS_PATH) -> None:
+        """Persists the index for the next process (shutdown)."""
+        with self._lock:
+            if not len(self.stats):
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.stats.save(path)
+        logger.info(f"Rolling stats saved for {len(self.stats)} series")
+
+    def _markets(self) -> List[Tuple[str, Dict[str, Any]]]:
+        snapshot = mandi_snapshot.current
+        if not snapshot:
+            return []
+        return [(commodity, m) for commodity, data in snapshot.commodities.items() for m in data.get("markets", []) if "name" in m]
+
+    def _stats_row(self, key: str) -> int:
+        commodity, market = key.split("|", 1)
+        return self.stats.row_for(commodity, market)
+
+    def ingest_archive(self) -> int:
+        """
+        Ticks the index with every archived day it has not seen yet (one vectorized update per day).
+        The newest archived day is held back: it is "today", judged against the preceding window,
+        and is ingested once a later day arrives. Returns the number of days ingested.
+        """
+        epoch, n_days, key_version = price_archive.epoch, price_archive.n_days, price_archive.key_version
+        meta = self.stats.meta
+        if "ingested_days" not in meta or epoch != meta.get("epoch") or key_version != meta.get("key_version", 0):
+            # No index yet, or a new/rebuilt/re-keyed archive: replay just enough days to fill the longest window
+            self.stats = RollingStatsIndex(capacity=max(1024, len(price_archive)))
+            self.stats.meta = {"epoch": epoch, "key_version": key_version, "ingested_days": max(0, n_days - 1 - self.stats.max_window)}
+        start, stop = self.stats.meta["ingested_days"], n_days - 1
+        if stop <= start:
+            return 0
+
+        prices = price_archive.recent_matrix(n_days - start, "modal_price")
+        volumes = price_archive.recent_matrix(n_days - start, "arrivals")
+        if prices is None or volumes is None:
+            return 0
+        keys = sorted(prices[0], key=prices[0].get)
+        rows = np.array([self._stats_row(key) for key in keys], dtype=np.int64)
+        price_days = np.asarray(prices[1][: len(keys)], dtype=float)
+        # Agmarknet arrivals are tonnes
+        volume_days = np.asarray(volumes[1][: len(keys)], dtype=float) * 10
+        for day in range(stop - start):
+            self.stats.update_rows(rows, price_days[:, day], volume_days[:, day])
+        self.stats.meta["ingested_days"] = stop
+        return stop - start
+
+    def scan(self) -> int:
+        """Recomputes the alert table (blocking; run off the event loop). Returns the number of active shocks."""
+        markets = self._markets()
+        with self._lock:
+            ingested = self.ingest_archive()
+            keys = [series_key(commodity, m["name"]) for commodity, m in markets]
+            rows = np.array([self._stats_row(key) for key in keys], dtype=np.int64)
+            current_price = np.array([float(m.get("price", np.nan)) for _, m in markets])
+            current_volume = np.full(len(markets), np.nan)
+
+            # The newest archived day is "today" for every market the archive covers
+            prices = price_archive.recent_matrix(1, "modal_price")
+            volumes = price_archive.recent_matrix(1, "arrivals")
+            if prices is not None and volumes is not None and len(markets) and prices[1].shape[1]:
+                archive_rows = np.array([prices[0].get(key, -1) for key in keys])
+                have = archive_rows >= 0
+                latest = np.asarray(prices[1][archive_rows[have], -1], dtype=float)
+                current_price[have] = np.where(np.isnan(latest), current_price[have], latest)
+                current_volume[have] = np.asarray(volumes[1][archive_rows[have], -1], dtype=float) * 10
+
+            n, mean, stdev = self.stats.window_stats(rows, self.window)
+            z_scores = self.stats.zscores(rows, current_price, self.window)
+            volume_ratios = self.stats.volume_ratios(rows, current_volume, self.window)
+        average_volume = current_volume / volume_ratios
+
+        alerts: Dict[str, Dict[str, Any]] = {}
+        for i, (commodity, m) in enumerate(markets):
+            price_shock = classify_price_shock(current_price[i], int(n[i]), mean[i], stdev[i])
+            if np.isnan(volume_ratios[i]):
+                volume_shock = _NO_VOLUME_SHOCK
+            else:
+                volume_shock = detect_volume_shock(current_volume[i], average_volume[i])
+            alerts[keys[i]] = {
+                "commodity": commodity,
+                "mandi_name": m["name"],
+                "lat": m.get("lat"),
+                "lng": m.get("lng"),
+                "current_price": _optional(current_price[i]),
+                "history_days": int(n[i]),
+                "z_score": _optional(z_scores[i]),
+                "volume_ratio": _optional(volume_ratios[i]),
+                "price_shock": price_shock,
+                "volume_shock": volume_shock,
+                "is_shock": price_shock["is_shock"] or volume_shock["is_shock"],
+            }
+
+        region_index = SpatialIndex(
+            (a["lat"], a["lng"], a) for a in alerts.values() if a["is_shock"] and a["lat"] is not None and a["lng"] is not None
+        )
+        # Publish as whole objects; readers on the event loop never see a half-built table
+        self.alerts, self.region_index, self.scanned_at = alerts, region_index, time.time()
+        active = sum(1 for a in alerts.values() if a["is_shock"])
+        logger.info(f"Shock scan: {len(alerts)} mandis evaluated, {active} active shocks, {ingested} new archive days ingested")
+        return active
+
+    def _signature(self) -> Tuple:
+        snapshot = mandi_snapshot.current
+        try:
+            archive_mtime = os.path.getmtime(price_archive.index_path)
+        except OSError:
+            archive_mtime = None
+        return (snapshot.mtime if snapshot else None, archive_mtime)
+
+    async def run(self, interval_s: float = SHOCK_SCAN_INTERVAL_S) -> None:
+        """Background loop started by the app lifespan; rescans only when the snapshot or archive changed."""
+        while True:
+            try:
+                await mandi_snapshot.get()
+                signature = self._signature()
+                if signature != self._source_signature:
+                    await asyncio.to_thread(self.scan)
+                    self._source_signature = signature
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Shock scan failed: {e}")
+            await asyncio.sleep(interval_s)
+
+    # ------------------------------------------------------------------------
+    # O(1) reads
+    # ------------------------------------------------------------------------
+
+    def lookup(self, commodity: str, mandi_name: str) -> Optional[Dict[str, Any]]:
+        return self.alerts.get(series_key(commodity, mandi_name))
+
+    def query(
+        self,
+        commodity: Optional[str] = None,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        radius_km: float = GLUT_RADIUS_KM
+    ) -> List[Dict[str, Any]]:
+        """Active shocks, optionally restricted to a commodity and/or a radius around a point (nearest first)."""
+        if lat is not None and lng is not None:
+            if self.region_index is None:
+                return []
+            found = [{**a, "distance_km": round(d, 1)} for a, d in self.region_index.within_radius(lat, lng, radius_km)]
+        else:
+            found = [a for a in self.alerts.values() if a["is_shock"]]
+        if commodity:
+            commodity = normalize_crop_name(commodity)
+            found = [a for a in found if a["commodity"] == commodity]
+        return found
+
+    def neighbouring_gluts(self, commodity: str, lat: float, lng: float, exclude: Optional[str] = None,
+                           radius_km: float = GLUT_RADIUS_KM) -> List[Dict[str, Any]]:
+        """Volume gluts at other mandis within radius_km, nearest first."""
+        excluded = series_key(commodity, exclude) if exclude else None
+        return [
+            a for a in self.query(commodity, lat, lng, radius_km)
+            if a["volume_shock"]["is_shock"] and series_key(a["commodity"], a["mandi_name"]) != excluded
+        ]
+
+# Singleton
+shock_scanner = ShockScanner()
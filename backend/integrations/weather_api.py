@@ -1,44 +1,148 @@
+import time
+import math
+import asyncio
 import logging
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.http_clients import http_clients
+from core.async_cache import AsyncTTLCache
 
 logger = logging.getLogger(__name__)
 
-async def fetch_district_weather(location: dict) -> Dict[str, Any]:
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+# ~0.1 degree (~11 km) cells: every farmer in the same village shares one upstream call
+WEATHER_GRID_DEG = 0.1
+
+# Keys carry the current UTC hour, so entries roll over with Open-Meteo's hourly model refresh.
+WEATHER_CACHE = AsyncTTLCache(maxsize=20000, ttl=3600, stale_ttl=0)
+
+# Cells currently being fetched, so concurrent requests for the same cell share one call
+_inflight_cells: Dict[Tuple[int, int, int], asyncio.Future] = {}
+
+def weather_cell(lat: float, lng: float) -> Tuple[int, int]:
+    """Quantizes a GPS point to its weather grid cell."""
+    return (int(math.floor(lat / WEATHER_GRID_DEG)), int(math.floor(lng / WEATHER_GRID_DEG)))
+
+def _cell_center(cell: Tuple[int, int]) -> Tuple[float, float]:
+    return (round((cell[0] + 0.5) * WEATHER_GRID_DEG, 4), round((cell[1] + 0.5) * WEATHER_GRID_DEG, 4))
+
+def _fallback_weather() -> Dict[str, Any]:
+    # Graceful Fallback
+    return {
+        "temperature_c": 32.5,
+        "humidity_percent": 65,
+        "rain_probability_percent": 10,
+        "soil_moisture_percent": 22.1,
+        "is_verified_env": False
+    }
+
+def _current_hour_offset(current: Dict[str, Any], hourly: Dict[str, Any]) -> int:
+    """Index of the current hour in Open-Meteo's hourly arrays (which start at midnight)."""
+    now = str(current.get("time", ""))[:13]
+    for i, ts in enumerate(hourly.get("time", [])):
+        if str(ts)[:13] == now:
+            return i
+    return 0
+
+def _at_hour(values: List[Any], offset: int, default: Any) -> Any:
+    """values[offset], clamped to the array (default when the array is empty)."""
+    if not values:
+        return default
+    return values[min(offset, len(values) - 1)]
+
+def _map_open_meteo(data: Dict[str, Any]) -> Dict[str, Any]:
+    current = data.get("current", {})
+    hourly = data.get("hourly", {})
+    offset = _current_hour_offset(current, hourly)
+    
+    # Map Open-Meteo fields to our schema
+    return {
+        "temperature_c": current.get("temperature_2m", 30.0),
+        "humidity_percent": current.get("relative_humidity_2m", 60),
+        "rain_probability_percent": _at_hour(hourly.get("precipitation_probability"), offset, 0), # Current hour's probe
+        "soil_moisture_percent": round(_at_hour(hourly.get("soil_moisture_0_to_1cm"), offset, 0.25) * 100, 1), # Data is usually m3/m3, convert to %
+        # Hour-by-hour forecast starting at the current hour (feeds the 72-hour sell-window optimizer)
+        "hourly_temperature_c": hourly.get("temperature_2m", [])[offset:],
+        "hourly_humidity_percent": hourly.get("relative_humidity_2m", [])[offset:],
+        "is_verified_env": True
+    }
+
+async def _fetch_cells(cells: List[Tuple[int, int]], client: Optional[httpx.AsyncClient]) -> List[Dict[str, Any]]:
+    """One Open-Meteo request for many cells (the API accepts comma-separated coordinate lists)."""
+    centers = [_cell_center(c) for c in cells]
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in centers),
+        "longitude": ",".join(str(lng) for _, lng in centers),
+        "current": "temperature_2m,relative_humidity_2m,precipitation",
+        "hourly": "temperature_2m,relative_humidity_2m,precipitation_probability,soil_moisture_0_to_1cm",
+        # 72h departure window + longest reachable transit, counted from the current hour
+        "forecast_days": 5,
+    }
+    client = client or http_clients.get("open_meteo")
+    response = await client.get(OPEN_METEO_URL, params=params)
+    response.raise_for_status()
+    data = response.json()
+    # A single coordinate returns one object; several return a list in request order
+    payloads = data if isinstance(data, list) else [data]
+    if len(payloads) != len(cells):
+        raise ValueError(f"Open-Meteo returned {len(payloads)} locations for {len(cells)} requested")
+    return [_map_open_meteo(p) for p in payloads]
+
+async def fetch_weather_batch(locations: List[dict], client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
+    """
+    Current conditions for many GPS points with at most one upstream round-trip.
+    Points are quantized to ~0.1 degree cells; cells cached for the current hour or already being
+    fetched by another request are not requested again. Failed cells get the seasonal fallback.
+    """
+    hour_slot = int(time.time() // 3600)
+    keys = [weather_cell(loc.get("lat", 18.5204), loc.get("lng", 73.8567)) + (hour_slot,) for loc in locations]
+
+    resolved: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+    waiting: Dict[Tuple[int, int, int], asyncio.Future] = {}
+    to_fetch: List[Tuple[int, int, int]] = []
+    for key in dict.fromkeys(keys):
+        entry = WEATHER_CACHE.peek(key)
+        if entry is not None:
+            WEATHER_CACHE.hits += 1
+            resolved[key] = entry[0]
+        elif key in _inflight_cells:
+            WEATHER_CACHE.hits += 1
+            waiting[key] = _inflight_cells[key]
+        else:
+            WEATHER_CACHE.misses += 1
+            to_fetch.append(key)
+
+    if to_fetch:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in to_fetch}
+        _inflight_cells.update(futures)
+        try:
+            results = await _fetch_cells([key[:2] for key in to_fetch], client)
+            for key, weather in zip(to_fetch, results):
+                WEATHER_CACHE.set(key, weather)
+                resolved[key] = weather
+        except Exception as e:
+            logger.error(f"Environmental API Error: {e}. Falling back to seasonal heuristics.")
+            for key in to_fetch:
+                resolved[key] = _fallback_weather()
+        finally:
+            for key, future in futures.items():
+                _inflight_cells.pop(key, None)
+                # A cancelled fetch leaves waiters with the (uncached) seasonal fallback
+                future.set_result(resolved.get(key) or _fallback_weather())
+
+    for key, future in waiting.items():
+        resolved[key] = await asyncio.shield(future)
+
+    # Each caller gets its own dict so request handlers can annotate it safely
+    return [dict(resolved[key]) for key in keys]
+
+async def fetch_district_weather(location: dict, client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """
     Fetches real-time weather and soil data from Open-Meteo based on GPS coordinates.
     Includes Temperature, Humidity, Precipitation probability, and Soil Moisture.
+    Served from the hourly grid-cell cache when a neighbour has already asked for the same cell.
     """
-    lat = location.get("lat", 18.5204)
-    lng = location.get("lng", 73.8567)
-    
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lng}&current=temperature_2m,relative_humidity_2m,precipitation&hourly=precipitation_probability,soil_moisture_0_to_1cm&forecast_days=1"
-    
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            current = data.get("current", {})
-            hourly = data.get("hourly", {})
-            
-            # Map Open-Meteo fields to our schema
-            return {
-                "temperature_c": current.get("temperature_2m", 30.0),
-                "humidity_percent": current.get("relative_humidity_2m", 60),
-                "rain_probability_percent": hourly.get("precipitation_probability", [0])[0], # Take first hour probe
-                "soil_moisture_percent": round(hourly.get("soil_moisture_0_to_1cm", [0.25])[0] * 100, 1), # Data is usually m3/m3, convert to %
-                "is_verified_env": True
-            }
-            
-    except Exception as e:
-        logger.error(f"Environmental API Error: {e}. Falling back to seasonal heuristics.")
-        # Graceful Fallback
-        return {
-            "temperature_c": 32.5,
-            "humidity_percent": 65,
-            "rain_probability_percent": 10,
-            "soil_moisture_percent": 22.1,
-            "is_verified_env": False
-        }
+    return (await fetch_weather_batch([location], client))[0]
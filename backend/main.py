@@ -1,14 +1,55 @@
+import asyncio
+import json
+import logging
+import numpy as np
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from engine.profit_calc import get_net_realization
 from engine.map_logic import calculate_spatial_profit
+from engine.sell_window import optimize_sell_window, SELL_WINDOW_HOURS
 from engine.shock_analyzer import detect_market_shock, detect_volume_shock
-from integrations.mandi_api import fetch_mandi_prices
-from integrations.weather_api import fetch_district_weather
+from integrations.mandi_api import fetch_mandi_prices, resolve_crop
+from integrations.weather_api import fetch_weather_batch, weather_cell, WEATHER_CACHE
+from integrations.enam_client import LONG_CACHE, SHORT_CACHE
+from integrations.mandi_snapshot import mandi_snapshot
+from engine.spatial_index import DEFAULT_LAT, DEFAULT_LNG
+from engine.road_matrix import road_matrix
+from integrations.apmc_locator import apmc_locator
+from integrations.shock_scanner import shock_scanner, GLUT_RADIUS_KM
+from core.http_clients import http_clients
+from core.metrics import metrics, span, timed, ServerTimingMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from core.rate_limiter import llm_gate_stats
+from core.circuit_breaker import breaker_stats
 
-app = FastAPI(title="AgriChain API", description="The Temporal Arbitrage Engine")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse the verified mandi dataset once per process; requests read the in-memory snapshot
+    mandi_snapshot.reload()
+    apmc_locator.rebuild()
+    # Pooled keep-alive HTTP clients shared by every integration
+    http_clients.open()
+    # Enrich the local market index with the national e-NAM APMC list without delaying startup
+    apmc_refresh = asyncio.create_task(apmc_locator.refresh())
+    # Region-wide shock scan; requests read its alert table instead of analysing per farmer.
+    # Its rolling statistics carry over from the previous process, so only new archive days are ingested.
+    shock_scanner.restore()
+    shock_scan = asyncio.create_task(shock_scanner.run())
+    # Co-load matching runs on its own thread; recommendations read its last published plan
+    load_board.start()
+    yield
+    load_board.stop()
+    apmc_refresh.cancel()
+    shock_scan.cancel()
+    shock_scanner.save()
+    await http_clients.aclose()
+
+app = FastAPI(title="AgriChain API", description="The Temporal Arbitrage Engine", lifespan=lifespan)
 
 # Configure CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -19,12 +60,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-stage Server-Timing header and request/stage latency histograms for /metrics
+app.add_middleware(ServerTimingMiddleware)
 
-from api.chat import router as chat_router, generate_vakeel_brief
+from api.chat import router as chat_router, peek_cached_brief, generate_vakeel_brief, brief_store, llm_cache, tts_cache
 from api.user import router as user_router
+from api.loads import router as loads_router, load_board
 
 app.include_router(chat_router, prefix="/chat", tags=["AI Explanation"])
 app.include_router(user_router, prefix="/user", tags=["User Data Management"])
+app.include_router(loads_router, prefix="/loads", tags=["Load Matching"])
+
+# Cache hit rates and Groq gate occupancy are read from their owners at scrape time
+metrics.register_cache("weather", WEATHER_CACHE.stats)
+metrics.register_cache("enam_structural", LONG_CACHE.stats)
+metrics.register_cache("enam_live", SHORT_CACHE.stats)
+metrics.register_cache("llm", llm_cache.stats)
+metrics.register_cache("tts", tts_cache.stats)
+metrics.register_gates(llm_gate_stats)
+metrics.register_breakers(breaker_stats)
 
 class HarvestRequest(BaseModel):
     crop: str = ""
@@ -33,10 +87,282 @@ class HarvestRequest(BaseModel):
     base_spoilage_rate: float = 0.05 # 5% base spoilage
     language: str = "en"
 
+class BatchMember(HarvestRequest):
+    member_id: Optional[str] = None
+    crops: List[str] = [] # Several crops for one farmer; falls back to `crop`
+
+class BatchHarvestRequest(BaseModel):
+    members: List[BatchMember]
+
+# Upper bound on (member, crop) jobs per batch and on concurrent upstream fetch groups
+MAX_BATCH_JOBS = 2000
+BATCH_FETCH_CONCURRENCY = 16
+
+async def fetch_route_weather(location: dict, regional_mandis: List[Dict[str, Any]]) -> tuple:
+    """
+    Farm conditions plus destination conditions for every candidate mandi, in one batched (and
+    hourly cached) weather call: the farmer's cell rides in the same request as the mandi cells.
+    """
+    mandis_with_coords = [i for i, m in enumerate(regional_mandis) if "lat" in m and "lng" in m]
+    fetched = await fetch_weather_batch([location] + [regional_mandis[i] for i in mandis_with_coords])
+    destination_weather = [None] * len(regional_mandis)
+    for i, weather in zip(mandis_with_coords, fetched[1:]):
+        destination_weather[i] = weather
+    return fetched[0], destination_weather
+
+async def fetch_recommendation_inputs(data: "HarvestRequest") -> tuple:
+    """
+    Mandi prices, then one weather round-trip for the farm and every candidate mandi.
+    The weather call needs the mandi coordinates, so it follows the mandi fetch. That is never slower
+    than fetching the farm cell alongside the mandis and the destinations afterwards: it saves one
+    weather round-trip and the mandi fetch was already on the critical path.
+    """
+    mandi_response = await timed("mandi", fetch_mandi_prices(data.crop, data.location, data.language))
+    weather_data, destination_weather = await timed("weather", fetch_route_weather(data.location, mandi_response["regional_options"]))
+    return weather_data, mandi_response, destination_weather
+
+def compute_recommendation(
+    data: HarvestRequest,
+    weather_data: Dict[str, Any],
+    mandi_response: Dict[str, Any],
+    destination_weather: List[Optional[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Pure engine pass behind /recommendation: shock analysis, spatial profit, sell window and
+    the final decision, from already-fetched weather and mandi data (no I/O, no AI brief).
+    """
+    primary_mandi = mandi_response["primary"]
+    regional_mandis = mandi_response["regional_options"]
+    # The commodity the mandi fetch resolved (language default for a blank crop, regional aliases);
+    # alerts, gluts and the decay model are all keyed on it rather than on the raw request crop
+    crop = mandi_response.get("crop") or data.crop
+    
+    # 2. Risk & Shock Analysis (on Primary Mandi)
+    # Verdicts come from the precomputed alert table; mandis the scanner does not cover are analysed inline
+    with span("shock"):
+        scanned = shock_scanner.lookup(crop, primary_mandi["name"])
+        if scanned:
+            price_shock, volume_shock = scanned["price_shock"], scanned["volume_shock"]
+        else:
+            price_shock = detect_market_shock(primary_mandi["current_price"], primary_mandi["7_day_history"])
+            if primary_mandi.get("current_volume_quintals") is None or not primary_mandi.get("average_volume_quintals"):
+                # No archived arrivals for this mandi: the volume is unknown, so there is nothing to judge
+                volume_shock = {"status": "NORMAL", "message": "Insufficient data for volume analysis.", "is_shock": False}
+            else:
+                volume_shock = detect_volume_shock(primary_mandi["current_volume_quintals"], primary_mandi["average_volume_quintals"])
+
+        # A glut at a neighbouring mandi is a volume shock for this farmer too
+        if not volume_shock["is_shock"] and "lat" in primary_mandi and "lng" in primary_mandi:
+            gluts = shock_scanner.neighbouring_gluts(crop, primary_mandi["lat"], primary_mandi["lng"], exclude=primary_mandi["name"])
+            if gluts:
+                volume_shock = {**gluts[0]["volume_shock"], "glut_mandi": gluts[0]["mandi_name"]}
+
+    # Determine if there's any active shock (copied: the pivot below annotates it)
+    active_shock = None
+    if price_shock["is_shock"]:
+        active_shock = dict(price_shock)
+    elif volume_shock["is_shock"]:
+        active_shock = dict(volume_shock)
+    elif weather_data["rain_probability_percent"] > 80:
+         active_shock = {
+            "status": "WEATHER_SHOCK",
+            "message": "Heavy rain > 80% probability in next 2 hours!",
+            "is_shock": True,
+            "pivot_advice": "EMERGENCY: Cover your produce immediately or delay transit!"
+        }
+
+    # 3. Spatial Profit Analysis (Map Logic)
+    temp_today = weather_data["temperature_c"]
+    humidity_today = weather_data["humidity_percent"]
+    soil_moisture_today = weather_data.get("soil_moisture_percent", 45.0) # Real satellite data
+
+    # Where a pooled vehicle to a mandi has room near this farmer, its per-km share replaces the
+    # solo rate for departing now, so co-loading feeds straight into the ranking
+    coload_quotes = load_board.quote_rates(data.location, data.yield_est_quintals, regional_mandis)
+    # The sell window may depart hours from now, in another departure window: each hour gets that window's quotes
+    coload_rate_surface = load_board.quote_rate_surface(data.location, data.yield_est_quintals, regional_mandis, SELL_WINDOW_HOURS)
+    solo_rates = [m.get("transport_rate_per_km", 15.0) for m in regional_mandis]
+    if coload_quotes:
+        regional_mandis = [
+            {**m, "transport_rate_per_km": coload_quotes[m["name"]]["effective_rate_per_km"], "co_load": coload_quotes[m["name"]]}
+            if m["name"] in coload_quotes else m
+            for m in regional_mandis
+        ]
+    
+    # Calculate logistics and profit for ALL regional options
+    with span("spatial_profit"):
+        spatial_profits = calculate_spatial_profit(
+            crop=crop,
+            yield_est=data.yield_est_quintals,
+            temp_c=temp_today,
+            humidity=humidity_today,
+            available_mandis=regional_mandis,
+            destination_weather=destination_weather
+        )
+
+    best_overall_mandi = spatial_profits[0]
+
+    # 3.2 72-Hour Sell-Window Optimizer over the hourly forecast x every regional mandi
+    with span("sell_window"):
+        window = optimize_sell_window(
+            crop=crop,
+            yield_est=data.yield_est_quintals,
+            hourly_temps=weather_data.get("hourly_temperature_c", []),
+            hourly_humidity=weather_data.get("hourly_humidity_percent", []),
+            market_prices=[m["current_price"] for m in regional_mandis],
+            distances_km=[m["distance_km"] for m in regional_mandis],
+            transport_rates=coload_rate_surface if coload_rate_surface is not None else solo_rates,
+            transit_hours=[m.get("transit_hours") for m in regional_mandis],
+            fallback_temp_c=temp_today,
+            fallback_humidity=humidity_today
+        )
+    surface_columns = [i for i, ok in enumerate(window["is_reachable"]) if ok]
+    sell_window = {
+        "best_mandi": regional_mandis[window["best_mandi_index"]]["name"],
+        "best_departure_hour": window["best_departure_hour"],
+        "window_start_hour": window["window_start_hour"],
+        "window_end_hour": window["window_end_hour"],
+        "net_profit_per_quintal": window["best_net_profit_per_quintal"],
+        "total_net_profit": window["best_total_net_profit"],
+        "quality_loss_pct": window["best_quality_loss_pct"],
+        "profit_surface": {
+            "departure_hours": window["departure_hours"],
+            "mandis": [regional_mandis[i]["name"] for i in surface_columns],
+            "net_profit_per_quintal": window["profit_surface"][:, surface_columns].tolist()
+        }
+    }
+
+    dist = primary_mandi["distance_km"]
+
+    # Calculate for TODAY (Assume 2 hours shelf/transit time to primary)
+    estimated_transit_hours = 2.0
+    profit_today = get_net_realization(
+        market_price=primary_mandi["current_price"],
+        crop_type=crop,
+        distance_km=dist,
+        temp_c=temp_today,
+        humidity=humidity_today,
+        hours_to_market=estimated_transit_hours,
+        yield_est=data.yield_est_quintals
+    )
+
+    # Calculate for 48 HOURS (Assume 50 hours shelf/transit time total)
+    price_forecast_48h = primary_mandi["current_price"] * 1.05 
+    temp_forecast_48h = temp_today + 2.0 
+
+    profit_48h = get_net_realization(
+        market_price=price_forecast_48h,
+        crop_type=crop,
+        distance_km=primary_mandi["distance_km"], # Forecast is usually for the nearest/default market
+        temp_c=temp_forecast_48h,
+        humidity=humidity_today,
+        hours_to_market=50.0,
+        yield_est=data.yield_est_quintals
+    )
+
+    # 3.5 UNIFIED DECISION LOGIC: Pick the absolute BEST market today
+    # spatial_profits[0] is already sorted by total_net_profit descending
+    best_optimal_option = spatial_profits[0]
+
+    # Promoting the BEST regional option to be our Primary recommendation baseline
+    profit_today = best_optimal_option["net_profit_per_quintal"]
+    total_profit_today = best_optimal_option["total_net_profit"]
+    best_mandi_name = best_optimal_option["mandi_name"]
+    dist_best = best_optimal_option["distance_km"]
+
+    gross_rev = best_optimal_option["market_price"] * data.yield_est_quintals
+    logistics_cost = dist_best * best_optimal_option["transport_rate_per_km"]
+    spoilage_penalty = (best_optimal_option["quality_loss_pct"] / 100.0) * gross_rev
+
+    # 4. Synthesize Final Recommendation & Routing Pivot
+    is_selling_optimal = profit_today >= profit_48h
+    status = "GREEN" if is_selling_optimal else "RED"
+
+    pivot_mandi = None
+
+    # Alternative Destination Discovery Trigger
+    if active_shock:
+        status = "RED" # Shocks always override to RED/WAIT for primary
+
+        # Find the best alternative that IS NOT the primary mandi
+        for option in spatial_profits:
+            if option["mandi_name"] != primary_mandi["name"] and not option.get("is_dead_zone"):
+                pivot_mandi = option
+                break
+
+        if pivot_mandi:
+             active_shock["pivot_advice"] = f"EMERGENCY: Primary market crashed. Re-routing you to {pivot_mandi['mandi_name']} ({round(pivot_mandi['distance_km'], 1)}km). Estimated Net Profit: ₹{pivot_mandi['total_net_profit']}"
+             active_shock["pivot_mandi"] = pivot_mandi
+
+    recommendation = {
+        "status": status,
+        "crop": crop,
+        "net_realization_inr_per_quintal": round(profit_today, 2),
+        "total_net_profit": round(total_profit_today, 2),
+        "yield_quintals": data.yield_est_quintals,
+        "breakdown": {
+            "gross_revenue": round(gross_rev, 2),
+            "logistics_cost": round(logistics_cost, 2),
+            "spoilage_penalty": round(spoilage_penalty, 2),
+            "quality_loss_pct": round(best_optimal_option["quality_loss_pct"], 2)
+        },
+        "profit_forecast_48h": round(profit_48h, 2),
+        "best_mandi": f"{best_mandi_name} ({round(dist_best, 1)} km)",
+        "weather": weather_data,
+        "mandi_stats": {
+            "name": best_mandi_name,
+            "current_price": best_optimal_option["market_price"],
+            "distance_km": dist_best,
+            "quality_loss_pct": best_optimal_option["quality_loss_pct"]
+        },
+        "sell_window": sell_window,
+        "shock_alert": active_shock,
+        # Set when live price sources were skipped (open circuit, exhausted budget) or only estimates were available
+        "data_quality": {
+            "mandi_source": mandi_response.get("source"),
+            "degraded": mandi_response.get("degraded", False),
+            "degraded_reasons": mandi_response.get("degraded_reasons", [])
+        },
+        "regional_options": spatial_profits, # Send all map data for the Market Maps tab
+        "decay_metrics": {
+            "today_profit": round(profit_today, 2),
+            "future_profit": round(profit_48h, 2),
+            "profit_difference": round(profit_today - profit_48h, 2)
+        }
+    }
+    
+    return recommendation
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "AgriChain backend is running."}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape target: request/stage latency histograms, mandi source tiers, cache hit rates, Groq gates."""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/mandis/nearest")
+async def nearest_mandis(lat: float, lng: float, k: int = 5, radius_km: Optional[float] = None):
+    """
+    Nearest mandis/APMCs to a GPS point, answered from the local spatial index
+    (replaces the remote e-NAM 'GPS Nearest APMC' call).
+    """
+    return {"results": await apmc_locator.get_nearest_apmc({"lat": lat, "lng": lng}, k=k, radius_km=radius_km)}
+
+@app.get("/shocks")
+def active_shocks(
+    commodity: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius_km: float = GLUT_RADIUS_KM
+):
+    """Active price/volume shocks from the last region-wide scan, filtered by commodity and/or radius around a point."""
+    return {
+        "scanned_at": shock_scanner.scanned_at,
+        "results": shock_scanner.query(commodity, lat, lng, radius_km)
+    }
+
 @app.post("/recommendation")
 async def get_harvest_recommendation(data: HarvestRequest):
     """
@@ -47,138 +373,18 @@ async def get_harvest_recommendation(data: HarvestRequest):
     """
     try:
         # 1. Fetch Integration Data
-        weather_data = await fetch_district_weather(data.location)
-        mandi_response = await fetch_mandi_prices(data.crop, data.location, data.language)
-        primary_mandi = mandi_response["primary"]
-        regional_mandis = mandi_response["regional_options"]
-        
-        # 2. Risk & Shock Analysis (on Primary Mandi)
-        price_shock = detect_market_shock(primary_mandi["current_price"], primary_mandi["7_day_history"])
-        volume_shock = detect_volume_shock(primary_mandi["current_volume_quintals"], primary_mandi["average_volume_quintals"])
-        
-        # Determine if there's any active shock
-        active_shock = None
-        if price_shock["is_shock"]:
-            active_shock = price_shock
-        elif volume_shock["is_shock"]:
-            active_shock = volume_shock
-        elif weather_data["rain_probability_percent"] > 80:
-             active_shock = {
-                "status": "WEATHER_SHOCK",
-                "message": "Heavy rain > 80% probability in next 2 hours!",
-                "is_shock": True,
-                "pivot_advice": "EMERGENCY: Cover your produce immediately or delay transit!"
-            }
-
-        # 3. Spatial Profit Analysis (Map Logic)
-        temp_today = weather_data["temperature_c"]
-        humidity_today = weather_data["humidity_percent"]
-        soil_moisture_today = weather_data.get("soil_moisture_percent", 45.0) # Real satellite data
-        
-        # Calculate logistics and profit for ALL regional options
-        spatial_profits = calculate_spatial_profit(
-            crop=data.crop,
-            yield_est=data.yield_est_quintals,
-            temp_c=temp_today,
-            humidity=humidity_today,
-            available_mandis=regional_mandis
-        )
-        
-        best_overall_mandi = spatial_profits[0]
+        weather_data, mandi_response, destination_weather = await fetch_recommendation_inputs(data)
+        recommendation = compute_recommendation(data, weather_data, mandi_response, destination_weather)
         
-        dist = primary_mandi["distance_km"]
-        
-        # Calculate for TODAY (Assume 2 hours shelf/transit time to primary)
-        estimated_transit_hours = 2.0
-        profit_today = get_net_realization(
-            market_price=primary_mandi["current_price"],
-            crop_type=data.crop,
-            distance_km=dist,
-            temp_c=temp_today,
-            humidity=humidity_today,
-            hours_to_market=estimated_transit_hours,
-            yield_est=data.yield_est_quintals
-        )
-        
-        # Calculate for 48 HOURS (Assume 50 hours shelf/transit time total)
-        price_forecast_48h = primary_mandi["current_price"] * 1.05 
-        temp_forecast_48h = temp_today + 2.0 
-        
-        profit_48h = get_net_realization(
-            market_price=price_forecast_48h,
-            crop_type=data.crop,
-            distance_km=primary_mandi["distance_km"], # Forecast is usually for the nearest/default market
-            temp_c=temp_forecast_48h,
-            humidity=humidity_today,
-            hours_to_market=50.0,
-            yield_est=data.yield_est_quintals
-        )
-        
-        # 3.5 UNIFIED DECISION LOGIC: Pick the absolute BEST market today
-        # spatial_profits[0] is already sorted by total_net_profit descending
-        best_optimal_option = spatial_profits[0]
-        
-        # Promoting the BEST regional option to be our Primary recommendation baseline
-        profit_today = best_optimal_option["net_profit_per_quintal"]
-        total_profit_today = best_optimal_option["total_net_profit"]
-        best_mandi_name = best_optimal_option["mandi_name"]
-        dist_best = best_optimal_option["distance_km"]
-        
-        gross_rev = best_optimal_option["market_price"] * data.yield_est_quintals
-        logistics_cost = dist_best * 15.0 
-        spoilage_penalty = (best_optimal_option["quality_loss_pct"] / 100.0) * gross_rev
-        
-        # 4. Synthesize Final Recommendation & Routing Pivot
-        is_selling_optimal = profit_today >= profit_48h
-        status = "GREEN" if is_selling_optimal else "RED"
-        
-        pivot_mandi = None
-        
-        # Alternative Destination Discovery Trigger
-        if active_shock:
-            status = "RED" # Shocks always override to RED/WAIT for primary
-            
-            # Find the best alternative that IS NOT the primary mandi
-            for option in spatial_profits:
-                if option["mandi_name"] != primary_mandi["name"] and not option.get("is_dead_zone"):
-                    pivot_mandi = option
-                    break
-            
-            if pivot_mandi:
-                 active_shock["pivot_advice"] = f"EMERGENCY: Primary market crashed. Re-routing you to {pivot_mandi['mandi_name']} ({round(pivot_mandi['distance_km'], 1)}km). Estimated Net Profit: ₹{pivot_mandi['total_net_profit']}"
-                 active_shock["pivot_mandi"] = pivot_mandi
-            
-        recommendation = {
-            "status": status,
-            "net_realization_inr_per_quintal": round(profit_today, 2),
-            "total_net_profit": round(total_profit_today, 2),
-            "yield_quintals": data.yield_est_quintals,
-            "breakdown": {
-                "gross_revenue": round(gross_rev, 2),
-                "logistics_cost": round(logistics_cost, 2),
-                "spoilage_penalty": round(spoilage_penalty, 2),
-                "quality_loss_pct": round(best_optimal_option["quality_loss_pct"], 2)
-            },
-            "profit_forecast_48h": round(profit_48h, 2),
-            "best_mandi": f"{best_mandi_name} ({round(dist_best, 1)} km)",
-            "weather": weather_data,
-            "mandi_stats": {
-                "name": best_mandi_name,
-                "current_price": best_optimal_option["market_price"],
-                "distance_km": dist_best,
-                "quality_loss_pct": best_optimal_option["quality_loss_pct"]
-            },
-            "shock_alert": active_shock,
-            "regional_options": spatial_profits, # Send all map data for the Market Maps tab
-            "decay_metrics": {
-                "today_profit": round(profit_today, 2),
-                "future_profit": round(profit_48h, 2),
-                "profit_difference": round(profit_today - profit_48h, 2)
-            }
-        }
-        
-        # Add AI brief after recommendation is formed
-        recommendation["vakeel_brief"] = generate_vakeel_brief(recommendation, data.language)
+        # Add AI brief after recommendation is formed.
+        # Only cached/offline briefs are inlined; otherwise the LLM runs in the background and the
+        # dashboard fetches it from /chat/brief/{recommendation_id}, so the numbers never wait on Groq.
+        with span("brief"):
+            recommendation["vakeel_brief"] = peek_cached_brief(recommendation, data.language)
+            if recommendation["vakeel_brief"] is None:
+                recommendation_id = brief_store.submit(generate_vakeel_brief(dict(recommendation), data.language))
+                recommendation["recommendation_id"] = recommendation_id
+                recommendation["vakeel_brief_url"] = f"/chat/brief/{recommendation_id}"
         
         return recommendation
 
@@ -186,3 +392,97 @@ async def get_harvest_recommendation(data: HarvestRequest):
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+def _localize_mandis(
+    mandi_response: Dict[str, Any],
+    destination_weather: List[Optional[Dict[str, Any]]],
+    location: dict
+) -> tuple:
+    """
+    Re-measures a shared (crop, cell) mandi fetch from one member's own location.
+    Mandis with coordinates get road (or straight-line) distances and are re-sorted nearest first, so the primary is this member's nearest.
+    """
+    options = mandi_response["regional_options"]
+    located = [i for i, m in enumerate(options) if "lat" in m and "lng" in m]
+    if not located:
+        return mandi_response, destination_weather
+    distances, transit_hours = road_matrix.route(
+        location.get("lat", DEFAULT_LAT), location.get("lng", DEFAULT_LNG), [options[i] for i in located]
+    )
+    options = [dict(m) for m in options]
+    for i, d, h in zip(located, distances, transit_hours):
+        options[i]["distance_km"] = round(float(d), 1)
+        options[i]["transit_hours"] = None if np.isnan(h) else round(float(h), 2)
+    order = sorted(range(len(options)), key=lambda i: options[i]["distance_km"])
+    options = [options[i] for i in order]
+    return {**mandi_response, "primary": options[0], "regional_options": options}, [destination_weather[i] for i in order]
+
+def _compute_batch_group(jobs: List[tuple], weather_data, mandi_response, destination_weather) -> List[str]:
+    """Engine pass for every member sharing one (crop, cell) fetch; returns NDJSON lines."""
+    lines = []
+    for member_id, request in jobs:
+        try:
+            localized, localized_weather = _localize_mandis(mandi_response, destination_weather, request.location)
+            result = {"member_id": member_id, "crop": request.crop,
+                      "recommendation": compute_recommendation(request, weather_data, localized, localized_weather)}
+        except Exception as e:
+            logger.error(f"Batch recommendation failed for {member_id}/{request.crop}: {e}")
+            result = {"member_id": member_id, "crop": request.crop, "error": str(e)}
+        lines.append(json.dumps(result, default=str) + "\n")
+    return lines
+
+@app.post("/recommendation/batch")
+async def get_batch_recommendations(batch: BatchHarvestRequest):
+    """
+    Recommendations for a whole FPO/cooperative, streamed back as NDJSON (one line per member x crop).
+    Upstream weather/mandi fetches are shared by every member whose crop and location fall in the
+    same weather grid cell; engine passes run off the event loop and each group is streamed as soon
+    as it is ready. No AI brief is generated in batch mode.
+    """
+    jobs = []
+    for i, member in enumerate(batch.members):
+        member_id = member.member_id or str(i)
+        for crop in member.crops or [member.crop]:
+            jobs.append((member_id, HarvestRequest(
+                crop=crop,
+                location=member.location,
+                yield_est_quintals=member.yield_est_quintals,
+                base_spoilage_rate=member.base_spoilage_rate,
+                language=member.language
+            )))
+    if len(jobs) > MAX_BATCH_JOBS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(jobs)} jobs (max {MAX_BATCH_JOBS})")
+
+    groups: Dict[tuple, List[tuple]] = {}
+    for job in jobs:
+        request = job[1]
+        cell = weather_cell(request.location.get("lat", DEFAULT_LAT), request.location.get("lng", DEFAULT_LNG))
+        # Keyed on the crop actually served (language default included), not the raw crop text
+        groups.setdefault((resolve_crop(request.crop, request.language), cell), []).append(job)
+
+    fetch_slots = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+
+    async def fetch_group(group_jobs: List[tuple]):
+        first = group_jobs[0][1]
+        async with fetch_slots:
+            try:
+                return group_jobs, await fetch_recommendation_inputs(first), None
+            except Exception as e:
+                return group_jobs, None, e
+
+    async def stream():
+        tasks = [asyncio.create_task(fetch_group(group_jobs)) for group_jobs in groups.values()]
+        try:
+            for done in asyncio.as_completed(tasks):
+                group_jobs, inputs, error = await done
+                if error is not None:
+                    for member_id, request in group_jobs:
+                        yield json.dumps({"member_id": member_id, "crop": request.crop, "error": str(error)}) + "\n"
+                    continue
+                for line in await asyncio.to_thread(_compute_batch_group, group_jobs, *inputs):
+                    yield line
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
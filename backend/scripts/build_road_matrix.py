@@ -0,0 +1,185 @@
+"""
+Offline builder for the origin-cell x mandi road distance / travel-time matrix (engine/road_matrix.py).
+
+Input is a local road-graph extract as two CSVs (e.g. exported from an OSM PBF with osmium/pyrosm):
+    nodes.csv: id,lat,lng
+    edges.csv: u,v,length_km,speed_kmph[,oneway]
+Mandis come from data/mandi_prices_real.json (every market with coordinates).
+
+One Dijkstra per mandi over the reversed graph (minimising travel time, tracking road distance)
+gives that mandi's column for every origin at once. Each origin cell is represented by the graph
+node nearest its centre.
+
+Run from backend/:
+    python -m scripts.build_road_matrix --nodes roads/nodes.csv --edges roads/edges.csv
+"""
+import os
+import csv
+import json
+import heapq
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from engine.road_matrix import (
+    DEFAULT_ROAD_MATRIX_DIR, ROAD_GRID_DEG, DISTANCE_UNIT_KM, DURATION_UNIT_H, MISSING, road_mandi_key
+)
+from engine.spatial_index import SpatialIndex, haversine_km
+from engine.batch_engine import MAX_REACHABLE_DISTANCE_KM
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+GROUND_TRUTH_PATH = os.path.join(BASE_DIR, "data", "mandi_prices_real.json")
+
+# Off-network legs (cell centre -> nearest road node, node -> mandi gate)
+ACCESS_DETOUR_FACTOR = 1.3
+ACCESS_SPEED_KMPH = 20.0
+# Mandis farther than this from any road node are outside the extract and stay uncovered
+MAX_SNAP_KM = 20.0
+
+def load_graph(nodes_path: str, edges_path: str) -> Tuple[np.ndarray, np.ndarray, List[List[Tuple[int, float, float]]]]:
+    """Returns node lats, lngs and the *reversed* adjacency list: rev[v] = [(u, hours, km), ...] for each edge u -> v."""
+    ids: Dict[str, int] = {}
+    lats, lngs = [], []
+    with open(nodes_path, newline="") as f:
+        for row in csv.DictReader(f):
+            ids[row["id"]] = len(lats)
+            lats.append(float(row["lat"]))
+            lngs.append(float(row["lng"]))
+
+    reverse: List[List[Tuple[int, float, float]]] = [[] for _ in lats]
+    skipped = 0
+    with open(edges_path, newline="") as f:
+        for row in csv.DictReader(f):
+            u, v = ids.get(row["u"]), ids.get(row["v"])
+            if u is None or v is None:
+                skipped += 1
+                continue
+            km = float(row["length_km"])
+            hours = km / max(1.0, float(row.get("speed_kmph") or 30.0))
+            reverse[v].append((u, hours, km))
+            if str(row.get("oneway", "")).strip().lower() not in ("1", "true", "yes"):
+                reverse[u].append((v, hours, km))
+    if skipped:
+        logger.warning(f"{skipped} edges reference unknown nodes and were skipped")
+    return np.array(lats), np.array(lngs), reverse
+
+def shortest_to(target: int, reverse: List[List[Tuple[int, float, float]]], max_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Fastest travel time (h) and its road distance (km) from every node to `target`, pruned beyond max_km."""
+    hours = np.full(len(reverse), np.inf)
+    km = np.full(len(reverse), np.inf)
+    hours[target], km[target] = 0.0, 0.0
+    heap = [(0.0, 0.0, target)]
+    while heap:
+        h, d, node = heapq.heappop(heap)
+        if h > hours[node]:
+            continue
+        for prev, edge_h, edge_km in reverse[node]:
+            nh, nd = h + edge_h, d + edge_km
+            if nh < hours[prev] and nd <= max_km:
+                hours[prev], km[prev] = nh, nd
+                heapq.heappush(heap, (nh, nd, prev))
+    return hours, km
+
+def load_mandis(path: str) -> Dict[str, Tuple[float, float]]:
+    with open(path, "r") as f:
+        data = json.load(f)
+    mandis: Dict[str, Tuple[float, float]] = {}
+    for commodity in data.get("commodities", {}).values():
+        for m in commodity.get("markets", []):
+            if "lat" in m and "lng" in m:
+                mandis.setdefault(road_mandi_key(m["name"]), (m["lat"], m["lng"]))
+    return mandis
+
+def origin_cells(lats: np.ndarray, lngs: np.ndarray) -> Tuple[List[Tuple[int, int]], np.ndarray, np.ndarray]:
+    """Every grid cell containing road nodes, its representative node (nearest the centre) and the access leg in km."""
+    rows = np.floor(lats / ROAD_GRID_DEG).astype(np.int64)
+    cols = np.floor(lngs / ROAD_GRID_DEG).astype(np.int64)
+    centre_lat, centre_lng = (rows + 0.5) * ROAD_GRID_DEG, (cols + 0.5) * ROAD_GRID_DEG
+    offset = np.hypot(lats - centre_lat, (lngs - centre_lng) * np.cos(np.radians(lats)))
+    order = np.lexsort((offset, cols, rows))
+    first = np.r_[True, (rows[order][1:] != rows[order][:-1]) | (cols[order][1:] != cols[order][:-1])]
+    representatives = order[first]
+    cells = list(zip(rows[representatives].tolist(), cols[representatives].tolist()))
+    access_km = np.array([
+        haversine_km(float(centre_lat[n]), float(centre_lng[n]), lats[n:n + 1], lngs[n:n + 1])[0] for n in representatives
+    ]) * ACCESS_DETOUR_FACTOR
+    return cells, representatives, access_km
+
+def encode(values: np.ndarray, unit: float) -> np.ndarray:
+    encoded = np.full(values.shape, MISSING, dtype=np.uint16)
+    finite = np.isfinite(values)
+    encoded[finite] = np.clip(np.round(values[finite] / unit), 0, MISSING - 1).astype(np.uint16)
+    return encoded
+
+def build(nodes_path: str, edges_path: str, mandis_path: str, output_dir: str, max_km: float) -> None:
+    lats, lngs, reverse = load_graph(nodes_path, edges_path)
+    logger.info(f"Road graph: {len(lats)} nodes")
+    mandis = load_mandis(mandis_path)
+    cells, representatives, cell_access_km = origin_cells(lats, lngs)
+    logger.info(f"{len(cells)} origin cells x {len(mandis)} mandis")
+
+    node_index = SpatialIndex((float(lat), float(lng), i) for i, (lat, lng) in enumerate(zip(lats, lngs)))
+    os.makedirs(output_dir, exist_ok=True)
+    shape = (len(cells), len(mandis))
+    # Each build writes its own data files, named by the index that describes them
+    built_at = datetime.now(timezone.utc)
+    files = {field: f"{field}.{built_at.strftime('%Y%m%dT%H%M%S%fZ')}.u16" for field in ("distance", "duration")}
+    distance = np.memmap(os.path.join(output_dir, files["distance"]), dtype=np.uint16, mode="w+", shape=shape)
+    duration = np.memmap(os.path.join(output_dir, files["duration"]), dtype=np.uint16, mode="w+", shape=shape)
+
+    for col, (name, (mandi_lat, mandi_lng)) in enumerate(mandis.items()):
+        gate, gate_km = node_index.k_nearest(mandi_lat, mandi_lng, 1)[0]
+        if gate_km > MAX_SNAP_KM:
+            distance[:, col] = MISSING
+            duration[:, col] = MISSING
+            logger.info(f"[{col + 1}/{len(mandis)}] {name}: outside the road extract ({gate_km:.1f} km from nearest node)")
+            continue
+        hours, km = shortest_to(gate, reverse, max_km)
+        access_km = cell_access_km + gate_km * ACCESS_DETOUR_FACTOR
+        route_km = km[representatives] + access_km
+        route_h = hours[representatives] + access_km / ACCESS_SPEED_KMPH
+        distance[:, col] = encode(route_km, DISTANCE_UNIT_KM)
+        duration[:, col] = encode(route_h, DURATION_UNIT_H)
+        logger.info(f"[{col + 1}/{len(mandis)}] {name}: {int(np.isfinite(route_km).sum())} cells reachable")
+
+    distance.flush()
+    duration.flush()
+    del distance, duration
+
+    # Index last: readers re-map when it changes, using the files and shape it names
+    index = {
+        "built_at": built_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "source": {"nodes": os.path.basename(nodes_path), "edges": os.path.basename(edges_path)},
+        "grid_deg": ROAD_GRID_DEG,
+        "files": files,
+        "shape": list(shape),
+        "cells": {f"{r},{c}": i for i, (r, c) in enumerate(cells)},
+        "mandis": {name: col for col, name in enumerate(mandis)},
+    }
+    tmp_path = os.path.join(output_dir, "index.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(output_dir, "index.json"))
+
+    # Older builds' data: workers that already mapped them keep their open maps; one that read the
+    # old index but has not mapped yet fails that reload and picks up this index on its next check
+    for name in os.listdir(output_dir):
+        if name.endswith(".u16") and name not in files.values():
+            os.remove(os.path.join(output_dir, name))
+    logger.info(f"Road matrix written to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the origin-cell x mandi road matrix from a road-graph extract")
+    parser.add_argument("--nodes", required=True, help="nodes.csv: id,lat,lng")
+    parser.add_argument("--edges", required=True, help="edges.csv: u,v,length_km,speed_kmph[,oneway]")
+    parser.add_argument("--mandis", default=GROUND_TRUTH_PATH)
+    parser.add_argument("--output", default=DEFAULT_ROAD_MATRIX_DIR)
+    parser.add_argument("--max-km", type=float, default=MAX_REACHABLE_DISTANCE_KM)
+    args = parser.parse_args()
+    build(args.nodes, args.edges, args.mandis, args.output, args.max_km)
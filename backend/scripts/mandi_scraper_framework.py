@@ -1,54 +1,497 @@
 import httpx
-from bs4 import BeautifulSoup
 import logging
 import json
 import os
+import time
+import asyncio
+import argparse
+from datetime import date, datetime, timezone
+from html.parser import HTMLParser
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+GROUND_TRUTH_PATH = os.path.join(BASE_DIR, "data", "mandi_prices_real.json")
+# Append-only crawl log: a header line, then one line per finished report
+PROGRESS_PATH = os.path.join(BASE_DIR, "data", "scrape_progress.jsonl")
+
+AGMARKNET_BASE_URL = "https://agmarknet.gov.in"
+AGMARKNET_REPORT_PATH = "/SearchCmmMkt.aspx"
+
+# Agmarknet form codes for the crops MittiMitra serves (Tx_Commodity / ddlCommodity values)
+AGMARKNET_COMMODITIES = {
+    "wheat": ("1", "Wheat"),
+    "rice": ("3", "Rice"),
+    "groundnut": ("10", "Groundnut"),
+    "mustard": ("12", "Mustard"),
+    "soybean": ("13", "Soyabean"),
+    "cotton": ("15", "Cotton"),
+    "onion": ("23", "Onion"),
+    "potato": ("24", "Potato"),
+    "tomato": ("78", "Tomato"),
+}
+
+# Agmarknet state codes (Tx_State / ddlState values)
+AGMARKNET_STATES = {
+    "MH": "Maharashtra",
+    "MP": "Madhya Pradesh",
+    "GJ": "Gujarat",
+    "KK": "Karnataka",
+    "RJ": "Rajasthan",
+    "UP": "Uttar Pradesh",
+    "PB": "Punjab",
+    "TN": "Tamil Nadu",
+    "AP": "Andhra Pradesh",
+    "TL": "Telangana",
+}
+
+# Report grid column headers -> our field names
+_COLUMN_ALIASES = {
+    "district name": "district",
+    "market name": "market",
+    "commodity": "commodity",
+    "variety": "variety",
+    "grade": "grade",
+    "min price (rs./quintal)": "min_price",
+    "max price (rs./quintal)": "max_price",
+    "modal price (rs./quintal)": "modal_price",
+    "price date": "price_date",
+    "arrivals (tonnes)": "arrivals_tonnes",
+}
+
+class AgmarknetReportParser(HTMLParser):
+    """
+    Incremental parser for the Agmarknet price grid.
+    Fed chunk by chunk while the response downloads; completed rows are drained with pop_rows(),
+    so a large national report is never held as one DOM. Also captures the ASP.NET hidden form
+    fields (__VIEWSTATE etc.) needed for a postback.
+    """
+    GRID_ID_MARKER = "GridPriceData"
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hidden_fields: Dict[str, str] = {}
+        self.found_grid = False
+        self._in_grid = False
+        self._table_depth = 0
+        self._columns: List[str] = []
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+        self._cell_is_header = False
+        self._rows: List[Dict[str, str]] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "input" and attrs.get("type") == "hidden" and attrs.get("name", "").startswith("__"):
+            self.hidden_fields[attrs["name"]] = attrs.get("value", "")
+        elif tag == "table":
+            if self._in_grid:
+                self._table_depth += 1
+            elif self.GRID_ID_MARKER in (attrs.get("id") or ""):
+                self._in_grid = True
+                self.found_grid = True
+                self._table_depth = 1
+        elif self._in_grid and tag == "tr":
+            self._row = []
+        elif self._in_grid and tag in ("td", "th") and self._row is not None:
+            self._cell = []
+            self._cell_is_header = tag == "th"
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def handle_endtag(self, tag):
+        if not self._in_grid:
+            return
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self._finish_row(self._row)
+            self._row = None
+        elif tag == "table":
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._in_grid = False
+
+    def _finish_row(self, cells: List[str]) -> None:
+        if not cells:
+            return
+        if self._cell_is_header or not self._columns:
+            self._columns = [_COLUMN_ALIASES.get(c.lower(), c.lower()) for c in cells]
+            self._cell_is_header = False
+            return
+        if len(cells) != len(self._columns):
+            return # pager rows / "No Data Found" rows
+        self._rows.append(dict(zip(self._columns, cells)))
+
+    def pop_rows(self) -> List[Dict[str, str]]:
+        rows, self._rows = self._rows, []
+        return rows
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
 class MandiScraper:
     """
     A framework for scraping real-time Mandi data from Agmarknet or aggregators.
     Note: Government portals often block simple script headers. This framework
     is designed to be used with high-quality rotating proxies or headless browsers.
+
+    crawl() fans out over commodity x state reports concurrently, under a global concurrency cap
+    and a minimum interval between requests (politeness). One HTTP session (cookies) is reused for
+    the whole crawl, while each report keeps its own ASP.NET form state, and report tables are parsed chunk by chunk as
+    they download, rows being handed on as soon as each chunk completes them. Every finished report
+    is appended to the progress log (only that report's rows), so an interrupted run resumes
+    where it stopped without rewriting what was already checkpointed.
     """
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        base_url: str = AGMARKNET_BASE_URL,
+        max_concurrency: int = 4,
+        min_request_interval_s: float = 1.0,
+        progress_path: str = PROGRESS_PATH,
+        output_path: str = GROUND_TRUTH_PATH,
+        archive_dir: Optional[str] = None
+    ):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
         }
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.min_request_interval_s = min_request_interval_s
+        self.progress_path = progress_path
+        self.output_path = output_path
+        # Price history archive to append to; None archives only crawls that refresh the real ground truth
+        self.archive_dir = archive_dir
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pace_lock: Optional[asyncio.Lock] = None
+        self._last_request_at = 0.0
+
+    # ------------------------------------------------------------------------
+    # Session & politeness
+    # ------------------------------------------------------------------------
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            follow_redirects=True,
+        )
+
+    async def _pace(self) -> None:
+        """Spaces request starts at least min_request_interval_s apart across all workers."""
+        async with self._pace_lock:
+            wait = self._last_request_at + self.min_request_interval_s - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request_at = time.monotonic()
 
-    async def scrape_agmarknet_latest(self, commodity: str):
+    async def _stream_report(self, client: httpx.AsyncClient, method: str, parser: AgmarknetReportParser, **kwargs) -> AsyncIterator[List[Dict[str, str]]]:
+        """
+        Yields the rows completed by each downloaded chunk; the response body is never buffered whole.
+        The page's form state is left in parser.hidden_fields for this report's postback.
+        """
+        await self._pace()
+        async with client.stream(method, AGMARKNET_REPORT_PATH, **kwargs) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_text():
+                parser.feed(chunk)
+                rows = parser.pop_rows()
+                if rows:
+                    yield rows
+        parser.close()
+        rows = parser.pop_rows()
+        if rows:
+            yield rows
+
+    # ------------------------------------------------------------------------
+    # Single report
+    # ------------------------------------------------------------------------
+
+    async def scrape_report(self, client: httpx.AsyncClient, commodity: str, state: str, report_date: date) -> List[Dict[str, str]]:
         """
         Example target: Agmarknet Daily Report
-        Url: https://agmarknet.gov.in/SearchReports/SearchReport.aspx?ReportName=Report7day&ss=1
-        """
-        # In a real environment, you'd navigate the ASP.NET form or use 
-        # a direct POST request with the correct __VIEWSTATE.
-        logger.info(f"Initiating scrape for {commodity}...")
-        
-        # Placeholder for real scraper logic
-        # 1. Fetch page content
-        # 2. Parse HTML table
-        # 3. Extract min/max/modal prices
-        # 4. Save to mandi_prices_real.json
-        pass
+        Url: https://agmarknet.gov.in/SearchCmmMkt.aspx?Tx_Commodity=23&Tx_State=MH&...
+        The query-string search renders the grid directly; if the portal instead answers with the
+        bare ASP.NET form, we replay it as a postback carrying that page's own __VIEWSTATE
+        (concurrent reports never share form state).
+        """
+        commodity_code, commodity_head = AGMARKNET_COMMODITIES[commodity]
+        day = report_date.strftime("%d-%b-%Y")
+        params = {
+            "Tx_Commodity": commodity_code, "Tx_State": state, "Tx_District": "0", "Tx_Market": "0",
+            "DateFrom": day, "DateTo": day, "Fr_Date": day, "To_Date": day, "Tx_Trend": "0",
+            "Tx_CommodityHead": commodity_head, "Tx_StateHead": AGMARKNET_STATES.get(state, state),
+            "Tx_DistrictHead": "--Select--", "Tx_MarketHead": "--Select--",
+        }
+
+        rows: List[Dict[str, str]] = []
+        async with self._semaphore:
+            parser = AgmarknetReportParser()
+            async for batch in self._stream_report(client, "GET", parser, params=params):
+                rows.extend(batch)
+
+            if not parser.found_grid and parser.hidden_fields.get("__VIEWSTATE"):
+                postback = {
+                    **parser.hidden_fields,
+                    "ctl00$ddlArrivalPrice": "0",
+                    "ctl00$ddlCommodity": commodity_code,
+                    "ctl00$ddlState": state,
+                    "ctl00$ddlDistrict": "0",
+                    "ctl00$ddlMarket": "0",
+                    "ctl00$txtDate": day,
+                    "ctl00$txtDateTo": day,
+                    "ctl00$btnGo": "Go",
+                }
+                async for batch in self._stream_report(client, "POST", AgmarknetReportParser(), data=postback):
+                    rows.extend(batch)
+
+        logger.info(f"Scraped {len(rows)} rows for {commodity} / {state}")
+        return rows
+
+    async def scrape_agmarknet_latest(self, commodity: str, states: Optional[List[str]] = None) -> List[Dict[str, str]]:
+        """Latest report for one commodity across states (a one-commodity crawl without merging)."""
+        results = await self.crawl([commodity.strip().lower()], states or list(AGMARKNET_STATES), merge=False)
+        return [row for rows in results.values() for row in rows]
+
+    # ------------------------------------------------------------------------
+    # Crawl with checkpoint / resume
+    # ------------------------------------------------------------------------
+
+    def _load_progress(self, report_date: date) -> Dict[str, List[Dict[str, str]]]:
+        """Reports already logged for `report_date`; a log for another day is discarded."""
+        completed: Dict[str, List[Dict[str, str]]] = {}
+        if not os.path.exists(self.progress_path):
+            return completed
+        try:
+            with open(self.progress_path, "r") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("report_date") != report_date.isoformat():
+                    return completed
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break # Torn last line from an interrupted write; that report is crawled again
+                    completed[entry["key"]] = entry["rows"]
+            logger.info(f"Resuming crawl: {len(completed)} reports already done")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable crawl progress file: {e}")
+        return completed
+
+    def _start_progress(self, report_date: date, completed: Dict[str, List[Dict[str, str]]]) -> None:
+        """Rewrites the log once per crawl (header plus any resumed reports); reports are appended after that."""
+        tmp_path = f"{self.progress_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"report_date": report_date.isoformat()}) + "\n")
+            for key, rows in completed.items():
+                f.write(json.dumps({"key": key, "rows": rows}) + "\n")
+        os.replace(tmp_path, self.progress_path)
+
+    def _append_progress(self, key: str, rows: List[Dict[str, str]]) -> None:
+        with open(self.progress_path, "a") as f:
+            f.write(json.dumps({"key": key, "rows": rows}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def crawl(
+        self,
+        commodities: List[str],
+        states: List[str],
+        report_date: Optional[date] = None,
+        resume: bool = True,
+        merge: bool = True
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Crawls every commodity x state report concurrently. Returns {"commodity|state": rows}.
+        With merge=True the results are folded into mandi_prices_real.json and the progress file is cleared.
+        """
+        report_date = report_date or date.today()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._pace_lock = asyncio.Lock()
+        completed = self._load_progress(report_date) if resume else {}
+        self._start_progress(report_date, completed)
+
+        unknown = [c for c in commodities if c not in AGMARKNET_COMMODITIES]
+        if unknown:
+            logger.warning(f"Skipping commodities without an Agmarknet code: {', '.join(unknown)}")
+        wanted = [(c, s) for c in commodities if c in AGMARKNET_COMMODITIES for s in states]
+        jobs = [(c, s) for c, s in wanted if f"{c}|{s}" not in completed]
+        logger.info(f"Crawling {len(jobs)} reports ({len(completed)} already checkpointed)")
+
+        async with self._client() as client:
+            async def run(job: Tuple[str, str]) -> None:
+                commodity, state = job
+                try:
+                    rows = await self.scrape_report(client, commodity, state, report_date)
+                except Exception as e:
+                    logger.error(f"Report {commodity} / {state} failed: {e}")
+                    return
+                completed[f"{commodity}|{state}"] = rows
+                self._append_progress(f"{commodity}|{state}", rows)
+
+            await asyncio.gather(*(run(job) for job in jobs))
+
+        if merge:
+            self.merge_into_ground_truth(completed)
+            self.archive_report_day(report_date, completed)
+            # Cleared once every report this crawl could run is done (unknown commodities never are)
+            if os.path.exists(self.progress_path) and all(f"{c}|{s}" in completed for c, s in wanted):
+                os.remove(self.progress_path)
+        return completed
+
+    # ------------------------------------------------------------------------
+    # Ground-truth merge
+    # ------------------------------------------------------------------------
+
+    def merge_into_ground_truth(self, results: Dict[str, List[Dict[str, str]]]) -> None:
+        """
+        Folds scraped modal prices into mandi_prices_real.json. Known markets get fresh prices;
+        new markets are added only when their coordinates are already known from another commodity.
+        """
+        try:
+            with open(self.output_path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {"commodities": {}}
+
+        coordinates = {}
+        for commodity_data in data.get("commodities", {}).values():
+            for m in commodity_data.get("markets", []):
+                if "lat" in m and "lng" in m:
+                    coordinates[m["name"].lower()] = (m["lat"], m["lng"])
+
+        by_commodity: Dict[str, List[Dict[str, str]]] = {}
+        for key, rows in results.items():
+            by_commodity.setdefault(key.split("|")[0], []).extend(rows)
+
+        for commodity, rows in by_commodity.items():
+            commodity_data = data["commodities"].setdefault(commodity, {"unit": "INR/Quintal", "markets": []})
+            markets = {m["name"].lower(): m for m in commodity_data["markets"]}
+            skipped = 0
+            for row in rows:
+                name = row.get("market", "").replace(" APMC", "").strip()
+                modal = _to_float(row.get("modal_price"))
+                if not name or modal is None:
+                    continue
+                market = markets.get(name.lower())
+                if market is None:
+                    if name.lower() not in coordinates:
+                        skipped += 1
+                        continue
+                    lat, lng = coordinates[name.lower()]
+                    market = {"name": name, "lat": lat, "lng": lng}
+                    commodity_data["markets"].append(market)
+                    markets[name.lower()] = market
+                market["price"] = modal
+
+            prices = [m["price"] for m in commodity_data["markets"] if "price" in m]
+            mins = [_to_float(r.get("min_price")) for r in rows]
+            maxs = [_to_float(r.get("max_price")) for r in rows]
+            if prices:
+                commodity_data["modal_price"] = round(sum(prices) / len(prices), 1)
+            if any(v is not None for v in mins):
+                commodity_data["min_price"] = min(v for v in mins if v is not None)
+            if any(v is not None for v in maxs):
+                commodity_data["max_price"] = max(v for v in maxs if v is not None)
+            if skipped:
+                logger.info(f"{commodity}: {skipped} rows skipped (markets without known coordinates)")
+
+        data["updated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        data["source"] = "Agmarknet crawl"
+        self.save_checkpoint(data)
+
+    def archive_report_day(self, report_date: date, results: Dict[str, List[Dict[str, str]]]) -> None:
+        """
+        Appends the day's min/max/modal prices and arrivals to the columnar price history archive.
+        Crawls written elsewhere (--output, fixture runs) leave the production archive alone unless
+        an archive directory is given explicitly.
+        """
+        try:
+            from integrations.price_archive import PriceArchive, price_archive
+        except ImportError:
+            return
+        if self.archive_dir:
+            archive = PriceArchive(self.archive_dir)
+        elif os.path.abspath(self.output_path) == os.path.abspath(GROUND_TRUTH_PATH):
+            archive = price_archive
+        else:
+            logger.info(f"Not archiving {report_date.isoformat()}: output is not the ground-truth file and no --archive-dir was given")
+            return
+        records = [
+            {
+                "commodity": key.split("|")[0],
+                "market": row.get("market", ""),
+                "min_price": row.get("min_price"),
+                "max_price": row.get("max_price"),
+                "modal_price": row.get("modal_price"),
+                "arrivals": row.get("arrivals_tonnes"),
+            }
+            for key, rows in results.items() for row in rows
+        ]
+        written = archive.append_day(report_date, records)
+        logger.info(f"Archived {written} price reports for {report_date.isoformat()}")
 
     def save_checkpoint(self, data: dict):
         """Saves scraped data to the ground-truth JSON file."""
-        base_dir = os.path.dirname(os.path.dirname(__file__))
-        path = os.path.join(base_dir, "data", "mandi_prices_real.json")
-        
-        with open(path, "w") as f:
+        path = self.output_path
+
+        # Write to a temp file and swap it in, so readers never see a half-written JSON
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
         logger.info(f"Ground-truth data updated at {path}")
 
+        # Refresh the in-process snapshot immediately; other API workers pick it up via mtime
+        if os.path.abspath(path) != os.path.abspath(GROUND_TRUTH_PATH):
+            return
+        try:
+            from integrations.mandi_snapshot import mandi_snapshot
+            mandi_snapshot.reload()
+        except ImportError:
+            pass
+
 if __name__ == "__main__":
-    import asyncio
-    scraper = MandiScraper()
-    # Manual trigger for testing
-    # asyncio.run(scraper.scrape_agmarknet_latest("Cotton"))
+    # Run from backend/:  python -m scripts.mandi_scraper_framework --commodities onion,tomato --states MH,MP
+    # Offline check against saved pages:  python -m http.server 8001 -d scripts/fixtures/agmarknet
+    #   then add --base-url http://127.0.0.1:8001 --output /tmp/mandi_prices_fixture.json
+    # The same fixture is crawled by tests/test_mandi_scraper.py:  python -m pytest tests
+    arg_parser = argparse.ArgumentParser(description="Concurrent Agmarknet crawler for mandi_prices_real.json")
+    arg_parser.add_argument("--commodities", default=",".join(AGMARKNET_COMMODITIES))
+    arg_parser.add_argument("--states", default=",".join(AGMARKNET_STATES))
+    arg_parser.add_argument("--date", default=None, help="Report date YYYY-MM-DD (default: today)")
+    arg_parser.add_argument("--base-url", default=AGMARKNET_BASE_URL)
+    arg_parser.add_argument("--concurrency", type=int, default=4)
+    arg_parser.add_argument("--interval", type=float, default=1.0, help="Minimum seconds between requests")
+    arg_parser.add_argument("--output", default=GROUND_TRUTH_PATH)
+    arg_parser.add_argument("--archive-dir", default=None, help="Price history archive to append to (default: the app's archive, only when --output is the ground truth)")
+    arg_parser.add_argument("--no-resume", action="store_true")
+    args = arg_parser.parse_args()
+
+    scraper = MandiScraper(
+        base_url=args.base_url,
+        max_concurrency=args.concurrency,
+        min_request_interval_s=args.interval,
+        output_path=args.output,
+        archive_dir=args.archive_dir
+    )
+    asyncio.run(scraper.crawl(
+        commodities=[c.strip().lower() for c in args.commodities.split(",") if c.strip()],
+        states=[s.strip().upper() for s in args.states.split(",") if s.strip()],
+        report_date=date.fromisoformat(args.date) if args.date else None,
+        resume=not args.no_resume
+    ))
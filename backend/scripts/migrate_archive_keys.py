@@ -0,0 +1,23 @@
+"""
+One-off migration for price archives written before crop names went through the crop registry.
+Series stored under older spellings ('soyabean|indore', 'kanda|lasalgaon') are moved to their
+canonical key and merged with any series already there (see PriceArchive.rekey). The shock
+scanner notices the new key version and rebuilds its rolling stats on its next scan.
+
+Stop the scraper first (the archive assumes a single writer). Run from backend/:
+    python -m scripts.migrate_archive_keys [--archive-dir data/price_archive]
+"""
+import logging
+import argparse
+
+from integrations.price_archive import PriceArchive, DEFAULT_ARCHIVE_DIR
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-key price archive series to canonical crop names")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR)
+    args = parser.parse_args()
+    renamed = PriceArchive(args.archive_dir).rekey()
+    logger.info(f"{renamed} series re-keyed in {args.archive_dir}")
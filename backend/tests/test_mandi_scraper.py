@@ -0,0 +1,119 @@
+"""
+Crawls the saved Agmarknet report in scripts/fixtures/agmarknet/ from a local HTTP server.
+Run from backend/:  python -m pytest tests
+"""
+import os
+import json
+import asyncio
+import threading
+from datetime import date
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from scripts.mandi_scraper_framework import MandiScraper
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "fixtures", "agmarknet")
+REPORT_DATE = date(2026, 10, 18)
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Serves the fixture page for every report query; states listed in `failing_states` get a 503."""
+    requests = []
+    failing_states = set()
+
+    def do_GET(self):
+        state = parse_qs(urlparse(self.path).query).get("Tx_State", [""])[0]
+        type(self).requests.append(state)
+        if state in type(self).failing_states:
+            self.send_error(503)
+            return
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def agmarknet_server():
+    FixtureHandler.requests = []
+    FixtureHandler.failing_states = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, directory=FIXTURE_DIR))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def _scraper(base_url: str, tmp_path) -> MandiScraper:
+    return MandiScraper(
+        base_url=base_url,
+        max_concurrency=2,
+        min_request_interval_s=0.0,
+        progress_path=str(tmp_path / "progress.jsonl"),
+        output_path=str(tmp_path / "mandi_prices.json"),
+    )
+
+def test_parses_fixture_rows(agmarknet_server, tmp_path):
+    results = asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion"], ["MH"], REPORT_DATE, merge=False))
+
+    rows = results["onion|MH"]
+    assert [r["market"] for r in rows] == ["Lasalgaon", "Pune", "Rahuri"]
+    assert rows[0] == {
+        "sl no.": "1", "district": "Nashik", "market": "Lasalgaon", "commodity": "Onion", "variety": "Red",
+        "grade": "FAQ", "min_price": "1,400", "max_price": "2,650", "modal_price": "2,250", "price_date": "18 Oct 2026",
+    }
+
+def test_resumes_after_failed_reports(agmarknet_server, tmp_path):
+    FixtureHandler.failing_states = {"MP"}
+    first = asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion"], ["MH", "MP"], REPORT_DATE, merge=False))
+    assert set(first) == {"onion|MH"}
+
+    # The log holds a header and only the finished report
+    with open(tmp_path / "progress.jsonl") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0] == {"report_date": REPORT_DATE.isoformat()}
+    assert [line["key"] for line in lines[1:]] == ["onion|MH"]
+
+    FixtureHandler.failing_states = set()
+    FixtureHandler.requests = []
+    second = asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion"], ["MH", "MP"], REPORT_DATE, merge=False))
+    assert FixtureHandler.requests == ["MP"]
+    assert set(second) == {"onion|MH", "onion|MP"}
+    assert second["onion|MH"] == first["onion|MH"]
+
+def test_progress_for_another_day_is_discarded(agmarknet_server, tmp_path):
+    asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion"], ["MH"], REPORT_DATE, merge=False))
+    FixtureHandler.requests = []
+    asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion"], ["MH"], date(2026, 10, 19), merge=False))
+    assert FixtureHandler.requests == ["MH"]
+
+def test_merge_updates_known_markets(agmarknet_server, tmp_path):
+    with open(tmp_path / "mandi_prices.json", "w") as f:
+        json.dump({"commodities": {"onion": {"unit": "INR/Quintal", "markets": [
+            {"name": "Lasalgaon", "price": 1500.0, "lat": 20.15, "lng": 74.23},
+            {"name": "Pune", "price": 1600.0, "lat": 18.52, "lng": 73.85},
+        ]}}}, f)
+    asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion"], ["MH"], REPORT_DATE))
+
+    with open(tmp_path / "mandi_prices.json") as f:
+        onion = json.load(f)["commodities"]["onion"]
+    assert {m["name"]: m["price"] for m in onion["markets"]} == {"Lasalgaon": 2250.0, "Pune": 2000.0}
+    assert (onion["min_price"], onion["max_price"]) == (1000.0, 2650.0)
+    # A complete crawl clears its progress log
+    assert not os.path.exists(tmp_path / "progress.jsonl")
+
+def test_unknown_commodity_does_not_pin_the_progress_log(agmarknet_server, tmp_path):
+    results = asyncio.run(_scraper(agmarknet_server, tmp_path).crawl(["onion", "onoin"], ["MH"], REPORT_DATE))
+    assert set(results) == {"onion|MH"}
+    assert not os.path.exists(tmp_path / "progress.jsonl")
+
+def test_archives_only_into_the_given_directory(agmarknet_server, tmp_path):
+    from integrations.price_archive import PriceArchive
+
+    scraper = _scraper(agmarknet_server, tmp_path)
+    scraper.archive_dir = str(tmp_path / "archive")
+    asyncio.run(scraper.crawl(["onion"], ["MH"], REPORT_DATE))
+
+    archive = PriceArchive(str(tmp_path / "archive"))
+    assert archive.recent_values("onion", "Lasalgaon", 1) == [2250.0]
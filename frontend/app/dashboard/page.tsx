@@ -152,6 +152,22 @@ export default function DashboardPage() {
         recalculateWithOverrides(data, newOverrides);
     };
 
+    const fetchDeferredBrief = async (recommendation: any) => {
+        try {
+            const res = await fetch(`/api${recommendation.vakeel_brief_url}?wait=8`);
+            if (!res.ok) return;
+            const brief = await res.json();
+            if (brief.status !== 'ready' || !brief.vakeel_brief) return;
+
+            const withBrief = { ...recommendation, vakeel_brief: brief.vakeel_brief };
+            // Only patch if the dashboard still shows the same recommendation
+            setData((current: any) => current?.recommendation_id === recommendation.recommendation_id ? { ...current, vakeel_brief: brief.vakeel_brief } : current);
+            saveToCache(withBrief);
+        } catch (err) {
+            console.error("Failed to fetch Vakeel brief", err);
+        }
+    };
+
     const fetchRecommendation = async (isDemo = false) => {
         setLoading(true);
         try {
@@ -200,6 +216,11 @@ export default function DashboardPage() {
                 setData(json);
                 setLastFetched(new Date());
                 saveToCache(json);
+
+                // The AI brief is generated after the numbers; long-poll for it and patch it into the ticker
+                if (!json.vakeel_brief && json.vakeel_brief_url) {
+                    fetchDeferredBrief(json);
+                }
             }
         } catch (err) {
             console.error("Failed to fetch recommendation", err);